@@ -0,0 +1,3 @@
+"""
+Performance benchmarks, run as ``python -m benchmarks.<module>``
+"""
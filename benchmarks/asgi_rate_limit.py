@@ -0,0 +1,175 @@
+"""
+Compares RateLimitMiddleware under ASGI with its native async path against
+the thread-hopping path MiddlewareMixin provides for sync middleware.
+
+Requests are driven in-process through Django's ASGIHandler with a number
+of concurrent clients, each using its own X-Forwarded-For address, and an
+async view so only the middleware differs between runs. Needs the Redis
+server configured in CACHES.
+
+    python -m benchmarks.asgi_rate_limit --concurrency 100 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gic_test.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.http import JsonResponse  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import path  # noqa: E402
+from django.utils.deprecation import MiddlewareMixin  # noqa: E402
+
+from middleware.rate_limiter.rate_limiter import RateLimitMiddleware  # noqa: E402
+
+
+RATE_LIMIT_MIDDLEWARE = 'middleware.rate_limiter.rate_limiter.RateLimitMiddleware'
+
+
+class NativeAsyncRateLimitMiddleware(RateLimitMiddleware):
+    """RateLimitMiddleware with its native async path."""
+    RATE_LIMIT_MAX_REQUESTS = 10 ** 9
+
+
+class ThreadedRateLimitMiddleware(NativeAsyncRateLimitMiddleware):
+    """RateLimitMiddleware as it ran before, via MiddlewareMixin's sync_to_async hops."""
+    __acall__ = MiddlewareMixin.__acall__
+
+
+async def ping(request):
+    return JsonResponse({'message': 'pong'})
+
+
+urlpatterns = [
+    path('ping/', ping),
+]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def send_request(app, client_ip):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/ping/',
+        'raw_path': b'/ping/',
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'x-forwarded-for', client_ip.encode())],
+        'client': (client_ip, 50000),
+        'server': ('localhost', 80),
+    }
+    body_sent = asyncio.Event()
+    disconnected = asyncio.Event()
+    status = []
+
+    async def receive():
+        if not body_sent.is_set():
+            body_sent.set()
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run_load(app, concurrency, total_requests):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total_requests))
+
+    async def client(client_id):
+        client_ip = f"10.{client_id // 65536 % 256}.{client_id // 256 % 256}.{client_id % 256}"
+        for _ in remaining:
+            started = time.perf_counter()
+            status = await send_request(app, client_ip)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(client_id) for client_id in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': total_requests,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(total_requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'statuses': statuses,
+    }
+
+
+def benchmark(middleware_class, backend, concurrency, total_requests):
+    """
+    Runs the load against a fresh ASGIHandler using middleware_class in
+    place of RateLimitMiddleware and returns its statistics.
+    """
+    middleware_path = f'{__name__}.{middleware_class.__name__}'
+    middleware = [
+        middleware_path if entry == RATE_LIMIT_MIDDLEWARE else entry
+        for entry in settings.MIDDLEWARE
+    ]
+    middleware_class.RATE_LIMIT_BACKEND = backend
+    cache.clear()
+    with override_settings(MIDDLEWARE=middleware, ROOT_URLCONF=__name__, ALLOWED_HOSTS=['localhost']):
+        app = ASGIHandler()
+        return asyncio.run(run_load(app, concurrency, total_requests))
+
+
+def run(backend, concurrency, total_requests):
+    """
+    Benchmarks the threaded (before) and native async (after) paths.
+    """
+    return {
+        'backend': backend,
+        'concurrency': concurrency,
+        'before': benchmark(ThreadedRateLimitMiddleware, backend, concurrency, total_requests),
+        'after': benchmark(NativeAsyncRateLimitMiddleware, backend, concurrency, total_requests),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', default=settings.RATE_LIMIT_BACKEND)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.backend, args.concurrency, args.requests)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"backend={results['backend']} concurrency={results['concurrency']}")
+    for label in ('before', 'after'):
+        stats = results[label]
+        print(
+            f"{label:>6}: {stats['requests_per_second']:>9} req/s  "
+            f"p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  {stats['statuses']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
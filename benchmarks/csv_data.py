@@ -0,0 +1,85 @@
+"""
+Synthetic user CSV files for the import benchmarks.
+
+Rows are generated from a seed, so the same arguments always give the same
+file. A share of the rows can repeat an earlier email address (rejected as
+in-file duplicates) or be invalid (bad email, out of range age or missing
+name).
+
+    python -m benchmarks.csv_data users.csv --rows 100000 --duplicates 0.05 --invalid 0.05
+"""
+import argparse
+import csv
+import random
+
+
+SIZES = {
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+INVALID_ROWS = [
+    lambda n: [f'Invalid User{n}', f'invalid-email-{n}', 30],
+    lambda n: [f'Old User{n}', f'old{n}@example.com', 150],
+    lambda n: ['', f'noname{n}@example.com', 40],
+]
+
+
+def generate_rows(rows, duplicate_ratio=0.0, invalid_ratio=0.0, seed=0):
+    """
+    Yields rows of name, email and age.
+
+    Args:
+        rows (int): Number of data rows
+        duplicate_ratio (float): Share of rows repeating an earlier email
+        invalid_ratio (float): Share of rows failing validation
+        seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    emails = []
+    for n in range(rows):
+        draw = rng.random()
+        if draw < invalid_ratio:
+            yield INVALID_ROWS[n % len(INVALID_ROWS)](n)
+        elif draw < invalid_ratio + duplicate_ratio and emails:
+            yield [f'Copy User{n}', rng.choice(emails), rng.randint(0, 120)]
+        else:
+            email = f'user{n}@example.com'
+            if len(emails) < 10000:
+                emails.append(email)
+            yield [f'User{n} Last{n % 997}', email, rng.randint(0, 120)]
+
+
+def write_csv(path, rows, duplicate_ratio=0.0, invalid_ratio=0.0, seed=0):
+    """
+    Writes a users CSV file with a name,email,age header to path.
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'email', 'age'])
+        writer.writerows(generate_rows(rows, duplicate_ratio, invalid_ratio, seed))
+    return path
+
+
+def parse_rows(value):
+    """
+    Parses a row count given as a number or one of SIZES.
+    """
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=parse_rows, default=SIZES['10k'], help='row count or 10k/100k/1m')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='share of duplicate emails')
+    parser.add_argument('--invalid', type=float, default=0.0, help='share of invalid rows')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_csv(args.path, args.rows, args.duplicates, args.invalid, args.seed)
+
+
+if __name__ == '__main__':
+    main()
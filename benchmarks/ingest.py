@@ -0,0 +1,143 @@
+"""
+End-to-end benchmark of the CSV user import.
+
+Generates a synthetic CSV file, spools it like CSVUploadView does and runs
+process_csv_upload (or process_csv_upload_parallel) eagerly against a fresh
+SQLite database, reporting the best of a number of runs. --sqlite-profile
+plain runs it with SQLite's defaults instead of the configured pragmas and
+bulk-load mode, to measure what they are worth.
+
+    BENCHMARK_FAKEREDIS=1 python -m benchmarks.ingest --rows 100k --duplicates 0.05 --invalid 0.05
+"""
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+django.setup()
+
+from django.core.files import File  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from benchmarks.csv_data import SIZES, parse_rows, write_csv  # noqa: E402
+from v1.users.csv_import import storage as upload_storage  # noqa: E402
+from v1.users.models import CustomUser, ImportRowError  # noqa: E402
+from v1.users.tasks import csv_upload as csv_upload_tasks  # noqa: E402
+
+
+TASKS = {
+    'serial': csv_upload_tasks.process_csv_upload,
+    'parallel': csv_upload_tasks.process_csv_upload_parallel,
+}
+
+SQLITE_PROFILES = ('tuned', 'plain')
+
+
+@contextmanager
+def sqlite_profile(profile):
+    """
+    Runs the enclosed code with the configured SQLite pragmas and bulk-load
+    mode ('tuned'), or with a rollback journal and SQLite's default pragmas
+    ('plain').
+    """
+    if profile == 'tuned':
+        yield
+        return
+    options = connection.settings_dict['OPTIONS']
+    connection.close()
+    connection.settings_dict['OPTIONS'] = {}
+    try:
+        with override_settings(CSV_UPLOAD_SQLITE_PRAGMAS={}):
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = delete')
+            yield
+    finally:
+        connection.close()
+        connection.settings_dict['OPTIONS'] = options
+
+
+def prepare_database():
+    """
+    Creates the benchmark database tables.
+    """
+    call_command('migrate', verbosity=0, interactive=False)
+
+
+def reset_database():
+    CustomUser.objects.all().delete()
+    ImportRowError.objects.all().delete()
+
+
+def benchmark(rows, duplicate_ratio=0.0, invalid_ratio=0.0, task='serial', repeat=1, seed=0, profile='tuned'):
+    """
+    Imports a generated file repeat times into an empty users table with
+    the given SQLite profile and returns the statistics of the fastest run.
+    """
+    from django.conf import settings
+
+    prepare_database()
+    path = os.path.join(settings.BENCHMARK_DIR, f'users-{rows}-{duplicate_ratio}-{invalid_ratio}-{seed}.csv')
+    if not os.path.exists(path):
+        write_csv(path, rows, duplicate_ratio, invalid_ratio, seed)
+
+    with sqlite_profile(profile):
+        return _best_run(path, rows, task, repeat, profile)
+
+
+def _best_run(path, rows, task, repeat, profile):
+    best = None
+    for _ in range(repeat):
+        reset_database()
+        with open(path, 'rb') as file:
+            file_name, checksum = upload_storage.spool_upload(File(file, name='upload.csv'))
+
+        started = time.perf_counter()
+        result = TASKS[task].apply(args=(file_name, checksum)).get()
+        elapsed = time.perf_counter() - started
+
+        if best is None or elapsed < best['seconds']:
+            best = {
+                'rows': rows,
+                'task': task,
+                'sqlite_profile': profile,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1),
+                'saved_records': result['saved_records'],
+                'rejected_records': result['rejected_records'],
+                'stage_seconds': {stage: timing['seconds'] for stage, timing in result['stages'].items()},
+            }
+    reset_database()
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=parse_rows, default=SIZES['10k'], help='row count or 10k/100k/1m')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='share of duplicate emails')
+    parser.add_argument('--invalid', type=float, default=0.0, help='share of invalid rows')
+    parser.add_argument('--task', choices=sorted(TASKS), default='serial')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--sqlite-profile', choices=SQLITE_PROFILES, default='tuned')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    stats = benchmark(
+        args.rows, args.duplicates, args.invalid, args.task, args.repeat, profile=args.sqlite_profile
+    )
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    print(
+        f"{stats['rows']} rows ({stats['task']}, {stats['sqlite_profile']} sqlite): {stats['seconds']} s, {stats['rows_per_second']} rows/s, "
+        f"{stats['saved_records']} saved, {stats['rejected_records']} rejected"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark of RateLimitMiddleware.process_request per backend.
+
+Requests are built up front with RequestFactory and spread round-robin over
+a number of client IPs, so only the middleware and its backend are timed.
+
+    BENCHMARK_FAKEREDIS=1 python -m benchmarks.rate_limit --iterations 20000 --ips 1000
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from middleware.rate_limiter.rate_limiter import RateLimitMiddleware  # noqa: E402
+
+
+BACKENDS = [
+    'middleware.rate_limiter.backends.CacheSlidingLogBackend',
+    'middleware.rate_limiter.backends.RedisSlidingLogBackend',
+    'middleware.rate_limiter.backends.RedisSlidingWindowCounterBackend',
+    'middleware.rate_limiter.backends.RedisTokenBucketBackend',
+]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark(backend, iterations=20000, ips=1000, limit=100, window=300):
+    """
+    Times process_request for iterations requests and returns the
+    throughput, latency percentiles in microseconds and the number of
+    allowed and blocked requests.
+    """
+    middleware_class = type('BenchmarkRateLimitMiddleware', (RateLimitMiddleware,), {
+        'RATE_LIMIT_BACKEND': backend,
+        'RATE_LIMIT_MAX_REQUESTS': limit,
+        'RATE_LIMIT_WINDOW_SECONDS': window,
+    })
+    middleware = middleware_class(lambda request: HttpResponse('OK'))
+    factory = RequestFactory()
+    requests = [
+        factory.get('/ping/', REMOTE_ADDR=f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}")
+        for n in range(min(ips, iterations))
+    ]
+    cache.clear()
+
+    timings = []
+    blocked = 0
+    started = time.perf_counter()
+    for n in range(iterations):
+        request = requests[n % len(requests)]
+        call_started = time.perf_counter_ns()
+        response = middleware.process_request(request)
+        timings.append(time.perf_counter_ns() - call_started)
+        if response is not None:
+            blocked += 1
+    elapsed = time.perf_counter() - started
+    cache.clear()
+
+    timings.sort()
+    return {
+        'backend': backend.rsplit('.', 1)[-1],
+        'iterations': iterations,
+        'ips': len(requests),
+        'ops_per_second': round(iterations / elapsed, 1),
+        'p50_us': round(percentile(timings, 0.50) / 1000, 2),
+        'p99_us': round(percentile(timings, 0.99) / 1000, 2),
+        'allowed': iterations - blocked,
+        'blocked': blocked,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', action='append', help='backend path, may be repeated (default: all)')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--ips', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = [
+        benchmark(backend, args.iterations, args.ips, args.limit)
+        for backend in args.backend or BACKENDS
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for stats in results:
+        print(
+            f"{stats['backend']:>32}: {stats['ops_per_second']:>9} ops/s  "
+            f"p50 {stats['p50_us']:>7} us  p99 {stats['p99_us']:>7} us  "
+            f"{stats['allowed']} allowed, {stats['blocked']} blocked"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Settings for the benchmark suite.
+
+gic_test.settings with a throwaway SQLite database and upload spool under
+BENCHMARK_DIR (a new temporary directory by default) and eager Celery, so
+no broker or worker is needed. With BENCHMARK_FAKEREDIS=1 the cache talks
+to an in-process fakeredis instead of the Redis server in CACHES.
+"""
+import os
+import tempfile
+
+from gic_test.settings import *  # noqa: F401,F403
+from gic_test.settings import CACHES, DATABASES, STORAGES
+
+
+BENCHMARK_DIR = os.environ.get('BENCHMARK_DIR') or tempfile.mkdtemp(prefix='gic-benchmarks-')
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BENCHMARK_DIR, 'benchmark.sqlite3'),
+    }
+}
+
+STORAGES = {
+    **STORAGES,
+    'csv_uploads': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.path.join(BENCHMARK_DIR, 'csv_uploads'),
+        },
+    },
+}
+
+CELERY_TASK_ALWAYS_EAGER = True
+
+if os.environ.get('BENCHMARK_FAKEREDIS') == '1':
+    import fakeredis
+
+    CACHES = {
+        alias: {
+            **config,
+            'OPTIONS': {
+                **config.get('OPTIONS', {}),
+                'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeRedisConnection},
+            },
+        }
+        for alias, config in CACHES.items()
+    }
@@ -0,0 +1,141 @@
+"""
+Runs the ingest and rate limit benchmarks and compares result files.
+
+    BENCHMARK_FAKEREDIS=1 python -m benchmarks.suite run --preset quick --output before.json
+    BENCHMARK_FAKEREDIS=1 python -m benchmarks.suite run --preset quick --output after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 0.1
+
+compare exits with status 1 if any metric got worse by more than the
+threshold, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+
+PRESETS = {
+    'quick': {
+        'ingest': [('10k', 10000)],
+        # Baseline without the SQLite pragmas and bulk-load mode
+        'ingest_plain_sqlite': [('10k', 10000)],
+        'rate_limit_iterations': 20000,
+    },
+    'full': {
+        'ingest': [('10k', 10000), ('100k', 100000), ('1m', 1000000)],
+        'ingest_plain_sqlite': [('100k', 100000)],
+        'rate_limit_iterations': 200000,
+    },
+}
+
+# Whether a larger value of a metric is better
+METRICS = {
+    'rows_per_second': True,
+    'seconds': False,
+    'ops_per_second': True,
+    'p50_us': False,
+    'p99_us': False,
+}
+
+
+def run(preset, duplicate_ratio, invalid_ratio, repeat):
+    """
+    Runs the benchmarks of a preset and returns the results keyed by
+    benchmark name.
+    """
+    from benchmarks import ingest, rate_limit
+
+    config = PRESETS[preset]
+    results = {}
+    for label, rows in config['ingest']:
+        results[f'ingest.{label}'] = ingest.benchmark(rows, duplicate_ratio, invalid_ratio, repeat=repeat)
+    for label, rows in config['ingest_plain_sqlite']:
+        results[f'ingest.{label}.plain_sqlite'] = ingest.benchmark(
+            rows, duplicate_ratio, invalid_ratio, repeat=repeat, profile='plain'
+        )
+    for backend in rate_limit.BACKENDS:
+        stats = rate_limit.benchmark(backend, config['rate_limit_iterations'])
+        results[f"rate_limit.{stats['backend']}"] = stats
+
+    return {
+        'meta': {
+            'preset': preset,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'fakeredis': os.environ.get('BENCHMARK_FAKEREDIS') == '1',
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compares the metrics of two result files.
+
+    Returns:
+        list: (benchmark, metric, baseline value, current value, relative
+        change, regressed) for every metric present in both files, where a
+        positive change is an improvement
+    """
+    rows = []
+    for name, stats in sorted(current['results'].items()):
+        baseline_stats = baseline['results'].get(name)
+        if baseline_stats is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = baseline_stats.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old if higher_is_better else (old - new) / old
+            rows.append((name, metric, old, new, change, change < -threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    run_parser.add_argument('--duplicates', type=float, default=0.05, help='share of duplicate emails')
+    run_parser.add_argument('--invalid', type=float, default=0.05, help='share of invalid rows')
+    run_parser.add_argument('--repeat', type=int, default=1, help='ingest runs per size, the fastest is kept')
+    run_parser.add_argument('--output', help='write the results to this JSON file')
+
+    compare_parser = subparsers.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='relative change counted as a regression (default 0.1 = 10%%)'
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+        results = run(args.preset, args.duplicates, args.invalid, args.repeat)
+        output = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, 'w') as file:
+                file.write(output + '\n')
+        print(output)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    rows = compare(baseline, current, args.threshold)
+    for name, metric, old, new, change, regressed in rows:
+        flag = 'REGRESSION' if regressed else ''
+        print(f"{name:<45} {metric:<16} {old:>12} -> {new:<12} {change:+8.1%}  {flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that only outputs the fields named in a ``fields``
+    argument, for sparse field selection.
+
+    Args:
+        fields (iterable): Names of the fields to keep, or None for all
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
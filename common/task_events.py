@@ -0,0 +1,99 @@
+import asyncio
+import json
+import weakref
+from collections import defaultdict
+
+import redis.asyncio
+from celery import Task, states
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from common.task_status import status_data
+
+
+CHANNEL_PREFIX = 'task_events:'
+
+
+def publish_task_event(task_id, state, result):
+    """
+    Publishes the status payload of a task to its Redis channel, for
+    clients waiting on /tasks/<task_id>/events/.
+    """
+    payload = json.dumps(status_data(task_id, state, result), default=str)
+    get_redis_connection('default').publish(f'{CHANNEL_PREFIX}{task_id}', payload)
+
+
+class TaskEventsTask(Task):
+    """
+    Celery task base class publishing a task event once the task has
+    finished and its result is stored.
+    """
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        if status in states.READY_STATES:
+            publish_task_event(task_id, status, retval)
+
+
+class TaskEventHub:
+    """
+    Fans task events out to the coroutines waiting on them.
+
+    One pattern subscription per event loop receives the events of every
+    task, so each waiting client costs an asyncio.Queue instead of a Redis
+    connection.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.waiters = defaultdict(set)
+        self.reader = None
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, task_id):
+        """
+        Returns a queue receiving the status payloads published for
+        task_id from now on.
+        """
+        async with self.lock:
+            if self.reader is None or self.reader.done():
+                pubsub = self.client.pubsub()
+                await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+                self.reader = asyncio.create_task(self._read(pubsub))
+        queue = asyncio.Queue()
+        self.waiters[task_id].add(queue)
+        return queue
+
+    def unsubscribe(self, task_id, queue):
+        queues = self.waiters.get(task_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.waiters[task_id]
+
+    async def _read(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                task_id = message['channel'].decode()[len(CHANNEL_PREFIX):]
+                for queue in self.waiters.get(task_id, ()):
+                    queue.put_nowait(json.loads(message['data']))
+        finally:
+            await pubsub.aclose()
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_task_event_hub():
+    """
+    Returns the TaskEventHub of the running event loop.
+
+    Subscribes to the Redis server of the default cache, or to
+    TASK_EVENTS_REDIS_URL if set.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        location = getattr(settings, 'TASK_EVENTS_REDIS_URL', None) or settings.CACHES['default']['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        _hubs[loop] = TaskEventHub(redis.asyncio.Redis.from_url(location))
+    return _hubs[loop]
@@ -0,0 +1,76 @@
+import time
+
+from celery import current_app, states
+from celery.result import AsyncResult
+from django.conf import settings
+
+from common.ttl_cache import TTLCache
+
+
+# Status payloads of finished tasks, which never change
+terminal_status_cache = TTLCache(max_entries=getattr(settings, 'TASK_STATUS_CACHE_SIZE', 10000))
+
+
+def status_data(task_id, state, result):
+    """
+    Builds the status payload of a task from its state and result.
+    """
+    data = {
+        "task_id": task_id,
+        "status": state,
+    }
+    if state == states.SUCCESS:
+        data["result"] = result
+    elif state == states.FAILURE:
+        data["error"] = str(result)
+    elif state == 'PROGRESS':
+        data["progress"] = result
+    return data
+
+
+def cache_status(data):
+    """
+    Remembers the payload of a finished task for TASK_STATUS_CACHE_TTL seconds.
+    """
+    if data["status"] in states.READY_STATES:
+        ttl = getattr(settings, 'TASK_STATUS_CACHE_TTL', 30)
+        terminal_status_cache.set(data["task_id"], data, expires_at=time.time() + ttl)
+
+
+def get_task_statuses(task_ids):
+    """
+    Returns the status payloads of many tasks, in the order of task_ids.
+
+    Finished tasks are served from the in-process cache; the others are
+    read from a key-value result backend such as Redis with a single
+    MGET, or one lookup per task on other backends.
+    """
+    found = {}
+    missing = []
+    for task_id in task_ids:
+        data = terminal_status_cache.get(task_id)
+        if data is None:
+            missing.append(task_id)
+        else:
+            found[task_id] = data
+
+    if missing:
+        backend = current_app.backend
+        if hasattr(backend, 'mget'):
+            values = backend.mget([backend.get_key_for_task(task_id) for task_id in missing])
+            for task_id, value in zip(missing, values):
+                if value:
+                    meta = backend.decode_result(value)
+                    data = status_data(task_id, meta['status'], meta['result'])
+                else:
+                    data = status_data(task_id, states.PENDING, None)
+                cache_status(data)
+                found[task_id] = data
+        else:
+            for task_id in missing:
+                task_result = AsyncResult(task_id)
+                data = status_data(task_id, task_result.state, task_result.result)
+                cache_status(data)
+                found[task_id] = data
+
+    return [found[task_id] for task_id in task_ids]
@@ -0,0 +1,131 @@
+import json
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from celery import current_app
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from common.task_events import publish_task_event
+from common.task_status import terminal_status_cache
+
+
+class TaskStatusBatchViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('task_status_batch')
+        self.backend = current_app.backend
+        self.task_ids = ['batch-success', 'batch-failure', 'batch-progress', 'batch-pending']
+        self.backend.store_result('batch-success', {'saved_records': 3}, 'SUCCESS')
+        self.backend.store_result('batch-failure', ValueError('Bad file'), 'FAILURE')
+        self.backend.store_result('batch-progress', {'rows_processed': 10}, 'PROGRESS')
+        terminal_status_cache.clear()
+
+    def tearDown(self):
+        for task_id in self.task_ids:
+            self.backend.forget(task_id)
+        terminal_status_cache.clear()
+
+    def test_statuses_in_one_round_trip(self):
+        """Test that every status is read with a single MGET, in request order."""
+        with patch.object(self.backend, 'mget', wraps=self.backend.mget) as mock_mget:
+            response = self.client.post(self.url, {'task_ids': self.task_ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        mock_mget.assert_called_once()
+        self.assertEqual(response.data['results'], [
+            {'task_id': 'batch-success', 'status': 'SUCCESS', 'result': {'saved_records': 3}},
+            {'task_id': 'batch-failure', 'status': 'FAILURE', 'error': 'Bad file'},
+            {'task_id': 'batch-progress', 'status': 'PROGRESS', 'progress': {'rows_processed': 10}},
+            {'task_id': 'batch-pending', 'status': 'PENDING'},
+        ])
+
+    def test_finished_tasks_served_from_cache(self):
+        """Test that finished tasks are not read from the backend again."""
+        self.client.get(self.url, {'ids': 'batch-success,batch-failure'})
+
+        with patch.object(self.backend, 'mget') as mock_mget:
+            response = self.client.get(self.url, {'ids': 'batch-success,batch-failure'})
+            single = self.client.get(reverse('task_status', kwargs={'task_id': 'batch-success'}))
+
+        mock_mget.assert_not_called()
+        self.assertEqual([data['status'] for data in response.data['results']], ['SUCCESS', 'FAILURE'])
+        self.assertEqual(single.data['result'], {'saved_records': 3})
+
+    def test_running_tasks_not_cached(self):
+        """Test that tasks that have not finished are read again on every poll."""
+        self.client.get(self.url, {'ids': 'batch-progress'})
+        self.backend.store_result('batch-progress', {'saved_records': 10}, 'SUCCESS')
+
+        response = self.client.get(self.url, {'ids': 'batch-progress'})
+
+        self.assertEqual(response.data['results'][0]['result'], {'saved_records': 10})
+
+    def test_invalid_requests(self):
+        """Test that missing, malformed or too many task ids are rejected."""
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'task_ids': 'abc'}, format='json').status_code, 400)
+        with patch('common.views.TaskStatusBatchView.MAX_TASK_IDS', 2):
+            response = self.client.get(self.url, {'ids': 'a,b,c'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskEventsViewTests(TestCase):
+    def setUp(self):
+        self.backend = current_app.backend
+        self.url = reverse('task_events', kwargs={'task_id': 'events-task'})
+        terminal_status_cache.clear()
+
+    def tearDown(self):
+        self.backend.forget('events-task')
+        terminal_status_cache.clear()
+
+    async def next_event(self, events):
+        chunk = await anext(events)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith(':'):
+            return chunk
+        return json.loads(chunk[len('data: '):])
+
+    async def test_streams_updates_until_finished(self):
+        """Test that progress and the final status are pushed as they are published."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        self.assertEqual((await self.next_event(events))['status'], 'PENDING')
+
+        await sync_to_async(publish_task_event)('events-task', 'PROGRESS', {'rows_processed': 10})
+        self.assertEqual(await self.next_event(events), {
+            'task_id': 'events-task', 'status': 'PROGRESS', 'progress': {'rows_processed': 10}
+        })
+
+        await sync_to_async(publish_task_event)('events-task', 'SUCCESS', {'saved_records': 10})
+        self.assertEqual((await self.next_event(events))['result'], {'saved_records': 10})
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    async def test_finished_task_ends_immediately(self):
+        """Test that a finished task is reported once without waiting."""
+        await sync_to_async(self.backend.store_result)('events-task', {'saved_records': 1}, 'SUCCESS')
+
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+
+        self.assertEqual((await self.next_event(events))['status'], 'SUCCESS')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    @override_settings(TASK_EVENTS_KEEPALIVE_SECONDS=0.05)
+    async def test_keepalive_and_timeout(self):
+        """Test that idle streams get keepalive comments and end after the timeout."""
+        response = await self.async_client.get(self.url, {'timeout': '0.2'})
+        chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertIn(b'"status": "PENDING"', chunks[0])
+        self.assertIn(b': keepalive\n\n', chunks[1:])
+
+    async def test_invalid_timeout(self):
+        response = await self.async_client.get(self.url, {'timeout': 'soon'})
+        self.assertEqual(response.status_code, 400)
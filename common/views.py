@@ -1,8 +1,18 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from celery import states
 from celery.result import AsyncResult
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from common import task_status
+from common.task_events import get_task_event_hub
 
 
 class TaskStatusView(APIView):
@@ -12,21 +22,116 @@ class TaskStatusView(APIView):
     def get(self, request, task_id):
         """
         Handles GET requests to check task status.
-        Retrieves task status and result using the task ID.
+        Retrieves task status and result using the task ID, including
+        the progress metadata of tasks reporting a PROGRESS state.
+        Finished tasks are answered from a short-lived in-process cache.
         """
+        response_data = task_status.terminal_status_cache.get(task_id)
+        if response_data is not None:
+            return self.respond(response_data)
+
         task_result = AsyncResult(task_id)
-        state = task_result.state
-
-        response_data = {
-            "task_id": task_id,
-            "status": state,
-        }
-
-        if state == 'SUCCESS':
-            response_data["result"] = task_result.result
-            return Response(response_data, status=status.HTTP_200_OK)
-        elif state == 'FAILURE':
-            response_data["error"] = str(task_result.result)
+        response_data = task_status.status_data(task_id, task_result.state, task_result.result)
+        task_status.cache_status(response_data)
+        return self.respond(response_data)
+
+    def respond(self, response_data):
+        if response_data["status"] == 'FAILURE':
             return Response(response_data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
-            return Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+class TaskStatusBatchView(APIView):
+    """
+    API View to check the status of many Celery tasks at once.
+    """
+    MAX_TASK_IDS = getattr(settings, 'TASK_STATUS_BATCH_MAX_IDS', 1000)
+
+    def get(self, request):
+        """
+        Handles GET requests with a comma separated ?ids= list.
+        """
+        task_ids = [task_id for task_id in request.query_params.get('ids', '').split(',') if task_id]
+        return self.statuses(task_ids)
+
+    def post(self, request):
+        """
+        Handles POST requests with a {"task_ids": [...]} body.
+        """
+        task_ids = request.data.get('task_ids') if isinstance(request.data, dict) else None
+        if not isinstance(task_ids, list) or not all(isinstance(task_id, str) for task_id in task_ids):
+            return Response({"error": "task_ids must be a list of task ids."}, status=status.HTTP_400_BAD_REQUEST)
+        return self.statuses(task_ids)
+
+    def statuses(self, task_ids):
+        """
+        Returns the status of every task in one response. Failed tasks
+        are reported with their error instead of failing the response.
+        """
+        if not task_ids:
+            return Response({"error": "No task ids provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(task_ids) > self.MAX_TASK_IDS:
+            return Response(
+                {"error": f"At most {self.MAX_TASK_IDS} task ids can be requested at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({"results": task_status.get_task_statuses(task_ids)}, status=status.HTTP_200_OK)
+
+
+async def task_events(request, task_id):
+    """
+    Streams the status of a Celery task as Server-Sent Events.
+    GET /tasks/<task_id>/events/?timeout=300
+
+    Sends the current status, then every PROGRESS update and the final
+    status as they are published, and ends once the task has finished or
+    after timeout seconds (at most TASK_EVENTS_MAX_TIMEOUT). Comment lines
+    are sent every TASK_EVENTS_KEEPALIVE_SECONDS to keep proxies from
+    closing an idle stream. Under ASGI a waiting client costs one idle
+    coroutine rather than a worker thread.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET method allowed'}, status=405)
+
+    max_timeout = getattr(settings, 'TASK_EVENTS_MAX_TIMEOUT', 300)
+    try:
+        timeout = min(float(request.GET.get('timeout', max_timeout)), max_timeout)
+    except ValueError:
+        return JsonResponse({'error': 'timeout must be a number of seconds'}, status=400)
+
+    response = StreamingHttpResponse(
+        _stream_task_events(task_id, timeout, getattr(settings, 'TASK_EVENTS_KEEPALIVE_SECONDS', 15)),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _stream_task_events(task_id, timeout, keepalive):
+    hub = get_task_event_hub()
+    # Subscribe before reading the current status so no update is missed
+    queue = await hub.subscribe(task_id)
+    try:
+        data = (await sync_to_async(task_status.get_task_statuses)([task_id]))[0]
+        yield _server_sent_event(data)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while data["status"] not in states.READY_STATES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=min(remaining, keepalive))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield _server_sent_event(data)
+    finally:
+        hub.unsubscribe(task_id, queue)
+
+
+def _server_sent_event(data):
+    return f'data: {json.dumps(data, default=str)}\n\n'
@@ -44,9 +44,12 @@ INSTALLED_APPS = [
 
     #internal apps
     'v1.users',
+    'middleware.rate_limiter',
 ]
 
 MIDDLEWARE = [
+    # First, so it times everything below it
+    'middleware.metrics.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,8 +62,36 @@ MIDDLEWARE = [
     "middleware.rate_limiter.rate_limiter.RateLimitMiddleware",
 ]
 
+METRICS_FLUSH_SECONDS = 5.0  # how often each process adds its samples to Redis
+METRICS_REDIS_KEY = 'metrics'  # hash holding the samples of all processes
+METRICS_REDIS_TIMEOUT = 0.25  # seconds a flush waits for redis before giving up
+METRICS_MAX_BACKOFF_SECONDS = 60.0  # longest wait between flushes while redis is unreachable
+
 RATE_LIMIT_MAX_REQUESTS = 100  # requests per window
 RATE_LIMIT_WINDOW_SECONDS = 300  # 5 minutes
+# Counting backend: RedisSlidingLogBackend does the exact check in one
+# atomic Lua call, RedisSlidingWindowCounterBackend / RedisTokenBucketBackend
+# trade a little accuracy for constant memory per client, and
+# CacheSlidingLogBackend is a fallback for caches other than django-redis
+# that can under-count concurrent requests
+RATE_LIMIT_BACKEND = 'middleware.rate_limiter.backends.RedisSlidingLogBackend'
+RATE_LIMIT_DENY_CACHE_SIZE = 10000  # blocked clients remembered per process, 0 disables
+RATE_LIMIT_DENY_CACHE_SYNC_SECONDS = 1.0  # longest a clear in another process leaves clients blocked here
+RATE_LIMIT_ASYNC_REDIS_MAX_CONNECTIONS = 100  # redis.asyncio pool size per process under ASGI
+RATE_LIMIT_CLEAR_BATCH_SIZE = 1000  # keys per SCAN / UNLINK batch when clearing
+# Per-route overrides of the limits above. Entries match a path prefix or a
+# URL name, optionally only for some methods, and count requests by 'ip',
+# 'user' or 'header:<Name>' (hashed in the key, falling back to the IP when
+# missing; only use headers set by a trusted proxy, since clients can send
+# any value). 'user' only recognises session logins: DRF token and basic
+# auth run inside the view, so those clients are counted by IP. A limit of
+# None exempts the route. Example:
+# RATE_LIMIT_POLICIES = [
+#     {'name': 'csv_upload', 'url_name': 'csv_upload', 'methods': ['POST'],
+#      'identity': 'user', 'limit': 10, 'window': 60},
+#     {'name': 'tasks', 'path': '/tasks/', 'methods': ['GET'], 'limit': 1000, 'window': 60},
+# ]
+RATE_LIMIT_POLICIES = []
 
 ROOT_URLCONF = 'gic_test.urls'
 
@@ -86,10 +117,27 @@ WSGI_APPLICATION = 'gic_test.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',  # readers don't block the writer and commits append to a log
+    'synchronous': 'normal',  # with WAL, fsync at checkpoints instead of every commit
+    'cache_size': -64000,  # page cache in KiB (negative) or pages
+    'temp_store': 'memory',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,  # seconds a connection is reused across requests and celery tasks
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Take the write lock when a transaction starts, so concurrent writers wait
+            # for up to timeout seconds instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -130,6 +178,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # Spool for uploaded CSV files waiting to be imported
+    'csv_uploads': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': BASE_DIR / 'spool' / 'csv_uploads',
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -144,6 +208,40 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_ENABLE_UTC = True
+# Import tasks are acknowledged late, so the broker redelivers them only
+# after this long; it must exceed the longest import
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 6 * 60 * 60}
+CELERY_BEAT_SCHEDULE = {
+    'expire-csv-import-records': {
+        'task': 'v1.users.tasks.csv_upload.expire_csv_import_records',
+        'schedule': 60 * 60,
+    },
+}
+
+CSV_UPLOAD_BATCH_SIZE = 1000  # rows per bulk_create / transaction
+CSV_UPLOAD_PROFILE_DIR = None  # directory to store a cProfile profile and folded stacks of every import in
+CSV_UPLOAD_SQLITE_PRAGMAS = {  # set while an import runs, restored afterwards
+    # 'off' is faster but an OS crash or power loss mid-import can corrupt the database
+    'synchronous': 'normal',
+    'cache_size': -256000,
+}
+CSV_UPLOAD_LOOKUP_CHUNK_SIZE = 500  # values per email/username __in lookup
+CSV_UPLOAD_PARALLEL_MIN_BYTES = 20 * 1024 * 1024  # uploads this large are split into chunk subtasks
+CSV_UPLOAD_CHUNK_ROWS = 50000  # rows per chunk subtask
+CSV_UPLOAD_PROGRESS_EVERY_ROWS = 1000  # publish PROGRESS at most every N rows...
+CSV_UPLOAD_PROGRESS_EVERY_SECONDS = 2.0  # ...or every T seconds, whichever comes first
+CSV_UPLOAD_ERROR_FLUSH_SIZE = 1000  # rejected rows buffered before writing ImportRowError records
+CSV_UPLOAD_IDEMPOTENCY_TTL = 24 * 60 * 60  # seconds an identical upload returns the earlier task id
+USERS_PAGE_SIZE = 100  # default page size of the /v1/users/ listing
+USERS_EXPORT_CHUNK_SIZE = 2000  # rows fetched per round trip by /v1/users/export/
+TASK_STATUS_CACHE_TTL = 30  # seconds finished task statuses are served from memory
+TASK_STATUS_CACHE_SIZE = 10000  # finished task statuses kept per process
+TASK_STATUS_BATCH_MAX_IDS = 1000  # task ids per /tasks/status/ request
+TASK_EVENTS_MAX_TIMEOUT = 300  # longest /tasks/<id>/events/ stream, in seconds
+TASK_EVENTS_KEEPALIVE_SECONDS = 15  # idle time before an SSE keepalive comment
+CSV_IMPORT_ERRORS_PAGE_SIZE = 100  # default page size of /tasks/<id>/errors/
+CSV_IMPORT_ERRORS_TTL = 7 * 24 * 60 * 60  # seconds rejected rows are kept before the periodic cleanup deletes them
+CSV_IMPORT_CHECKPOINT_TTL = 24 * 60 * 60  # seconds import checkpoints are kept; must exceed the broker visibility_timeout
 
 CACHES = {
     'default': {
@@ -17,11 +17,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from common.views import TaskStatusView
+from common.views import TaskStatusBatchView, TaskStatusView, task_events
+from middleware.metrics.views import metrics
+from v1.users.views.csv_upload import ImportErrorsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('tasks/status/', TaskStatusBatchView.as_view(), name='task_status_batch'),
     path('tasks/<str:task_id>/status/', TaskStatusView.as_view(), name='task_status'),
+    path('tasks/<str:task_id>/events/', task_events, name='task_events'),
+    path('tasks/<str:task_id>/errors/', ImportErrorsView.as_view(), name='task_errors'),
     path('v1/users/', include('v1.users.urls')),
     path('rate-limiter/', include('middleware.rate_limiter.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
@@ -0,0 +1,3 @@
+"""
+Request metrics middleware and Prometheus endpoint
+"""
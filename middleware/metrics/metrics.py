@@ -0,0 +1,57 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .registry import registry
+
+# Request methods recorded as their own label value; anything else a client
+# sends is labelled "other" so the number of series stays bounded
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+class MetricsMiddleware:
+    """
+    Records the latency and status code of every request, labelled with
+    the name of the URL pattern that handled it.
+
+    Place it first in MIDDLEWARE so the time spent in the other
+    middleware, such as RateLimitMiddleware, is included. Requests that
+    never reach a view (rejected by the rate limiter, or unknown paths)
+    are labelled with an empty view name.
+
+    Samples are kept in process memory and flushed to Redis every
+    METRICS_FLUSH_SECONDS by a background thread (see registry.py), so
+    recording a request costs a few microseconds and never waits for Redis.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        registry.start()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        """
+        Adds the request to the latency histogram and status counter.
+        """
+        match = request.resolver_match
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        labels = (('view', match.view_name if match is not None else ''), ('method', method))
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.inc('http_responses_total', labels + (('status', str(response.status_code)),))
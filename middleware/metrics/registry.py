@@ -0,0 +1,266 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from redis.exceptions import RedisError
+
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help) of every metric family that can be rendered
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Time spent handling a request, by URL name.'),
+    'http_responses_total': ('counter', 'Responses sent, by URL name and status code.'),
+    'rate_limit_backend_duration_seconds': ('histogram', 'Time spent in rate limit backend calls.'),
+    'rate_limit_decisions_total': ('counter', 'Rate limit checks, by outcome.'),
+    'csv_import_stage_seconds_total': ('counter', 'Time spent in each stage of CSV imports.'),
+    'csv_import_stage_calls_total': ('counter', 'Times each stage of CSV imports was entered.'),
+}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram whose counts are preallocated, so an
+    observation is a binary search and two additions.
+    """
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # The last slot counts observations above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Collects counters and histograms in process memory and periodically
+    adds them to a Redis hash, so the metrics of every worker process are
+    aggregated in one place.
+
+    Recording only touches process memory. A background thread, started
+    with start(), sends the deltas collected since the last flush every
+    ``flush_interval`` seconds with one pipelined round trip, so requests
+    never wait for Redis. Redis calls time out after ``timeout`` seconds;
+    when they fail the deltas are kept for the next flush, which is backed
+    off exponentially up to ``max_backoff`` seconds.
+
+    Args:
+        key (str): Redis hash the samples are added to
+        flush_interval (float): Seconds between flushes
+        cache_alias (str): Cache whose Redis server is used
+        buckets (tuple): Histogram bucket upper bounds in seconds
+        timeout (float): Socket connect and read timeout of Redis calls
+        max_backoff (float): Longest wait between flushes while Redis fails
+    """
+    def __init__(self, key='metrics', flush_interval=5.0, cache_alias='default', buckets=DEFAULT_BUCKETS,
+                 timeout=0.25, max_backoff=60.0):
+        self.key = key
+        self.flush_interval = flush_interval
+        self.cache_alias = cache_alias
+        self.buckets = tuple(buckets)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.histograms = {}
+        self.counters = defaultdict(int)
+        self.pending = defaultdict(int)
+        self.lock = threading.Lock()
+        # Serializes flushes, so collect() sees every sample drained before it
+        self.flush_lock = threading.Lock()
+        self.failures = 0
+        self.next_flush = time.monotonic() + flush_interval
+        self.flusher_pid = None
+        self.client = None
+
+    def observe(self, name, labels, value):
+        """
+        Records value in the histogram name with the given labels.
+
+        Args:
+            name (str): Metric family name
+            labels (tuple): (label, value) pairs
+            value (float): Observed duration in seconds
+        """
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        """
+        Adds amount to the counter name with the given labels.
+        """
+        with self.lock:
+            self.counters[(name, labels)] += amount
+
+    def start(self):
+        """
+        Starts the background thread flushing the samples of this process,
+        once per process.
+        """
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(max(self.next_flush - time.monotonic(), 0.01))
+            if time.monotonic() >= self.next_flush:
+                self.flush()
+
+    def get_client(self):
+        """
+        Returns a Redis client for the cache's server with short timeouts,
+        so an unreachable server cannot stall the caller for long.
+        """
+        if self.client is None:
+            config = settings.CACHES[self.cache_alias]
+            location = config['LOCATION']
+            if isinstance(location, (list, tuple)):
+                location = location[0]
+            pool = redis.ConnectionPool.from_url(location, **{
+                **config.get('OPTIONS', {}).get('CONNECTION_POOL_KWARGS', {}),
+                'socket_timeout': self.timeout,
+                'socket_connect_timeout': self.timeout,
+            })
+            self.client = redis.Redis(connection_pool=pool)
+        return self.client
+
+    def flush(self):
+        """
+        Adds the samples recorded since the last flush to the Redis hash.
+
+        Returns:
+            bool: Whether the samples were sent
+        """
+        with self.flush_lock:
+            with self.lock:
+                histograms, self.histograms = self.histograms, {}
+                counters, self.counters = self.counters, defaultdict(int)
+                pending, self.pending = self.pending, defaultdict(int)
+            for (name, labels), histogram in histograms.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    pending[sample_field(f'{name}_bucket', labels + (('le', str(bound)),))] += cumulative
+                pending[sample_field(f'{name}_sum', labels)] += histogram.sum
+                pending[sample_field(f'{name}_count', labels)] += cumulative
+            for (name, labels), value in counters.items():
+                pending[sample_field(name, labels)] += value
+
+            try:
+                if pending:
+                    pipeline = self.get_client().pipeline(transaction=False)
+                    for field, value in pending.items():
+                        if isinstance(value, float):
+                            pipeline.hincrbyfloat(self.key, field, value)
+                        else:
+                            pipeline.hincrby(self.key, field, value)
+                    pipeline.execute()
+            except RedisError:
+                with self.lock:
+                    for field, value in pending.items():
+                        self.pending[field] += value
+                self.failures += 1
+                backoff = min(self.flush_interval * 2 ** self.failures, self.max_backoff)
+                self.next_flush = time.monotonic() + backoff
+                return False
+            self.failures = 0
+            self.next_flush = time.monotonic() + self.flush_interval
+            return True
+
+    def collect(self):
+        """
+        Returns the aggregated samples of every process as
+        {field: value}, after flushing this process.
+        """
+        self.flush()
+        return {
+            field.decode(): float(value)
+            for field, value in self.get_client().hgetall(self.key).items()
+        }
+
+    def reset(self):
+        """
+        Drops the local samples and the aggregated ones in Redis.
+        """
+        with self.lock:
+            self.histograms = {}
+            self.counters = defaultdict(int)
+            self.pending = defaultdict(int)
+        self.get_client().delete(self.key)
+
+
+def sample_field(sample_name, labels):
+    """
+    Returns the Prometheus sample line prefix for a sample, used as its
+    field in the Redis hash, e.g. ``http_responses_total{status="200"}``.
+    """
+    if not labels:
+        return sample_name
+    rendered = ','.join(f'{label}="{_escape(value)}"' for label, value in labels)
+    return f'{sample_name}{{{rendered}}}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(samples):
+    """
+    Renders samples as returned by MetricsRegistry.collect() in the
+    Prometheus text exposition format.
+    """
+    families = defaultdict(list)
+    for field, value in samples.items():
+        sample_name = field.split('{', 1)[0]
+        family = sample_name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if sample_name.endswith(suffix) and sample_name[:-len(suffix)] in METRICS:
+                family = sample_name[:-len(suffix)]
+        families[family].append((field, value))
+
+    lines = []
+    for family in sorted(families):
+        metric_type, help_text = METRICS.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {metric_type}')
+        for field, value in sorted(families[family], key=_sample_order):
+            lines.append(f'{field} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sample_order(sample):
+    # Within a series: buckets in increasing le order, then _count and _sum
+    sample_name, _, labels = sample[0].partition('{')
+    labels = labels.rstrip('}')
+    if sample_name.endswith('_bucket'):
+        labels, _, le = labels.rpartition('le="')
+        return labels.rstrip(','), 0, float(le.rstrip('"'))
+    return labels, 1, sample_name
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+registry = MetricsRegistry(
+    key=getattr(settings, 'METRICS_REDIS_KEY', 'metrics'),
+    flush_interval=getattr(settings, 'METRICS_FLUSH_SECONDS', 5.0),
+    cache_alias=getattr(settings, 'METRICS_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'METRICS_REDIS_TIMEOUT', 0.25),
+    max_backoff=getattr(settings, 'METRICS_MAX_BACKOFF_SECONDS', 60.0),
+)
@@ -0,0 +1,137 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from unittest.mock import patch
+from redis.exceptions import ConnectionError
+
+from .metrics import MetricsMiddleware
+from .registry import Histogram, MetricsRegistry, registry, render
+
+
+class HistogramTests(TestCase):
+    def test_observations_land_in_upper_bound_bucket(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+
+class MetricsRegistryTests(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(key='metrics:test', buckets=(0.1, 1.0))
+        self.registry.reset()
+
+    def tearDown(self):
+        self.registry.reset()
+
+    def test_flush_aggregates_in_redis(self):
+        """Test that samples from several flushes, or processes, add up."""
+        other_process = MetricsRegistry(key='metrics:test', buckets=(0.1, 1.0))
+        labels = (('view', 'ping'),)
+        self.registry.observe('http_request_duration_seconds', labels, 0.05)
+        self.registry.inc('http_responses_total', labels + (('status', '200'),))
+        self.registry.flush()
+        other_process.observe('http_request_duration_seconds', labels, 0.5)
+        other_process.inc('http_responses_total', labels + (('status', '200'),))
+        other_process.flush()
+
+        samples = self.registry.collect()
+
+        self.assertEqual(samples['http_request_duration_seconds_bucket{view="ping",le="0.1"}'], 1)
+        self.assertEqual(samples['http_request_duration_seconds_bucket{view="ping",le="1.0"}'], 2)
+        self.assertEqual(samples['http_request_duration_seconds_bucket{view="ping",le="+Inf"}'], 2)
+        self.assertEqual(samples['http_request_duration_seconds_count{view="ping"}'], 2)
+        self.assertAlmostEqual(samples['http_request_duration_seconds_sum{view="ping"}'], 0.55)
+        self.assertEqual(samples['http_responses_total{view="ping",status="200"}'], 2)
+
+    def test_samples_kept_when_redis_unavailable(self):
+        self.registry.inc('http_responses_total', (('status', '200'),))
+        with patch.object(self.registry, 'get_client', side_effect=ConnectionError):
+            self.assertFalse(self.registry.flush())
+
+        self.assertEqual(self.registry.collect(), {'http_responses_total{status="200"}': 1})
+
+    def test_flush_backs_off_while_redis_unavailable(self):
+        self.registry.inc('http_responses_total', (('status', '200'),))
+        with patch.object(self.registry, 'get_client', side_effect=ConnectionError):
+            self.registry.flush()
+            first_delay = self.registry.next_flush - time.monotonic()
+            self.registry.flush()
+            second_delay = self.registry.next_flush - time.monotonic()
+
+        self.assertGreater(second_delay, first_delay)
+        self.assertLessEqual(second_delay, self.registry.max_backoff)
+        self.assertTrue(self.registry.flush())
+        self.assertEqual(self.registry.failures, 0)
+
+    def test_render_prometheus_text(self):
+        self.registry.observe('http_request_duration_seconds', (), 0.5)
+        self.registry.inc('http_responses_total', (('status', '200'),), 3)
+
+        self.assertEqual(render(self.registry.collect()), (
+            '# HELP http_request_duration_seconds Time spent handling a request, by URL name.\n'
+            '# TYPE http_request_duration_seconds histogram\n'
+            'http_request_duration_seconds_bucket{le="0.1"} 0\n'
+            'http_request_duration_seconds_bucket{le="1.0"} 1\n'
+            'http_request_duration_seconds_bucket{le="+Inf"} 1\n'
+            'http_request_duration_seconds_count 1\n'
+            'http_request_duration_seconds_sum 0.5\n'
+            '# HELP http_responses_total Responses sent, by URL name and status code.\n'
+            '# TYPE http_responses_total counter\n'
+            'http_responses_total{status="200"} 3\n'
+        ))
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+        cache.clear()
+
+    def test_unresolved_request_recorded(self):
+        middleware = MetricsMiddleware(lambda request: HttpResponse(status=404))
+        middleware(RequestFactory().get('/missing/'))
+
+        samples = registry.collect()
+        self.assertEqual(samples['http_responses_total{view="",method="GET",status="404"}'], 1)
+        self.assertEqual(samples['http_request_duration_seconds_count{view="",method="GET"}'], 1)
+
+    def test_unknown_method_labelled_other(self):
+        middleware = MetricsMiddleware(lambda request: HttpResponse(status=405))
+        middleware(RequestFactory().generic('FOOBAR', '/missing/'))
+
+        samples = registry.collect()
+        self.assertEqual(samples['http_responses_total{view="",method="other",status="405"}'], 1)
+
+    def test_request_does_not_flush(self):
+        """Test that a due flush is left to the background thread."""
+        middleware = MetricsMiddleware(lambda request: HttpResponse())
+        flushed_by = []
+        with patch.object(registry, 'flush', side_effect=lambda: flushed_by.append(threading.current_thread())):
+            registry.next_flush = 0
+            middleware(RequestFactory().get('/missing/'))
+
+        self.assertNotIn(threading.current_thread(), flushed_by)
+
+    def test_metrics_endpoint(self):
+        """Test that requests and rate limiter calls show up in /metrics."""
+        self.client.get(reverse('rate_limiter:ping'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_responses_total{view="rate_limiter:ping",method="GET",status="200"} 1\n', body)
+        self.assertIn('http_request_duration_seconds_count{view="rate_limiter:ping",method="GET"} 1\n', body)
+        self.assertIn('rate_limit_backend_duration_seconds_count{backend="RedisSlidingLogBackend"}', body)
+        self.assertIn('rate_limit_decisions_total{result="allowed"}', body)
@@ -0,0 +1,21 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from redis.exceptions import RedisError
+
+from .registry import registry, render
+
+
+@require_GET
+def metrics(request):
+    """
+    API endpoint exposing the metrics of every worker process in the
+    Prometheus text format.
+    """
+    try:
+        samples = registry.collect()
+    except RedisError:
+        return HttpResponse('metrics store unavailable\n', status=503, content_type='text/plain; charset=utf-8')
+    return HttpResponse(
+        render(samples),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,313 @@
+import asyncio
+import itertools
+import os
+import weakref
+from collections import namedtuple
+
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'remaining', 'reset', 'retry_at'], defaults=(None,))
+RateLimitResult.__doc__ = """
+Outcome of counting one request against a limit.
+
+allowed (bool): Whether the request is within the limit
+remaining (int): Requests left in the window; the sliding log backends
+    go negative once exceeded since they also count rejected requests
+reset (float): Unix time at which the limit resets, or for the token
+    bucket, when the next request will be allowed once rejected
+retry_at (float): For a rejected request, the Unix time at which the
+    backend would allow the next one if no more requests arrive, or None
+    if the backend cannot tell
+"""
+
+
+class BaseRateLimitBackend:
+    """
+    Base class for rate limit storage backends.
+
+    A backend records one request for a key and reports whether it is
+    within ``limit`` requests per ``window`` seconds. ``now`` is passed in
+    by the caller so every backend shares the same clock.
+    """
+    def __init__(self, cache_alias=None):
+        self.cache_alias = cache_alias or getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')
+        self.cache = caches[self.cache_alias]
+
+    def hit(self, key, limit, window, now):
+        """
+        Records a request for key and returns a RateLimitResult.
+        """
+        raise NotImplementedError
+
+    async def ahit(self, key, limit, window, now):
+        """
+        Async version of hit(). Runs hit() in a thread unless overridden.
+        """
+        return await sync_to_async(self.hit)(key, limit, window, now)
+
+
+class CacheSlidingLogBackend(BaseRateLimitBackend):
+    """
+    Exact sliding log stored as a list of timestamps in Django's cache.
+
+    Works with any cache backend, but costs a get and a set per request
+    and concurrent requests for the same key can under-count. Its async
+    path uses the cache's aget/aset, which django-redis runs in threads,
+    so under ASGI it still costs two thread hops per request.
+    """
+    def hit(self, key, limit, window, now):
+        request_timestamps = self._add_timestamp(self.cache.get(key, []), window, now)
+        self.cache.set(key, request_timestamps, timeout=window + 60)
+        return self._result(request_timestamps, limit, window, now)
+
+    async def ahit(self, key, limit, window, now):
+        request_timestamps = self._add_timestamp(await self.cache.aget(key, []), window, now)
+        await self.cache.aset(key, request_timestamps, timeout=window + 60)
+        return self._result(request_timestamps, limit, window, now)
+
+    def _add_timestamp(self, request_timestamps, window, now):
+        request_timestamps = [
+            timestamp for timestamp in request_timestamps
+            if timestamp > now - window
+        ]
+        request_timestamps.append(now)
+        return request_timestamps
+
+    def _result(self, request_timestamps, limit, window, now):
+        count = len(request_timestamps)
+        if count <= limit:
+            return RateLimitResult(True, limit - count, now + window)
+        return RateLimitResult(
+            False, limit - count, now + window, sliding_log_retry_at(sorted(request_timestamps), limit, window)
+        )
+
+
+def sliding_log_retry_at(timestamps, limit, window):
+    """
+    Returns when a sliding log holding the sorted timestamps allows a
+    request again: once every entry up to the oldest one that keeps the
+    count at the limit has left the window.
+    """
+    if limit < 1:
+        return None
+    return timestamps[len(timestamps) - limit] + window
+
+
+class BaseRedisRateLimitBackend(BaseRateLimitBackend):
+    """
+    Base class for backends that run their check as a single Lua script
+    on the Redis server behind a django-redis cache. Keys share the
+    cache's key prefix.
+
+    The sync path uses django-redis's connection pool. The async path uses
+    a redis.asyncio client whose connection pool is shared by every
+    backend on the same event loop.
+
+    Subclasses define SCRIPT, script_args() and to_result().
+    """
+    SCRIPT = None
+
+    def __init__(self, cache_alias=None):
+        super().__init__(cache_alias)
+        self.client = get_redis_connection(self.cache_alias)
+        self.script = self.client.register_script(self.SCRIPT)
+        self.async_scripts = weakref.WeakKeyDictionary()
+
+    def script_args(self, limit, window, now):
+        """
+        Returns the ARGV passed to SCRIPT.
+        """
+        raise NotImplementedError
+
+    def to_result(self, reply, limit, window, now):
+        """
+        Converts the script's reply into a RateLimitResult.
+        """
+        raise NotImplementedError
+
+    def hit(self, key, limit, window, now):
+        reply = self.script(
+            keys=[self.cache.make_key(key)],
+            args=self.script_args(limit, window, now)
+        )
+        return self.to_result(reply, limit, window, now)
+
+    async def ahit(self, key, limit, window, now):
+        loop = asyncio.get_running_loop()
+        script = self.async_scripts.get(loop)
+        if script is None:
+            script = get_async_redis(self.cache_alias).register_script(self.SCRIPT)
+            self.async_scripts[loop] = script
+        reply = await script(
+            keys=[self.cache.make_key(key)],
+            args=self.script_args(limit, window, now)
+        )
+        return self.to_result(reply, limit, window, now)
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis(cache_alias):
+    """
+    Returns a redis.asyncio client for the Redis server of a django-redis
+    cache, sharing one connection pool per cache alias and event loop.
+
+    RATE_LIMIT_ASYNC_REDIS_URL overrides the cache LOCATION and
+    RATE_LIMIT_ASYNC_REDIS_MAX_CONNECTIONS caps the pool size.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if cache_alias not in clients:
+        location = getattr(settings, 'RATE_LIMIT_ASYNC_REDIS_URL', None) or settings.CACHES[cache_alias]['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        pool = redis.asyncio.ConnectionPool.from_url(
+            location,
+            max_connections=getattr(settings, 'RATE_LIMIT_ASYNC_REDIS_MAX_CONNECTIONS', 100)
+        )
+        clients[cache_alias] = redis.asyncio.Redis(connection_pool=pool)
+    return clients[cache_alias]
+
+
+class RedisSlidingLogBackend(BaseRedisRateLimitBackend):
+    """
+    Exact sliding log kept in a Redis sorted set and updated atomically by
+    a Lua script, so each request costs one round trip and concurrent
+    requests are counted correctly.
+
+    Memory grows with the number of requests in the window.
+    """
+    SCRIPT = """
+    local key = KEYS[1]
+    local now = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local key_type = redis.call('TYPE', key)['ok']
+    if key_type ~= 'zset' and key_type ~= 'none' then
+        redis.call('DEL', key)
+    end
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, ARGV[4])
+    local count = redis.call('ZCARD', key)
+    local limit = tonumber(ARGV[5])
+    if count <= limit or limit < 1 then
+        return {count, false}
+    end
+    -- The request is allowed again once this entry leaves the window
+    local blocking = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+    return {count, tostring(tonumber(blocking[2]) + window)}
+    """
+
+    def __init__(self, cache_alias=None):
+        super().__init__(cache_alias)
+        self.member_ids = itertools.count()
+        self.member_prefix = f"{os.getpid()}:{id(self)}"
+
+    def script_args(self, limit, window, now):
+        member = f"{now!r}:{self.member_prefix}:{next(self.member_ids)}"
+        return [now, window, member, int((window + 60) * 1000), limit]
+
+    def to_result(self, reply, limit, window, now):
+        count, retry_at = reply
+        return RateLimitResult(
+            count <= limit, limit - count, now + window, float(retry_at) if retry_at else None
+        )
+
+
+class RedisSlidingWindowCounterBackend(BaseRedisRateLimitBackend):
+    """
+    Approximate sliding window built from two fixed-window counters.
+
+    The previous window's count is weighted by how much of it still
+    overlaps the sliding window and added to the current count. Memory
+    and work per key are constant; the estimate assumes requests were
+    spread evenly over the previous window. Rejected requests are not
+    counted.
+    """
+    SCRIPT = """
+    local key = KEYS[1]
+    local now = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    local current_window = math.floor(now / window)
+    if redis.call('TYPE', key)['ok'] ~= 'hash' then
+        redis.call('DEL', key)
+    end
+    local state = redis.call('HMGET', key, 'window', 'current', 'previous')
+    local stored_window = tonumber(state[1])
+    local current = tonumber(state[2]) or 0
+    local previous = tonumber(state[3]) or 0
+    if stored_window ~= current_window then
+        if stored_window == current_window - 1 then
+            previous = current
+        else
+            previous = 0
+        end
+        current = 0
+    end
+    local elapsed = now - current_window * window
+    local estimate = previous * (window - elapsed) / window + current
+    local allowed = 0
+    if estimate + 1 <= limit then
+        allowed = 1
+        current = current + 1
+        estimate = estimate + 1
+    end
+    redis.call('HSET', key, 'window', current_window, 'current', current, 'previous', previous)
+    redis.call('PEXPIRE', key, math.ceil(window * 2000))
+    return {allowed, math.floor(limit - estimate), tostring((current_window + 1) * window)}
+    """
+
+    def script_args(self, limit, window, now):
+        return [now, window, limit]
+
+    def to_result(self, reply, limit, window, now):
+        allowed, remaining, reset = reply
+        # Rejected requests are not counted, but when the estimate drops
+        # below the limit depends on the weighting, so no retry_at is given
+        return RateLimitResult(bool(allowed), remaining, float(reset))
+
+
+class RedisTokenBucketBackend(BaseRedisRateLimitBackend):
+    """
+    Token bucket implemented with the generic cell rate algorithm (GCRA).
+
+    Only the theoretical arrival time of the next request is stored, so
+    memory and work per key are constant. Up to ``limit`` requests may
+    arrive in a burst, after which capacity refills at one request every
+    ``window / limit`` seconds. Rejected requests are not counted.
+    """
+    SCRIPT = """
+    local key = KEYS[1]
+    local now = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    local interval = window / limit
+    if redis.call('TYPE', key)['ok'] ~= 'string' then
+        redis.call('DEL', key)
+    end
+    local tat = tonumber(redis.call('GET', key)) or now
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval
+    local allow_at = new_tat - window
+    if now < allow_at then
+        return {0, 0, tostring(allow_at)}
+    end
+    redis.call('SET', key, tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, math.floor((window - (new_tat - now)) / interval + 1e-9), tostring(new_tat)}
+    """
+
+    def script_args(self, limit, window, now):
+        return [now, window, limit]
+
+    def to_result(self, reply, limit, window, now):
+        allowed, remaining, reset = reply
+        reset = float(reset)
+        return RateLimitResult(bool(allowed), remaining, reset, None if allowed else reset)
@@ -0,0 +1,84 @@
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+from .policies import DefaultRateLimitPolicy, RateLimitPolicy, hash_header_identity
+
+
+def escape_pattern(value):
+    """
+    Escapes glob characters so value only matches itself in a SCAN pattern.
+    """
+    return re.sub(r'([*?\[\]\\])', r'\\\1', value)
+
+
+def policy_keys(identity):
+    """
+    Returns the rate limit keys of one client identity under the default
+    policy and every policy in RATE_LIMIT_POLICIES. A header identity is
+    given as ``header:<Name>:<value>`` and hashed like the middleware does.
+    """
+    if identity.startswith('header:') and identity.count(':') >= 2:
+        name, value = identity[len('header:'):].split(':', 1)
+        identity = hash_header_identity(f'header:{name}', value)
+    keys = [DefaultRateLimitPolicy(None, None).cache_key(identity)]
+    for entry in getattr(settings, 'RATE_LIMIT_POLICIES', []):
+        keys.append(RateLimitPolicy(entry['name'], None, None).cache_key(identity))
+    return keys
+
+
+def clear_rate_limit_keys(prefix='', identity=None, batch_size=None, on_progress=None):
+    """
+    Deletes rate limiter keys without blocking Redis.
+
+    Walks the keyspace with SCAN in batches of batch_size keys and deletes
+    each batch with a pipelined UNLINK, so Redis frees the memory in the
+    background and other clients (the Celery broker and result backend
+    share the instance) are never stalled by a full-keyspace KEYS call.
+    When identity is given its keys are deleted directly without scanning.
+
+    Args:
+        prefix (str): Only clear keys starting with rate_limit:<prefix>
+        identity (str): Only clear the keys of this client identity
+        batch_size (int): Keys per SCAN call and UNLINK pipeline
+        on_progress (callable): Called with the running total after each batch
+
+    Returns:
+        int: Number of keys deleted
+    """
+    cache_alias = getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')
+    batch_size = batch_size or getattr(settings, 'RATE_LIMIT_CLEAR_BATCH_SIZE', 1000)
+    cache = caches[cache_alias]
+    client = get_redis_connection(cache_alias)
+
+    if identity is not None:
+        keys = [cache.make_key(key) for key in policy_keys(identity)]
+        cleared = client.unlink(*keys)
+        if on_progress is not None:
+            on_progress(cleared)
+        return cleared
+
+    pattern = cache.make_key(f'rate_limit:{escape_pattern(prefix)}*')
+    cleared = 0
+    batch = []
+    for key in client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            cleared += _unlink(client, batch)
+            batch = []
+            if on_progress is not None:
+                on_progress(cleared)
+    if batch:
+        cleared += _unlink(client, batch)
+    if on_progress is not None:
+        on_progress(cleared)
+    return cleared
+
+
+def _unlink(client, keys):
+    pipeline = client.pipeline(transaction=False)
+    for key in keys:
+        pipeline.unlink(key)
+    return sum(pipeline.execute())
@@ -0,0 +1,201 @@
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from requests.adapters import HTTPAdapter
+
+
+# Responses the rate limiter is expected to give; anything else means the
+# benchmark is not measuring it
+EXPECTED_STATUSES = {'200', '429'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests the rate limiter with concurrent clients and reports "
+        "throughput, latency percentiles and response status counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000/rate-limiter/ping/',
+            help="URL to load, e.g. of a local runserver. With --in-process only its path is used."
+        )
+        parser.add_argument(
+            '--in-process', action='store_true',
+            help="Send requests through Django's test client instead of over HTTP."
+        )
+        parser.add_argument('--concurrency', type=int, default=10, help="Concurrent clients.")
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help="Target requests per second across all clients, 0 for as fast as possible."
+        )
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to run for.")
+        parser.add_argument('--requests', type=int, default=0, help="Stop after this many requests, 0 for no limit.")
+        parser.add_argument(
+            '--ips', type=int, default=1,
+            help="Distinct client IPs, sent round-robin in X-Forwarded-For."
+        )
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['ips'] < 1:
+            raise CommandError("--concurrency and --ips must be positive.")
+        if options['duration'] <= 0 and options['requests'] <= 0:
+            raise CommandError("Give a positive --duration or --requests.")
+
+        report = run_load(
+            send=self.get_sender(options),
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            duration=options['duration'],
+            max_requests=options['requests'],
+            client_ips=[client_ip(i) for i in range(options['ips'])]
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+        else:
+            self.write_summary(report, options)
+
+        unexpected = set(report['statuses']) - EXPECTED_STATUSES
+        if unexpected:
+            raise CommandError(
+                f"Got responses other than 200 and 429 ({', '.join(sorted(unexpected))}), "
+                "so the rate limiter was not measured. Check the URL and ALLOWED_HOSTS."
+            )
+
+    def write_summary(self, report, options):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['duration_seconds']}s "
+            f"({report['rps']} req/s) with {options['concurrency']} clients and {options['ips']} IPs"
+        )
+        self.stdout.write(
+            f"latency ms: p50 {report['p50_ms']}  p90 {report['p90_ms']}  "
+            f"p99 {report['p99_ms']}  max {report['max_ms']}"
+        )
+        statuses = '  '.join(f"{status}: {count}" for status, count in report['statuses'].items())
+        self.stdout.write(f"statuses: {statuses}")
+
+    def get_sender(self, options):
+        """
+        Returns a callable sending one request as the given client IP and
+        returning its status code. Each thread gets its own client.
+        """
+        local = threading.local()
+
+        if options['in_process']:
+            path = urlsplit(options['url']).path or '/'
+            # The test client's default host, testserver, is only allowed under the test runner
+            host = allowed_host()
+
+            def send(ip):
+                if not hasattr(local, 'client'):
+                    local.client = Client(HTTP_HOST=host, SERVER_NAME=host)
+                return local.client.get(path, HTTP_X_FORWARDED_FOR=ip).status_code
+            return send
+
+        url = options['url']
+
+        def send(ip):
+            if not hasattr(local, 'session'):
+                # One pooled keep-alive connection per thread
+                local.session = requests.Session()
+                local.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+                local.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            return local.session.get(url, headers={'X-Forwarded-For': ip}).status_code
+        return send
+
+
+def allowed_host():
+    """
+    Returns a host name that passes the ALLOWED_HOSTS check: the first
+    concrete entry, or localhost (allowed while DEBUG is on).
+    """
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def client_ip(index):
+    """
+    Returns a distinct IPv4 address in 10.0.0.0/8 for index.
+    """
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+def run_load(send, concurrency, rate, duration, max_requests, client_ips):
+    """
+    Calls send from concurrency threads until duration seconds have
+    passed or max_requests requests were sent. With a rate, request n is
+    not sent before n / rate seconds after the start, across all threads.
+
+    Returns:
+        dict: Request count, throughput, latency percentiles in
+        milliseconds and a count per status code ('error' for requests
+        that raised)
+    """
+    lock = threading.Lock()
+    sequence = iter(range(max_requests)) if max_requests > 0 else itertools.count()
+    start = time.perf_counter()
+    deadline = start + duration if duration > 0 else float('inf')
+
+    def worker():
+        latencies = []
+        statuses = Counter()
+        while True:
+            with lock:
+                n = next(sequence, None)
+            if n is None:
+                break
+            if rate > 0:
+                delay = start + n / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent_at = time.perf_counter()
+            if sent_at >= deadline:
+                break
+            try:
+                status = send(client_ips[n % len(client_ips)])
+            except Exception:
+                status = 'error'
+            latencies.append(time.perf_counter() - sent_at)
+            statuses[status] += 1
+        return latencies, statuses
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: worker(), range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    statuses = Counter()
+    for _, worker_statuses in results:
+        statuses.update(worker_statuses)
+
+    def percentile_ms(fraction):
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))
+        return round(latencies[index] * 1000, 2)
+
+    return {
+        'requests': len(latencies),
+        'duration_seconds': round(elapsed, 2),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': percentile_ms(0.5),
+        'p90_ms': percentile_ms(0.9),
+        'p99_ms': percentile_ms(0.99),
+        'max_ms': percentile_ms(1),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
@@ -0,0 +1,172 @@
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import NoReverseMatch, reverse
+
+
+class RateLimitPolicy:
+    """
+    A rate limit applied to the requests matched by a policy entry.
+
+    Args:
+        name (str): Unique policy name, part of the cache key
+        limit (int): Requests allowed per window, or None to exempt the
+            matched requests from rate limiting
+        window (int): Window length in seconds
+        identity (str): What requests are counted by: 'ip', 'user' (the
+            authenticated user id, falling back to the IP) or
+            'header:<Name>' (for example an API key, falling back to the IP).
+            'user' only sees users authenticated by a session, since DRF
+            token and basic authentication run in the view after this
+            middleware; such clients are counted by IP. Use a header
+            identity for API clients instead.
+            Only use header identities for headers set or verified by a
+            trusted proxy: any client can send arbitrary values, and each
+            new value gets its own counter.
+    """
+    IDENTITIES = ('ip', 'user')
+
+    def __init__(self, name, limit, window, identity='ip'):
+        if identity not in self.IDENTITIES and not identity.startswith('header:'):
+            raise ImproperlyConfigured(f"Unknown rate limit identity '{identity}' in policy '{name}'.")
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.identity = identity
+        self.header = None
+        if identity.startswith('header:'):
+            self.header = 'HTTP_' + identity[len('header:'):].upper().replace('-', '_')
+
+    def cache_key(self, identity):
+        """
+        Returns the backend key counting requests of one identity.
+        """
+        return f'rate_limit:{self.name}:{identity}'
+
+    def header_identity(self, value):
+        """
+        Returns the identity of a header value. The value is hashed, so
+        clients cannot choose the key names or make them arbitrarily long.
+        """
+        return hash_header_identity(self.identity, value)
+
+    def __repr__(self):
+        return f"<RateLimitPolicy {self.name} {self.limit}/{self.window}s by {self.identity}>"
+
+
+def hash_header_identity(identity, value):
+    """
+    Returns ``<identity>:<digest>`` for a header identity such as
+    'header:X-API-Key' and the value a client sent in that header.
+    """
+    digest = hashlib.sha256(value.encode('utf-8', 'surrogateescape')).hexdigest()[:32]
+    return f'{identity}:{digest}'
+
+
+class DefaultRateLimitPolicy(RateLimitPolicy):
+    """
+    The global per-IP policy, keyed as ``rate_limit:<ip>``.
+    """
+    def __init__(self, limit, window):
+        super().__init__('default', limit, window, identity='ip')
+
+    def cache_key(self, identity):
+        return f'rate_limit:{identity}'
+
+
+class PolicyMatcher:
+    """
+    Finds the policy for a request path and method.
+
+    Policies are compiled once into a dict of exact paths and a trie of
+    path segments, so a lookup walks at most the segments of the request
+    path regardless of how many policies are configured. An exact path
+    wins over a prefix, a longer prefix over a shorter one, and a policy
+    for the request method over one for any method.
+
+    Each entry of ``policies`` is a dict with ``name``, ``limit``,
+    ``window``, optional ``identity``, optional ``methods`` and either
+    ``path`` (matched as a prefix on whole path segments) or ``url_name``
+    (matched exactly against the reversed URL).
+
+    Args:
+        default (RateLimitPolicy): Policy for requests no entry matches
+        policies (list): Policy entries from settings
+        excluded_paths (list): Exact paths that are never rate limited
+    """
+    ANY_METHOD = '*'
+
+    def __init__(self, default, policies=(), excluded_paths=()):
+        self.default = default
+        self.exact = {}
+        self.trie = {}
+        for entry in policies:
+            self.add(entry)
+        for excluded_path in excluded_paths:
+            self._register(self.exact.setdefault(excluded_path, {}), None, self._exempt(excluded_path))
+
+    def add(self, entry):
+        """
+        Compiles a policy entry into the lookup structures.
+        """
+        try:
+            policy = RateLimitPolicy(
+                entry['name'],
+                entry['limit'],
+                entry.get('window', self.default.window),
+                identity=entry.get('identity', 'ip')
+            )
+        except KeyError as e:
+            raise ImproperlyConfigured(f"Rate limit policy {entry!r} is missing {e}.")
+        methods = entry.get('methods')
+
+        if 'url_name' in entry:
+            try:
+                exact_path = reverse(entry['url_name'])
+            except NoReverseMatch:
+                raise ImproperlyConfigured(
+                    f"Rate limit policy '{policy.name}' refers to unknown URL name '{entry['url_name']}'."
+                )
+            self._register(self.exact.setdefault(exact_path, {}), methods, policy)
+        elif 'path' in entry:
+            node = self.trie
+            for segment in self._segments(entry['path']):
+                node = node.setdefault('children', {}).setdefault(segment, {})
+            self._register(node.setdefault('policies', {}), methods, policy)
+        else:
+            raise ImproperlyConfigured(f"Rate limit policy '{policy.name}' needs a 'path' or 'url_name'.")
+
+    def match(self, path, method):
+        """
+        Returns the policy for a request.
+        """
+        policies = self.exact.get(path)
+        if policies is not None:
+            policy = policies.get(method) or policies.get(self.ANY_METHOD)
+            if policy is not None:
+                return policy
+
+        best = None
+        node = self.trie
+        for segment in self._segments(path):
+            policies = node.get('policies')
+            if policies is not None:
+                best = policies.get(method) or policies.get(self.ANY_METHOD) or best
+            node = node.get('children', {}).get(segment)
+            if node is None:
+                break
+        else:
+            policies = node.get('policies')
+            if policies is not None:
+                best = policies.get(method) or policies.get(self.ANY_METHOD) or best
+        return best or self.default
+
+    def _register(self, policies, methods, policy):
+        for method in methods or [self.ANY_METHOD]:
+            policies[method.upper()] = policy
+
+    def _segments(self, path):
+        return [segment for segment in path.split('/') if segment]
+
+    def _exempt(self, path):
+        return RateLimitPolicy(f'excluded:{path}', None, self.default.window)
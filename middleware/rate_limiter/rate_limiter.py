@@ -1,23 +1,106 @@
 import time
+import weakref
 
-from django.core.cache import cache
 from django.conf import settings
+from django.core.cache import caches
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
 from django.http import HttpResponse
 
+from common.ttl_cache import TTLCache
+from middleware.metrics.registry import registry as metrics_registry
+from .policies import DefaultRateLimitPolicy, PolicyMatcher
+
+# Deny caches of the middleware instances in this process
+_deny_caches = weakref.WeakSet()
+
+# Counter bumped on every clear, so other processes drop their deny caches
+DENY_GENERATION_KEY = 'rate_limit_deny_generation'
+
+
+def _generation_cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default')]
+
+
+def deny_cache_generation():
+    """
+    Returns the number of times the deny caches have been cleared.
+    """
+    return _generation_cache().get(DENY_GENERATION_KEY, 0)
+
+
+async def adeny_cache_generation():
+    """
+    Async version of deny_cache_generation().
+    """
+    return await _generation_cache().aget(DENY_GENERATION_KEY, 0)
+
+
+def clear_deny_caches():
+    """
+    Forgets the blocked clients remembered by every process.
+
+    The deny caches of this process are cleared at once. Other processes
+    notice the bumped generation counter within
+    RATE_LIMIT_DENY_CACHE_SYNC_SECONDS and clear theirs.
+    """
+    cache = _generation_cache()
+    cache.add(DENY_GENERATION_KEY, 0, timeout=None)
+    cache.incr(DENY_GENERATION_KEY)
+    for deny_cache in list(_deny_caches):
+        deny_cache.clear()
+
 
 class RateLimitMiddleware(MiddlewareMixin):
     """
-    Custom middleware to implement IP-based request rate limiting.
+    Custom middleware to implement request rate limiting.
+
+    Counts requests with the backend configured in RATE_LIMIT_BACKEND
+    (see backends.py). By default blocks requests if an IP exceeds
+    RATE_LIMIT_MAX_REQUESTS within a rolling RATE_LIMIT_WINDOW_SECONDS window.
+    RATE_LIMIT_POLICIES overrides the limit, window and client identity
+    per path prefix, URL name and method (see policies.py).
+
+    Keys the backend has blocked are remembered in a bounded in-process
+    deny cache until the time the backend reports it would allow them
+    again (``retry_at``), so further requests from a blocked client are
+    rejected without a round trip to the backend. Backends that cannot
+    tell that time are always consulted. While it holds blocked clients,
+    the middleware checks the generation counter of clear_deny_caches()
+    at most every RATE_LIMIT_DENY_CACHE_SYNC_SECONDS, so a clear in any
+    process unblocks clients in all of them within that interval.
 
-    Uses Django's cache framework to store request timestamps for each IP.
-    Blocks requests if an IP exceeds RATE_LIMIT_MAX_REQUESTS within a
-    rolling RATE_LIMIT_WINDOW_SECONDS window.
+    Supports both WSGI and ASGI: under ASGI the backend is awaited
+    directly instead of being run in a worker thread.
+
+    The duration of every backend call and the outcome of every check
+    are recorded in the metrics registry (see middleware/metrics).
     """
     RATE_LIMIT_MAX_REQUESTS = getattr(settings, 'RATE_LIMIT_MAX_REQUESTS', 100)
     RATE_LIMIT_WINDOW_SECONDS = getattr(settings, 'RATE_LIMIT_WINDOW_SECONDS', 300)
+    RATE_LIMIT_BACKEND = getattr(
+        settings, 'RATE_LIMIT_BACKEND',
+        'middleware.rate_limiter.backends.RedisSlidingLogBackend'
+    )
+    RATE_LIMIT_DENY_CACHE_SIZE = getattr(settings, 'RATE_LIMIT_DENY_CACHE_SIZE', 10000)
+    RATE_LIMIT_DENY_CACHE_SYNC_SECONDS = getattr(settings, 'RATE_LIMIT_DENY_CACHE_SYNC_SECONDS', 1.0)
+    RATE_LIMIT_POLICIES = getattr(settings, 'RATE_LIMIT_POLICIES', [])
     EXCLUDED_PATHS = ['/rate-limiter/clear/']  
 
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.backend = import_string(self.RATE_LIMIT_BACKEND)()
+        self.deny_cache = TTLCache(max_entries=self.RATE_LIMIT_DENY_CACHE_SIZE)
+        _deny_caches.add(self.deny_cache)
+        self.deny_generation = deny_cache_generation()
+        self.deny_synced_at = 0.0
+        self.backend_labels = (('backend', type(self.backend).__name__),)
+        self.policies = PolicyMatcher(
+            DefaultRateLimitPolicy(self.RATE_LIMIT_MAX_REQUESTS, self.RATE_LIMIT_WINDOW_SECONDS),
+            self.RATE_LIMIT_POLICIES,
+            self.EXCLUDED_PATHS
+        )
+
     def get_client_ip(self, request):
         """
         Get client IP from X-Forwarded-For header or REMOTE_ADDR
@@ -31,52 +114,179 @@ class RateLimitMiddleware(MiddlewareMixin):
         """
         Processes the incoming request to check for rate limiting.
         """
-        # Skip rate limiting for excluded paths
-        if request.path in self.EXCLUDED_PATHS:
+        policy = self.policies.match(request.path, request.method)
+        if policy.limit is None:
             return None
-
-        ip_address = self.get_client_ip(request)
-        if not ip_address:
+        cache_key = self.get_cache_key(request, policy, self.get_identity(request, policy))
+        if cache_key is None:
             return None
 
-        cache_key = f'rate_limit:{ip_address}'
+        current_time = time.time()
+        request._rate_limit_policy = policy
+        if self.deny_cache_stale(current_time):
+            self.sync_deny_cache(deny_cache_generation(), current_time)
+        response = self.check_deny_cache(request, cache_key, current_time)
+        if response is not None:
+            return response
+
+        started = time.perf_counter()
+        result = self.backend.hit(
+            cache_key,
+            policy.limit,
+            policy.window,
+            current_time
+        )
+        metrics_registry.observe(
+            'rate_limit_backend_duration_seconds', self.backend_labels, time.perf_counter() - started
+        )
+        return self.apply_result(request, cache_key, result)
+
+    async def aprocess_request(self, request):
+        """
+        Async version of process_request() used under ASGI, awaiting the
+        backend instead of calling it from a worker thread.
+        """
+        policy = self.policies.match(request.path, request.method)
+        if policy.limit is None:
+            return None
+        cache_key = self.get_cache_key(request, policy, await self.aget_identity(request, policy))
+        if cache_key is None:
+            return None
 
-        request_timestamps = cache.get(cache_key, [])
         current_time = time.time()
-        request_timestamps = [
-            timestamp for timestamp in request_timestamps
-            if timestamp > current_time - self.RATE_LIMIT_WINDOW_SECONDS
-        ]
+        request._rate_limit_policy = policy
+        if self.deny_cache_stale(current_time):
+            self.sync_deny_cache(await adeny_cache_generation(), current_time)
+        response = self.check_deny_cache(request, cache_key, current_time)
+        if response is not None:
+            return response
 
-        request_timestamps.append(current_time)
+        started = time.perf_counter()
+        result = await self.backend.ahit(
+            cache_key,
+            policy.limit,
+            policy.window,
+            current_time
+        )
+        metrics_registry.observe(
+            'rate_limit_backend_duration_seconds', self.backend_labels, time.perf_counter() - started
+        )
+        return self.apply_result(request, cache_key, result)
 
-        cache.set(cache_key, request_timestamps, timeout=self.RATE_LIMIT_WINDOW_SECONDS + 60)
+    async def __acall__(self, request):
+        """
+        Handles a request in async mode without the thread hops that
+        MiddlewareMixin adds around process_request/process_response.
+        """
+        response = await self.aprocess_request(request)
+        response = response or await self.get_response(request)
+        return self.process_response(request, response)
 
-        remaining_requests = self.RATE_LIMIT_MAX_REQUESTS - len(request_timestamps)
-        reset_time = current_time + self.RATE_LIMIT_WINDOW_SECONDS
+    def get_identity(self, request, policy):
+        """
+        Returns the value requests are counted by under the policy, or
+        None if the client cannot be identified.
+        """
+        if policy.identity == 'user':
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                return f'user:{user.pk}'
+        elif policy.header is not None:
+            value = request.META.get(policy.header)
+            if value:
+                return policy.header_identity(value)
+        return self.get_client_ip(request)
 
-        request._rate_limit_remaining = remaining_requests
-        request._rate_limit_reset = reset_time
+    async def aget_identity(self, request, policy):
+        """
+        Async version of get_identity(), resolving the user without a
+        blocking session lookup.
+        """
+        if policy.identity == 'user' and hasattr(request, 'auser'):
+            user = await request.auser()
+            if user.is_authenticated:
+                return f'user:{user.pk}'
+            return self.get_client_ip(request)
+        return self.get_identity(request, policy)
 
-        if len(request_timestamps) > self.RATE_LIMIT_MAX_REQUESTS:
-            response = HttpResponse("Too Many Requests", status=429)
-            response['X-RateLimit-Limit'] = self.RATE_LIMIT_MAX_REQUESTS
-            response['X-RateLimit-Remaining'] = 0
-            response['X-RateLimit-Reset'] = int(reset_time)
-            return response
+    def get_cache_key(self, request, policy, identity):
+        """
+        Returns the rate limit key for the request, or None if the request
+        is not rate limited.
+        """
+        if not identity:
+            return None
+
+        return policy.cache_key(identity)
+
+    def deny_cache_stale(self, current_time):
+        """
+        Returns True if the deny cache holds blocked clients and has not
+        been checked against the clear generation for
+        RATE_LIMIT_DENY_CACHE_SYNC_SECONDS.
+        """
+        return (
+            len(self.deny_cache) > 0
+            and current_time - self.deny_synced_at >= self.RATE_LIMIT_DENY_CACHE_SYNC_SECONDS
+        )
 
+    def sync_deny_cache(self, generation, current_time):
+        """
+        Clears the deny cache if the deny caches were cleared in another
+        process since the last check.
+        """
+        if generation != self.deny_generation:
+            self.deny_cache.clear()
+            self.deny_generation = generation
+        self.deny_synced_at = current_time
+
+    def check_deny_cache(self, request, cache_key, current_time):
+        """
+        Returns a 429 response if the key is known to be blocked.
+        """
+        blocked_until = self.deny_cache.get(cache_key, now=current_time)
+        if blocked_until is None:
+            return None
+        metrics_registry.inc('rate_limit_decisions_total', (('result', 'deny_cache'),))
+        request._rate_limit_remaining = 0
+        request._rate_limit_reset = blocked_until
+        return self.too_many_requests(request._rate_limit_policy.limit, blocked_until)
+
+    def apply_result(self, request, cache_key, result):
+        """
+        Stores the backend result on the request and returns a 429
+        response if the request is over the limit.
+        """
+        request._rate_limit_remaining = result.remaining
+        request._rate_limit_reset = result.reset
+
+        if not result.allowed:
+            metrics_registry.inc('rate_limit_decisions_total', (('result', 'blocked'),))
+            if result.retry_at is None:
+                return self.too_many_requests(request._rate_limit_policy.limit, result.reset)
+            self.deny_cache.set(cache_key, result.retry_at, expires_at=result.retry_at)
+            return self.too_many_requests(request._rate_limit_policy.limit, result.retry_at)
+
+        metrics_registry.inc('rate_limit_decisions_total', (('result', 'allowed'),))
         return None
 
+    def too_many_requests(self, limit, reset_time):
+        """
+        Builds the 429 response for a blocked request.
+        """
+        response = HttpResponse("Too Many Requests", status=429)
+        response['X-RateLimit-Limit'] = limit
+        response['X-RateLimit-Remaining'] = 0
+        response['X-RateLimit-Reset'] = int(reset_time)
+        return response
+
     def process_response(self, request, response):
         """
         Adds rate limit headers to the response for successful requests.
         """
-        # Don't add rate limit headers for excluded paths
-        if request.path in self.EXCLUDED_PATHS:
-            return response
-
+        # Requests on exempt paths never get a remaining count
         if hasattr(request, '_rate_limit_remaining'):
-            response['X-RateLimit-Limit'] = self.RATE_LIMIT_MAX_REQUESTS
+            response['X-RateLimit-Limit'] = request._rate_limit_policy.limit
             response['X-RateLimit-Remaining'] = request._rate_limit_remaining
             response['X-RateLimit-Reset'] = int(request._rate_limit_reset)
 
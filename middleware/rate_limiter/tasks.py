@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from middleware.rate_limiter.clear import clear_rate_limit_keys
+
+
+@shared_task(bind=True)
+def clear_rate_limit_cache(self, prefix='', identity=None):
+    """
+    Celery task to clear rate limiter keys in the background.
+    Publishes a PROGRESS state with the keys cleared so far after each
+    SCAN batch.
+    """
+    def report(keys_cleared):
+        if not self.request.is_eager:
+            self.update_state(state='PROGRESS', meta={'keys_cleared': keys_cleared})
+
+    return {'keys_cleared': clear_rate_limit_keys(prefix, identity, on_progress=report)}
@@ -1,16 +1,42 @@
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.http import HttpResponse
 from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from io import StringIO
+from rest_framework.test import APIClient
 from unittest.mock import patch
+import base64
+import json
+import weakref
 
-from .rate_limiter import RateLimitMiddleware
+from common.ttl_cache import TTLCache
+from v1.users.models import CustomUser
+from .backends import RateLimitResult
+from .clear import clear_rate_limit_keys
+from .policies import hash_header_identity
+from .management.commands.ratelimit_bench import allowed_host
+from .rate_limiter import RateLimitMiddleware, clear_deny_caches
 from django.conf import settings
 
 # Constants for rate limiting
 RATE_LIMIT_MAX_REQUESTS = getattr(settings, 'RATE_LIMIT_MAX_REQUESTS', 100)
 RATE_LIMIT_WINDOW_SECONDS = getattr(settings, 'RATE_LIMIT_WINDOW_SECONDS', 300)
+CACHE_BACKEND = 'middleware.rate_limiter.backends.CacheSlidingLogBackend'
 
-class RateLimitMiddlewareTests(TestCase):
+
+class CacheBackendMixin:
+    """
+    Runs the middleware with CacheSlidingLogBackend, whose timestamp lists
+    the tests seed and inspect through the cache.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(patch.object(RateLimitMiddleware, 'RATE_LIMIT_BACKEND', CACHE_BACKEND))
+        super().setUpClass()
+
+
+class RateLimitMiddlewareTests(CacheBackendMixin, TestCase):
     """
     Unit tests for the RateLimitMiddleware.
     """
@@ -198,3 +224,358 @@ class RateLimitMiddlewareTests(TestCase):
             self.assertEqual(processed_response['X-RateLimit-Limit'], str(RATE_LIMIT_MAX_REQUESTS))
             self.assertEqual(processed_response['X-RateLimit-Remaining'], str(RATE_LIMIT_MAX_REQUESTS - (i + 1)))
             self.assertTrue('X-RateLimit-Reset' in processed_response)
+
+
+class DenyCacheTests(CacheBackendMixin, TestCase):
+    """
+    Unit tests for the in-process deny cache of RateLimitMiddleware.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = RateLimitMiddleware(lambda req: HttpResponse("OK"))
+
+    def make_request(self, ip='192.168.2.1'):
+        request = self.factory.get('/test/')
+        request.META['REMOTE_ADDR'] = ip
+        return request
+
+    @patch('time.time', return_value=1000)
+    def test_blocked_client_rejected_without_backend(self, mock_time):
+        """
+        Test that once blocked, a client is rejected locally with the same headers.
+        """
+        cache.set('rate_limit:192.168.2.1', [1000] * RATE_LIMIT_MAX_REQUESTS)
+        first = self.middleware.process_request(self.make_request())
+        self.assertEqual(first.status_code, 429)
+
+        with patch.object(self.middleware.backend, 'hit') as mock_hit:
+            second = self.middleware.process_request(self.make_request())
+
+        mock_hit.assert_not_called()
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second['X-RateLimit-Remaining'], '0')
+        self.assertEqual(second['X-RateLimit-Reset'], first['X-RateLimit-Reset'])
+
+    @patch('time.time')
+    def test_deny_entry_expires_at_retry_time(self, mock_time):
+        """
+        Test that a client is blocked locally only until the backend would
+        allow it again, not for a whole window from the rejected request.
+        """
+        # Rejected near the end of the window opened by the logged requests
+        mock_time.return_value = 1000 + RATE_LIMIT_WINDOW_SECONDS - 10
+        cache.set('rate_limit:192.168.2.1', [1000] * RATE_LIMIT_MAX_REQUESTS)
+        first = self.middleware.process_request(self.make_request())
+        retry_at = 1000 + RATE_LIMIT_WINDOW_SECONDS
+        self.assertEqual(first['X-RateLimit-Reset'], str(retry_at))
+
+        mock_time.return_value = retry_at - 1
+        with patch.object(self.middleware.backend, 'hit') as mock_hit:
+            self.assertEqual(self.middleware.process_request(self.make_request()).status_code, 429)
+        mock_hit.assert_not_called()
+
+        mock_time.return_value = retry_at
+        self.assertIsNone(self.middleware.process_request(self.make_request()))
+
+    @patch('time.time', return_value=1000)
+    def test_denial_without_retry_time_not_cached(self, mock_time):
+        """
+        Test that denials of backends that give no retry time always reach the backend.
+        """
+        self.middleware.process_request(self.make_request())
+        rejected = RateLimitResult(False, 0, 1300)
+        with patch.object(self.middleware.backend, 'hit', return_value=rejected) as mock_hit:
+            self.middleware.process_request(self.make_request())
+            self.middleware.process_request(self.make_request())
+
+        self.assertEqual(mock_hit.call_count, 2)
+
+    @patch('time.time')
+    def test_clear_in_other_process_unblocks_client(self, mock_time):
+        """
+        Test that a clear made by another process drops the local deny
+        cache within RATE_LIMIT_DENY_CACHE_SYNC_SECONDS.
+        """
+        mock_time.return_value = 1000
+        cache.set('rate_limit:192.168.2.1', [1000] * RATE_LIMIT_MAX_REQUESTS)
+        self.assertEqual(self.middleware.process_request(self.make_request()).status_code, 429)
+        self.assertEqual(self.middleware.process_request(self.make_request()).status_code, 429)
+
+        # Another process clears the keys and its own deny caches
+        with patch('middleware.rate_limiter.rate_limiter._deny_caches', weakref.WeakSet()):
+            clear_deny_caches()
+        cache.delete('rate_limit:192.168.2.1')
+
+        mock_time.return_value = 1000 + RateLimitMiddleware.RATE_LIMIT_DENY_CACHE_SYNC_SECONDS / 2
+        self.assertEqual(self.middleware.process_request(self.make_request()).status_code, 429)
+
+        mock_time.return_value = 1000 + RateLimitMiddleware.RATE_LIMIT_DENY_CACHE_SYNC_SECONDS
+        self.assertIsNone(self.middleware.process_request(self.make_request()))
+
+    @patch('time.time', return_value=1000)
+    def test_other_clients_unaffected(self, mock_time):
+        """
+        Test that blocking one client does not affect another.
+        """
+        cache.set('rate_limit:192.168.2.1', [1000] * RATE_LIMIT_MAX_REQUESTS)
+        self.middleware.process_request(self.make_request())
+
+        self.assertIsNone(self.middleware.process_request(self.make_request('192.168.2.2')))
+
+    def test_deny_cache_bounded(self):
+        """
+        Test that the deny cache evicts the least recently used entries.
+        """
+        deny_cache = TTLCache(max_entries=2)
+        deny_cache.set('a', 1, expires_at=2000)
+        deny_cache.set('b', 2, expires_at=2000)
+        deny_cache.get('a', now=1000)
+        deny_cache.set('c', 3, expires_at=2000)
+
+        self.assertEqual(len(deny_cache), 2)
+        self.assertIsNone(deny_cache.get('b', now=1000))
+        self.assertEqual(deny_cache.get('a', now=1000), 1)
+
+
+class RateLimitPolicyTests(CacheBackendMixin, TestCase):
+    """
+    Unit tests for per-route rate limit policies.
+    """
+    POLICIES = [
+        {'name': 'upload', 'url_name': 'csv_upload', 'methods': ['POST'], 'limit': 2, 'window': 60},
+        {'name': 'tasks', 'path': '/tasks/', 'limit': 5, 'window': 60},
+        {'name': 'task_errors', 'path': '/tasks/abc/errors/', 'methods': ['GET'],
+         'identity': 'header:X-API-Key', 'limit': 3, 'window': 60},
+        {'name': 'admin', 'path': '/admin/', 'limit': None},
+    ]
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        with patch.object(RateLimitMiddleware, 'RATE_LIMIT_POLICIES', self.POLICIES):
+            self.middleware = RateLimitMiddleware(lambda req: HttpResponse("OK"))
+        cache.clear()
+
+    def match(self, path, method='GET'):
+        return self.middleware.policies.match(path, method).name
+
+    def test_matcher_precedence(self):
+        """
+        Test that exact paths beat prefixes, longer prefixes beat shorter
+        ones and method-specific entries only match their methods.
+        """
+        self.assertEqual(self.match('/v1/users/csv-upload/', 'POST'), 'upload')
+        self.assertEqual(self.match('/v1/users/csv-upload/', 'GET'), 'default')
+        self.assertEqual(self.match('/tasks/abc/status/'), 'tasks')
+        self.assertEqual(self.match('/tasks/abc/errors/'), 'task_errors')
+        self.assertEqual(self.match('/tasks/abc/errors/', 'DELETE'), 'tasks')
+        self.assertEqual(self.match('/tasksx/'), 'default')
+        self.assertEqual(self.match('/rate-limiter/clear/'), 'excluded:/rate-limiter/clear/')
+
+    @patch('time.time', return_value=1000)
+    def test_policy_limit_and_key(self, mock_time):
+        """
+        Test that a policy applies its own limit, key and headers.
+        """
+        for _ in range(2):
+            request = self.factory.post('/v1/users/csv-upload/', REMOTE_ADDR='10.0.0.1')
+            self.assertIsNone(self.middleware.process_request(request))
+
+        response = self.middleware.process_request(
+            self.factory.post('/v1/users/csv-upload/', REMOTE_ADDR='10.0.0.1')
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['X-RateLimit-Limit'], '2')
+        self.assertEqual(len(cache.get('rate_limit:upload:10.0.0.1')), 3)
+        self.assertIsNone(cache.get('rate_limit:10.0.0.1'))
+
+        # The default policy still counts other routes separately
+        request = self.factory.get('/test/', REMOTE_ADDR='10.0.0.1')
+        self.assertIsNone(self.middleware.process_request(request))
+        response = self.middleware.process_response(request, HttpResponse("OK"))
+        self.assertEqual(response['X-RateLimit-Limit'], str(RATE_LIMIT_MAX_REQUESTS))
+
+    @patch('time.time', return_value=1000)
+    def test_header_identity(self, mock_time):
+        """
+        Test that header identities count per hashed header value and fall back to the IP.
+        """
+        request = self.factory.get('/tasks/abc/errors/', REMOTE_ADDR='10.0.0.2', HTTP_X_API_KEY='key-1')
+        self.middleware.process_request(request)
+        request = self.factory.get('/tasks/abc/errors/', REMOTE_ADDR='10.0.0.2')
+        self.middleware.process_request(request)
+        request = self.factory.get('/tasks/abc/errors/', REMOTE_ADDR='10.0.0.2', HTTP_X_API_KEY='*' * 10000)
+        self.middleware.process_request(request)
+
+        key = 'rate_limit:task_errors:' + hash_header_identity('header:X-API-Key', 'key-1')
+        self.assertEqual(len(cache.get(key)), 1)
+        self.assertIsNone(cache.get('rate_limit:task_errors:header:X-API-Key:key-1'))
+        self.assertEqual(len(cache.get('rate_limit:task_errors:10.0.0.2')), 1)
+        long_identity = hash_header_identity('header:X-API-Key', '*' * 10000)
+        self.assertEqual(long_identity, 'header:X-API-Key:' + long_identity[-32:])
+        self.assertEqual(len(cache.get('rate_limit:task_errors:' + long_identity)), 1)
+
+    def test_user_identity_needs_session_auth(self):
+        """
+        Test that 'user' identifies session logins, while DRF basic auth
+        clients, authenticated only inside the view, are counted by IP.
+        """
+        admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='secret', is_staff=True
+        )
+        policies = [{'name': 'users', 'url_name': 'user_list', 'identity': 'user', 'limit': 10, 'window': 60}]
+        with patch.object(RateLimitMiddleware, 'RATE_LIMIT_POLICIES', policies):
+            basic_client = APIClient(REMOTE_ADDR='10.0.0.4')
+            basic_client.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(b'admin:secret').decode())
+            self.assertEqual(basic_client.get(reverse('user_list')).status_code, 200)
+
+            session_client = APIClient(REMOTE_ADDR='10.0.0.4')
+            session_client.force_login(admin)
+            self.assertEqual(session_client.get(reverse('user_list')).status_code, 200)
+
+        self.assertEqual(len(cache.get('rate_limit:users:10.0.0.4')), 1)
+        self.assertEqual(len(cache.get(f'rate_limit:users:user:{admin.pk}')), 1)
+
+    def test_exempt_routes(self):
+        """
+        Test that exempt routes are neither counted nor given headers.
+        """
+        request = self.factory.get('/admin/login/', REMOTE_ADDR='10.0.0.3')
+        self.assertIsNone(self.middleware.process_request(request))
+        response = self.middleware.process_response(request, HttpResponse("OK"))
+
+        self.assertNotIn('X-RateLimit-Limit', response)
+        self.assertIsNone(cache.get('rate_limit:10.0.0.3'))
+
+
+class ClearCacheTests(CacheBackendMixin, TestCase):
+    """
+    Tests for clearing the rate limiter keyspace.
+    """
+
+    def setUp(self):
+        cache.clear()
+        for ip in ['10.1.0.1', '10.1.0.2', '10.2.0.1']:
+            cache.set(f'rate_limit:{ip}', [1000])
+        cache.set('rate_limit:upload:10.1.0.1', [1000])
+        cache.set('other:10.1.0.1', 'kept')
+
+    def remaining_keys(self):
+        return sorted(cache.keys('rate_limit:*'))
+
+    def test_clear_all(self):
+        """
+        Test that every rate limit key is cleared in batches and other keys are kept.
+        """
+        progress = []
+        cleared = clear_rate_limit_keys(batch_size=2, on_progress=progress.append)
+
+        self.assertEqual(cleared, 4)
+        self.assertEqual(progress[-1], 4)
+        self.assertEqual(self.remaining_keys(), [])
+        self.assertEqual(cache.get('other:10.1.0.1'), 'kept')
+
+    def test_clear_by_prefix(self):
+        """
+        Test that a prefix is matched literally.
+        """
+        self.assertEqual(clear_rate_limit_keys(prefix='10.1.'), 2)
+        self.assertEqual(clear_rate_limit_keys(prefix='10.*'), 0)
+        self.assertEqual(self.remaining_keys(), ['rate_limit:10.2.0.1', 'rate_limit:upload:10.1.0.1'])
+
+    def test_clear_by_identity(self):
+        """
+        Test that an identity is cleared under every configured policy.
+        """
+        with self.settings(RATE_LIMIT_POLICIES=[{'name': 'upload', 'path': '/v1/', 'limit': 1}]):
+            self.assertEqual(clear_rate_limit_keys(identity='10.1.0.1'), 2)
+
+        self.assertEqual(self.remaining_keys(), ['rate_limit:10.1.0.2', 'rate_limit:10.2.0.1'])
+
+    def test_clear_by_header_identity(self):
+        """
+        Test that a header identity is cleared by its raw value.
+        """
+        cache.set('rate_limit:api:' + hash_header_identity('header:X-API-Key', 'key-1'), [1])
+        with self.settings(RATE_LIMIT_POLICIES=[{'name': 'api', 'path': '/v1/', 'limit': 1}]):
+            self.assertEqual(clear_rate_limit_keys(identity='header:X-API-Key:key-1'), 1)
+
+    @patch('time.time', return_value=1000)
+    def test_clear_view_unblocks_client(self, mock_time):
+        """
+        Test that the clear endpoint also forgets locally blocked clients.
+        """
+        middleware = RateLimitMiddleware(lambda req: HttpResponse("OK"))
+        request = RequestFactory().get('/test/', REMOTE_ADDR='10.1.0.1')
+        cache.set('rate_limit:10.1.0.1', [1000] * RATE_LIMIT_MAX_REQUESTS)
+        self.assertEqual(middleware.process_request(request).status_code, 429)
+
+        response = self.client.delete(reverse('rate_limiter:clear_cache') + '?identity=10.1.0.1')
+
+        self.assertEqual(response.json()['keys_cleared'], 1)
+        self.assertIsNone(middleware.process_request(request))
+
+    def test_clear_view_async(self):
+        """
+        Test that the clear endpoint can hand the work to a Celery task.
+        """
+        with patch('middleware.rate_limiter.tasks.clear_rate_limit_cache.delay') as mock_delay:
+            mock_delay.return_value.id = 'task-1'
+            response = self.client.delete(reverse('rate_limiter:clear_cache') + '?async=1&prefix=10.1.')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['task_id'], 'task-1')
+        mock_delay.assert_called_once_with('10.1.', None)
+
+
+class RateLimitBenchCommandTests(TestCase):
+    """
+    Tests for the ratelimit_bench management command.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def run_bench(self, *args):
+        stdout = StringIO()
+        call_command('ratelimit_bench', '--in-process', '--json', '--duration', '30', *args, stdout=stdout)
+        return json.loads(stdout.getvalue())
+
+    def test_counts_allowed_and_limited(self):
+        """
+        Test that concurrent requests from one IP are limited at the configured maximum.
+        """
+        # The atomic backend, as the default get/set one can lose updates under contention
+        with patch.object(
+            RateLimitMiddleware, 'RATE_LIMIT_BACKEND', 'middleware.rate_limiter.backends.RedisSlidingLogBackend'
+        ):
+            report = self.run_bench('--concurrency', '4', '--requests', str(RATE_LIMIT_MAX_REQUESTS + 20))
+
+        self.assertEqual(report['requests'], RATE_LIMIT_MAX_REQUESTS + 20)
+        self.assertEqual(report['statuses'], {'200': RATE_LIMIT_MAX_REQUESTS, '429': 20})
+        self.assertIsNotNone(report['p99_ms'])
+
+    def test_distinct_ips(self):
+        """
+        Test that requests spread over several IPs are counted per IP.
+        """
+        report = self.run_bench('--concurrency', '2', '--ips', '2', '--requests', str(RATE_LIMIT_MAX_REQUESTS * 2))
+
+        self.assertEqual(report['statuses'], {'200': RATE_LIMIT_MAX_REQUESTS * 2})
+
+    def test_unexpected_status_fails(self):
+        """
+        Test that responses other than 200 and 429 make the command fail.
+        """
+        with self.assertRaisesMessage(CommandError, 'other than 200 and 429 (404)'):
+            self.run_bench('--requests', '3', '--url', 'http://127.0.0.1:8000/missing/')
+
+    @override_settings(ALLOWED_HOSTS=['*', '.example.com'])
+    def test_in_process_host_allowed(self):
+        """
+        Test that in-process requests use a host from ALLOWED_HOSTS.
+        """
+        self.assertEqual(allowed_host(), 'example.com')
+        report = self.run_bench('--requests', '3')
+        self.assertEqual(report['statuses'], {'200': 3})
@@ -0,0 +1,284 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from django_redis import get_redis_connection
+
+from .backends import (
+    CacheSlidingLogBackend,
+    RedisSlidingLogBackend,
+    RedisSlidingWindowCounterBackend,
+    RedisTokenBucketBackend,
+)
+from .rate_limiter import RateLimitMiddleware
+
+
+class RedisSlidingLogBackendTests(TestCase):
+    """
+    Tests for the Lua sliding log backend against the configured Redis cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.backend = RedisSlidingLogBackend()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_counts_within_window(self):
+        """Test that requests are counted and the limit is enforced."""
+        results = [self.backend.hit('rate_limit:10.0.0.1', 3, 60, 1000.0) for _ in range(4)]
+
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual([result.remaining for result in results], [2, 1, 0, -1])
+        self.assertEqual(results[0].reset, 1060.0)
+
+    def test_old_entries_expire(self):
+        """Test that entries older than the window no longer count."""
+        for offset in range(3):
+            self.backend.hit('rate_limit:10.0.0.2', 3, 60, 1000.0 + offset)
+
+        result = self.backend.hit('rate_limit:10.0.0.2', 3, 60, 1061.5)
+
+        self.assertTrue(result.allowed)
+        self.assertEqual(result.remaining, 1)
+        client = get_redis_connection('default')
+        self.assertEqual(client.zcard(cache.make_key('rate_limit:10.0.0.2')), 2)
+
+    def test_retry_at_when_oldest_blocking_entry_expires(self):
+        """Test that a rejection reports when the log would next allow a request."""
+        for offset in range(3):
+            self.assertIsNone(self.backend.hit('rate_limit:10.0.0.4', 3, 60, 1000.0 + offset).retry_at)
+
+        rejected = self.backend.hit('rate_limit:10.0.0.4', 3, 60, 1050.0)
+
+        # Entries at 1000 and 1001 must leave the window for the count to drop below 3
+        self.assertEqual(rejected.retry_at, 1061.0)
+        self.assertTrue(self.backend.hit('rate_limit:10.0.0.4', 3, 60, rejected.retry_at).allowed)
+
+    def test_key_has_expiry(self):
+        """Test that the sorted set expires after the window."""
+        self.backend.hit('rate_limit:10.0.0.3', 3, 60, 1000.0)
+
+        ttl = get_redis_connection('default').pttl(cache.make_key('rate_limit:10.0.0.3'))
+        self.assertTrue(0 < ttl <= 120 * 1000)
+
+    def test_replaces_value_of_another_type(self):
+        """Test that a leftover value from the cache backend does not break counting."""
+        cache.set('rate_limit:10.0.0.4', [1000.0])
+
+        result = self.backend.hit('rate_limit:10.0.0.4', 3, 60, 1000.0)
+
+        self.assertEqual(result.remaining, 2)
+
+    @patch('time.time', return_value=1000)
+    def test_middleware_headers_with_redis_backend(self, mock_time):
+        """Test that the middleware keeps its header behaviour with the Redis backend."""
+        with patch.object(
+            RateLimitMiddleware, 'RATE_LIMIT_BACKEND',
+            'middleware.rate_limiter.backends.RedisSlidingLogBackend'
+        ), patch.object(RateLimitMiddleware, 'RATE_LIMIT_MAX_REQUESTS', 2):
+            middleware = RateLimitMiddleware(lambda req: HttpResponse("OK"))
+            factory = RequestFactory()
+            responses = []
+            for _ in range(3):
+                request = factory.get('/test/', REMOTE_ADDR='10.0.0.5')
+                responses.append(
+                    middleware.process_request(request)
+                    or middleware.process_response(request, HttpResponse("OK"))
+                )
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertEqual(responses[0]['X-RateLimit-Remaining'], '1')
+        self.assertEqual(responses[1]['X-RateLimit-Remaining'], '0')
+        self.assertEqual(responses[2]['X-RateLimit-Remaining'], '0')
+        self.assertEqual(responses[2]['X-RateLimit-Reset'], str(1000 + RateLimitMiddleware.RATE_LIMIT_WINDOW_SECONDS))
+
+
+class DefaultBackendConcurrencyTests(TestCase):
+    """
+    Tests that the configured default backend counts concurrent requests
+    without lost updates.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_requests_counted_exactly(self):
+        """Test that parallel workers for one client are allowed exactly the limit."""
+        limit = 20
+
+        def worker(_):
+            # One middleware per thread, like separate worker processes
+            middleware = RateLimitMiddleware(lambda req: HttpResponse("OK"))
+            return [
+                middleware.process_request(RequestFactory().get('/test/', REMOTE_ADDR='10.0.2.1')) is None
+                for _ in range(10)
+            ]
+
+        with patch.object(RateLimitMiddleware, 'RATE_LIMIT_MAX_REQUESTS', limit):
+            self.assertIsInstance(RateLimitMiddleware(lambda req: None).backend, RedisSlidingLogBackend)
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                allowed = sum(sum(results) for results in executor.map(worker, range(10)))
+
+        self.assertEqual(allowed, limit)
+
+
+def exact_allowed(times, limit, window):
+    """
+    Reference sliding log that does not count rejected requests.
+    """
+    log = deque()
+    allowed = 0
+    for now in times:
+        while log and log[0] <= now - window:
+            log.popleft()
+        if len(log) < limit:
+            log.append(now)
+            allowed += 1
+    return allowed
+
+
+class ConstantMemoryBackendTests(TestCase):
+    """
+    Tests for the sliding window counter and token bucket backends,
+    including their accuracy compared with the exact sliding log.
+    """
+    BACKENDS = (RedisSlidingWindowCounterBackend, RedisTokenBucketBackend)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_burst_limited(self):
+        """Test that a burst is cut off at the limit and rejects are not counted."""
+        for backend_class in self.BACKENDS:
+            with self.subTest(backend=backend_class.__name__):
+                backend = backend_class()
+                results = [backend.hit('rate_limit:burst', 3, 30, 1000.0) for _ in range(5)]
+
+                self.assertEqual([result.allowed for result in results], [True, True, True, False, False])
+                self.assertEqual([result.remaining for result in results], [2, 1, 0, 0, 0])
+
+    def test_constant_memory_per_key(self):
+        """Test that state per key does not grow with the number of requests."""
+        client = get_redis_connection('default')
+        for backend_class in self.BACKENDS:
+            with self.subTest(backend=backend_class.__name__):
+                backend = backend_class()
+                for i in range(200):
+                    backend.hit('rate_limit:memory', 1000, 60, 1000.0 + i * 0.01)
+
+                key = cache.make_key('rate_limit:memory')
+                if client.type(key) == b'hash':
+                    self.assertEqual(client.hlen(key), 3)
+                else:
+                    self.assertEqual(client.type(key), b'string')
+                client.delete(key)
+
+    def test_token_bucket_refills_gradually(self):
+        """Test that the token bucket frees one request per window / limit seconds."""
+        backend = RedisTokenBucketBackend()
+        for _ in range(3):
+            backend.hit('rate_limit:refill', 3, 30, 1000.0)
+
+        rejected = backend.hit('rate_limit:refill', 3, 30, 1009.0)
+        allowed = backend.hit('rate_limit:refill', 3, 30, 1010.0)
+
+        self.assertFalse(rejected.allowed)
+        self.assertEqual(rejected.reset, 1010.0)
+        self.assertEqual(rejected.retry_at, 1010.0)
+        self.assertTrue(allowed.allowed)
+
+    def test_counter_recovers_after_two_windows(self):
+        """Test that the sliding window counter forgets traffic older than two windows."""
+        backend = RedisSlidingWindowCounterBackend()
+        for _ in range(3):
+            backend.hit('rate_limit:recover', 3, 30, 1000.0)
+
+        self.assertFalse(backend.hit('rate_limit:recover', 3, 30, 1025.0).allowed)
+        self.assertEqual(backend.hit('rate_limit:recover', 3, 30, 1060.0).remaining, 2)
+
+    def test_accuracy_under_sustained_overload(self):
+        """Test that both backends stay within 10% of the exact log at 4x the allowed rate."""
+        times = [1000 + i * 0.25 for i in range(400)]
+        expected = exact_allowed(times, 10, 10)
+
+        for backend_class in self.BACKENDS:
+            with self.subTest(backend=backend_class.__name__):
+                backend = backend_class()
+                allowed = sum(backend.hit('rate_limit:overload', 10, 10, now).allowed for now in times)
+
+                self.assertLessEqual(abs(allowed - expected), expected * 0.1)
+
+    def test_accuracy_at_window_boundary(self):
+        """Test that a burst straddling a window boundary is not allowed twice over."""
+        times = [1009.5] * 10 + [1010.5] * 10
+        expected = exact_allowed(times, 10, 10)
+
+        for backend_class in self.BACKENDS:
+            with self.subTest(backend=backend_class.__name__):
+                backend = backend_class()
+                allowed = sum(backend.hit('rate_limit:boundary', 10, 10, now).allowed for now in times)
+
+                # a plain fixed window would allow 20 here
+                self.assertLessEqual(allowed, expected + 1)
+
+
+class AsyncRateLimitTests(TestCase):
+    """
+    Tests for the async backend and middleware paths used under ASGI.
+    """
+    BACKENDS = (
+        CacheSlidingLogBackend,
+        RedisSlidingLogBackend,
+        RedisSlidingWindowCounterBackend,
+        RedisTokenBucketBackend,
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    async def test_async_hit_shares_state_with_sync_hit(self):
+        """Test that ahit() counts against the same key as hit()."""
+        for backend_class in self.BACKENDS:
+            with self.subTest(backend=backend_class.__name__):
+                backend = backend_class()
+                key = f'rate_limit:async:{backend_class.__name__}'
+                first = backend.hit(key, 3, 60, 1000.0)
+                second = await backend.ahit(key, 3, 60, 1000.0)
+
+                self.assertEqual((first.remaining, second.remaining), (2, 1))
+
+    @patch('time.time', return_value=1000)
+    async def test_middleware_async_path(self, mock_time):
+        """Test that the middleware runs natively in async mode with the same headers."""
+        async def get_response(request):
+            return HttpResponse("OK")
+
+        with patch.object(
+            RateLimitMiddleware, 'RATE_LIMIT_BACKEND',
+            'middleware.rate_limiter.backends.RedisSlidingLogBackend'
+        ), patch.object(RateLimitMiddleware, 'RATE_LIMIT_MAX_REQUESTS', 1):
+            middleware = RateLimitMiddleware(get_response)
+            factory = AsyncRequestFactory()
+            with patch('middleware.rate_limiter.rate_limiter.MiddlewareMixin.__acall__') as mixin_acall:
+                allowed = await middleware(factory.get('/test/', REMOTE_ADDR='10.0.1.1'))
+                blocked = await middleware(factory.get('/test/', REMOTE_ADDR='10.0.1.1'))
+
+        mixin_acall.assert_not_called()
+        self.assertEqual(allowed.status_code, 200)
+        self.assertEqual(allowed['X-RateLimit-Remaining'], '0')
+        self.assertEqual(blocked.status_code, 429)
+        self.assertEqual(blocked['X-RateLimit-Reset'], str(1000 + RateLimitMiddleware.RATE_LIMIT_WINDOW_SECONDS))
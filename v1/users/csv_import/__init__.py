@@ -0,0 +1,3 @@
+"""
+Building blocks for the bulk CSV user import
+"""
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+@contextmanager
+def bulk_load(using='default'):
+    """
+    Switches a SQLite connection into bulk-load mode for the length of an
+    import.
+
+    Sets the CSV_UPLOAD_SQLITE_PRAGMAS (by default a larger page cache)
+    and restores the previous values afterwards. Lowering ``synchronous``
+    to ``off`` there is faster but trades durability for speed: with it an
+    OS crash or power loss during an import can corrupt the database,
+    even in WAL mode. ``normal``, the default, is safe with WAL.
+
+    Does nothing on other databases, or inside a transaction, where
+    SQLite does not allow changing the safety level.
+
+    Args:
+        using (str): Alias of the database connection
+    """
+    connection = connections[using]
+    pragmas = getattr(settings, 'CSV_UPLOAD_SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas or connection.in_atomic_block:
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        previous = {}
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}')
+            previous[name] = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        # The connection may have been closed if the import failed
+        if connection.connection is not None and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                for name, value in previous.items():
+                    cursor.execute(f'PRAGMA {name} = {value}')
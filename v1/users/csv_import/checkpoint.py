@@ -0,0 +1,104 @@
+from django.utils import timezone
+
+from v1.users.models import ImportCheckpoint
+
+
+# chunk_start of the checkpoint recording that a parallel import fanned
+# out into chunk subtasks, and then the merged result of those subtasks
+FAN_OUT_CHUNK = -1
+
+
+class ImportCheckpointer:
+    """
+    Records how far an import has committed, so a retried task resumes
+    after the last written batch instead of starting over.
+
+    ``save()`` is called inside the transaction that writes each batch, so
+    the checkpoint always matches the rows in the database. Rejected rows
+    past the checkpoint may already be stored when a task dies; they are
+    written again with conflicts ignored on resume. Keys seen before the
+    checkpoint are not remembered, so a later repeat of one of them is
+    rejected as existing in the database rather than as a duplicate in
+    the file.
+
+    Args:
+        import_id (str): Id of the import
+        chunk_start (int): Start offset of the chunk being imported, 0 for
+            a whole file
+    """
+    COUNTERS = (
+        'rows_processed', 'bytes_read', 'saved_records',
+        'updated_records', 'unchanged_records', 'rejected_records',
+    )
+
+    def __init__(self, import_id, chunk_start=0):
+        self.import_id = import_id
+        self.chunk_start = chunk_start
+        self.checkpoint = ImportCheckpoint.objects.filter(
+            import_id=import_id, chunk_start=chunk_start
+        ).first()
+
+    @property
+    def result(self):
+        """
+        The result of the import if it already finished, otherwise None.
+        """
+        return self.checkpoint.result if self.checkpoint is not None else None
+
+    @property
+    def resume_position(self):
+        """
+        (byte offset, row number) to continue reading from, or None to start
+        at the beginning.
+        """
+        if self.checkpoint is None:
+            return None
+        return self.checkpoint.byte_offset, self.checkpoint.next_row
+
+    def counters(self):
+        """
+        Returns the counters and error summary committed so far.
+        """
+        if self.checkpoint is None:
+            return dict.fromkeys(self.COUNTERS, 0), {}
+        return (
+            {name: getattr(self.checkpoint, name) for name in self.COUNTERS},
+            self.checkpoint.error_summary
+        )
+
+    def mark(self):
+        """
+        Records a checkpoint without a read position unless one exists,
+        e.g. to note that an import fanned out into chunk subtasks.
+        """
+        self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            import_id=self.import_id, chunk_start=self.chunk_start,
+            defaults={'next_row': 0, 'byte_offset': 0}
+        )
+
+    def save_result(self, result):
+        """
+        Stores the result of an import that has no read position of its
+        own, such as the merged result of its chunks.
+        """
+        self.save(0, 0, dict.fromkeys(self.COUNTERS, 0), {}, result)
+
+    def save(self, next_row, byte_offset, counters, error_summary, result=None):
+        """
+        Stores the position after the last committed row.
+        """
+        values = {
+            'next_row': next_row,
+            'byte_offset': byte_offset,
+            'error_summary': error_summary,
+            'result': result,
+            **counters,
+        }
+        if self.checkpoint is None:
+            self.checkpoint, _ = ImportCheckpoint.objects.update_or_create(
+                import_id=self.import_id, chunk_start=self.chunk_start, defaults=values
+            )
+        else:
+            ImportCheckpoint.objects.filter(pk=self.checkpoint.pk).update(updated_at=timezone.now(), **values)
+            for name, value in values.items():
+                setattr(self.checkpoint, name, value)
@@ -0,0 +1,141 @@
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.settings import api_settings
+
+from v1.users.models import CustomUser
+
+
+class DuplicateFilter:
+    """
+    Rejects duplicate users before they reach the database.
+
+    Keys already seen earlier in the same file are tracked in memory, and
+    keys that already exist in the database are found with chunked
+    ``__in`` lookups per batch instead of one query (or one failed INSERT)
+    per row.
+
+    Args:
+        lookup_chunk_size (int): Maximum number of values per ``__in`` lookup
+    """
+    EXISTS_MESSAGES = {
+        'email': "Email address already exists.",
+        'username': "Username already exists.",
+    }
+    DUPLICATE_MESSAGES = {
+        'email': "Duplicate email address in file.",
+        'username': "Duplicate username in file.",
+    }
+    UNIQUE_FIELDS = tuple(EXISTS_MESSAGES)
+
+    def __init__(self, lookup_chunk_size=500):
+        self.lookup_chunk_size = lookup_chunk_size
+        self.seen = {field: set() for field in self.UNIQUE_FIELDS}
+
+    def check_file_duplicate(self, validated_data):
+        """
+        Returns errors if the row repeats a key seen earlier in the file,
+        otherwise remembers its keys and returns None.
+        """
+        errors = {}
+        for field in self.UNIQUE_FIELDS:
+            value = validated_data.get(field)
+            if value is not None and value in self.seen[field]:
+                errors[field] = [ErrorDetail(self.DUPLICATE_MESSAGES[field], code='duplicate')]
+        if errors:
+            return errors
+
+        for field in self.UNIQUE_FIELDS:
+            value = validated_data.get(field)
+            if value is not None:
+                self.seen[field].add(value)
+        return None
+
+    def find_existing(self, batch):
+        """
+        Returns a dict mapping batch positions to errors for rows whose
+        keys already exist in the database.
+        """
+        collisions = {}
+        for field in self.UNIQUE_FIELDS:
+            positions = {}
+            for index, (_, _, validated_data) in enumerate(batch):
+                value = validated_data.get(field)
+                if value is not None:
+                    positions.setdefault(value, []).append(index)
+            for value in self._existing_values(field, list(positions)):
+                for index in positions[value]:
+                    collisions.setdefault(index, {})[field] = [
+                        ErrorDetail(self.EXISTS_MESSAGES[field], code='unique')
+                    ]
+        return collisions
+
+    def find_existing_users(self, batch, key='email'):
+        """
+        Returns a dict mapping the key values of a batch to the stored
+        field values of the users that already exist, including their pk.
+        """
+        values = list({validated_data[key] for _, _, validated_data in batch})
+        fields = {'pk', key}.union(*(validated_data for _, _, validated_data in batch))
+        users = {}
+        for start in range(0, len(values), self.lookup_chunk_size):
+            chunk = values[start:start + self.lookup_chunk_size]
+            for user in CustomUser.objects.filter(**{f"{key}__in": chunk}).values(*fields):
+                users[user[key]] = user
+        return users
+
+    def find_taken(self, batch, key='email'):
+        """
+        Returns a dict mapping batch positions to errors for rows whose
+        unique fields other than key belong to a stored user with a
+        different key, so a merge would collide with that user.
+        """
+        collisions = {}
+        for field in self.UNIQUE_FIELDS:
+            if field == key:
+                continue
+            positions = {}
+            for index, (_, _, validated_data) in enumerate(batch):
+                value = validated_data.get(field)
+                if value is not None:
+                    positions.setdefault(value, []).append(index)
+            for value, owner in self._existing_owners(field, key, list(positions)):
+                for index in positions[value]:
+                    if batch[index][2][key] != owner:
+                        collisions.setdefault(index, {})[field] = [
+                            ErrorDetail(self.EXISTS_MESSAGES[field], code='unique')
+                        ]
+        return collisions
+
+    def unique_errors(self, validated_data, exclude_pk=None):
+        """
+        Returns errors naming the unique fields of a row that are taken by
+        a stored user other than exclude_pk, for a row the database
+        rejected with an IntegrityError. Falls back to a generic unique
+        error if none is found, e.g. because the other row was since removed.
+        """
+        errors = {}
+        for field in self.UNIQUE_FIELDS:
+            value = validated_data.get(field)
+            if value is None:
+                continue
+            users = CustomUser.objects.filter(**{field: value})
+            if exclude_pk is not None:
+                users = users.exclude(pk=exclude_pk)
+            if users.exists():
+                errors[field] = [ErrorDetail(self.EXISTS_MESSAGES[field], code='unique')]
+        return errors or {
+            api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail("User already exists.", code='unique')]
+        }
+
+    def _existing_values(self, field, values):
+        for start in range(0, len(values), self.lookup_chunk_size):
+            chunk = values[start:start + self.lookup_chunk_size]
+            yield from CustomUser.objects.filter(
+                **{f"{field}__in": chunk}
+            ).values_list(field, flat=True)
+
+    def _existing_owners(self, field, key, values):
+        for start in range(0, len(values), self.lookup_chunk_size):
+            chunk = values[start:start + self.lookup_chunk_size]
+            yield from CustomUser.objects.filter(
+                **{f"{field}__in": chunk}
+            ).values_list(field, key)
@@ -0,0 +1,54 @@
+from collections import Counter
+
+from v1.users.csv_import.stages import StageTimer
+from v1.users.models import ImportRowError
+
+
+class ImportErrorLog:
+    """
+    Spills rejected rows of an import to the ImportRowError table.
+
+    Rejections are buffered and written with bulk_create every
+    ``flush_size`` rows, so memory stays bounded no matter how many rows
+    a file rejects. Only a count and an error-code histogram are kept in
+    memory for the task result.
+
+    Args:
+        import_id (str): Id the rejected rows are stored under
+        flush_size (int): Number of rejections buffered before writing
+        stages (StageTimer): Timer writes are charged to, as errors
+    """
+    def __init__(self, import_id, flush_size=1000, stages=None):
+        self.import_id = import_id
+        self.flush_size = flush_size
+        self.stages = stages or StageTimer()
+        self.buffer = []
+        self.count = 0
+        self.summary = Counter()
+
+    def record(self, row_num, row, errors):
+        """
+        Records a rejected row and its errors, keyed as in serializer.errors.
+        """
+        self.count += 1
+        for field, field_errors in errors.items():
+            for error in field_errors:
+                self.summary[f"{field}.{getattr(error, 'code', 'invalid')}"] += 1
+        self.buffer.append(ImportRowError(
+            import_id=self.import_id,
+            row=row_num,
+            data=row,
+            errors=errors
+        ))
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes buffered rejections to the database. Rows already stored by
+        an interrupted run of the same import are skipped.
+        """
+        if self.buffer:
+            with self.stages.stage('errors'):
+                ImportRowError.objects.bulk_create(self.buffer, ignore_conflicts=True)
+            self.buffer = []
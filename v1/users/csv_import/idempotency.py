@@ -0,0 +1,94 @@
+import hashlib
+
+from celery import states
+from django.conf import settings
+from django.core.cache import cache
+
+
+def upload_key(checksum, mode, idempotency_key=None, client=None):
+    """
+    Returns the cache key an upload is indexed under: the client's
+    Idempotency-Key if one was sent, scoped to the client so different
+    clients sending the same key do not collide, otherwise the file
+    checksum and import mode.
+    """
+    if idempotency_key:
+        scoped_key = hashlib.sha256(f"{client}\0{idempotency_key}".encode()).hexdigest()
+        return f"csv_upload:idempotency_key:{scoped_key}"
+    return f"csv_upload:checksum:{mode}:{checksum}"
+
+
+def client_identity(request):
+    """
+    Returns the identity an Idempotency-Key is scoped to: the
+    authenticated user, or the client IP for anonymous uploads.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return f"ip:{x_forwarded_for.split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR')}"
+
+
+def claim_upload(key, checksum, mode):
+    """
+    Atomically claims an upload key for a new import.
+
+    Returns:
+        dict: None if the key was claimed, otherwise the entry of the
+        earlier upload with its ``checksum``, ``mode`` and ``task_id``
+        (None while that upload is still being queued)
+    """
+    entry = _entry(checksum, mode)
+    if cache.add(key, entry, timeout=_ttl()):
+        return None
+    existing = cache.get(key)
+    if existing is None:
+        # Expired in between, try once more
+        return None if cache.add(key, entry, timeout=_ttl()) else cache.get(key, entry)
+    return existing
+
+
+def reclaim_upload(key, checksum, mode, failed_task_id):
+    """
+    Claims an upload key whose import failed, so it can be imported again.
+    Only one of several concurrent retries of the same failed task wins.
+
+    Returns:
+        bool: Whether the key was claimed
+    """
+    if not cache.add(f"{key}:retry:{failed_task_id}", True, timeout=_ttl()):
+        return False
+    cache.set(key, _entry(checksum, mode), timeout=_ttl())
+    return True
+
+
+def record_task(key, checksum, mode, task_id):
+    """
+    Stores the task importing a claimed upload.
+    """
+    cache.set(key, _entry(checksum, mode, task_id), timeout=_ttl())
+
+
+def release_upload(key):
+    """
+    Frees a claimed key, e.g. when the import could not be queued.
+    """
+    cache.delete(key)
+
+
+def is_retryable(state):
+    """
+    Returns whether an upload whose import ended in state may be imported again.
+    """
+    return state in (states.FAILURE, states.REVOKED)
+
+
+def _entry(checksum, mode, task_id=None):
+    return {"checksum": checksum, "mode": mode, "task_id": task_id}
+
+
+def _ttl():
+    return getattr(settings, 'CSV_UPLOAD_IDEMPOTENCY_TTL', 24 * 60 * 60)
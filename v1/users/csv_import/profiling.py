@@ -0,0 +1,84 @@
+import cProfile
+import os
+import pstats
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+@contextmanager
+def profiled(name):
+    """
+    Runs the enclosed block under cProfile when CSV_UPLOAD_PROFILE_DIR is
+    set, and stores ``<name>.prof`` (for pstats or snakeviz) and
+    ``<name>.collapsed`` (folded stacks for flamegraph.pl or speedscope)
+    in that directory.
+
+    Args:
+        name (str): File name stem, normally the import id
+    """
+    directory = getattr(settings, 'CSV_UPLOAD_PROFILE_DIR', None)
+    if not directory:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        profiler.dump_stats(f'{path}.prof')
+        with open(f'{path}.collapsed', 'w') as file:
+            for stack, microseconds in collapsed_stacks(pstats.Stats(profiler)):
+                file.write(f'{stack} {microseconds}\n')
+
+
+def collapsed_stacks(stats, max_depth=64, min_microseconds=100):
+    """
+    Yields (stack, microseconds) pairs of folded stacks rebuilt from a
+    profile.
+
+    cProfile only records caller to callee edges, so the time of a function
+    is split over its callers in proportion to the time spent under each of
+    them; the stacks are an approximation good enough for a flamegraph.
+    Subtrees taking less than min_microseconds are left out, which keeps
+    the number of paths through the call graph manageable.
+    """
+    children = {}
+    roots = []
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            roots.append(function)
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            children.setdefault(caller, []).append((function, edge_cumulative))
+
+    def walk(function, path, share, visited):
+        own_time = stats.stats[function][2]
+        microseconds = int(own_time * share * 1e6)
+        if microseconds:
+            yield ';'.join(path), microseconds
+        if len(path) >= max_depth:
+            return
+        for child, edge_cumulative in children.get(function, ()):
+            child_cumulative = stats.stats[child][3]
+            if child in visited or not child_cumulative:
+                continue
+            child_share = edge_cumulative * share / child_cumulative
+            if child_cumulative * child_share * 1e6 < min_microseconds:
+                continue
+            visited.add(child)
+            yield from walk(child, path + [_frame(child)], child_share, visited)
+            visited.discard(child)
+
+    for root in roots:
+        yield from walk(root, [_frame(root)], 1.0, {root})
+
+
+def _frame(function):
+    file_name, line, name = function
+    if file_name == '~':
+        return name.replace(';', ':')
+    return f'{name} ({os.path.basename(file_name)}:{line})'.replace(';', ':')
@@ -0,0 +1,112 @@
+import time
+
+from celery import current_app
+from django_redis import get_redis_connection
+
+from common.task_events import publish_task_event
+
+
+PROGRESS_STATE = 'PROGRESS'
+
+
+class ProgressReporter:
+    """
+    Publishes throttled PROGRESS states for a running CSV import, both to
+    the result backend and as task events.
+
+    A state update is sent at most every ``every_rows`` rows or
+    ``every_seconds`` seconds, whichever comes first, so reporting does
+    not slow the import down. When ``shared`` is set, several chunk tasks
+    report into the same task id: each stores its own counters in a Redis
+    hash under its chunk and publishes the sum over all chunks. The
+    counters are absolute, so a chunk that is redelivered and resumes from
+    its checkpoint overwrites its earlier values instead of adding to them.
+
+    Args:
+        task_id (str): Id of the task whose state is updated, or None to
+            disable reporting
+        total_bytes (int): Size of the data being imported
+        every_rows (int): Row interval between updates
+        every_seconds (float): Time interval between updates
+        shared (bool): Whether several tasks report into task_id
+        chunk (int): Start offset of the chunk this reporter counts, when shared
+    """
+    COUNTERS = ('rows_processed', 'saved_records', 'rejected_records', 'bytes_read')
+    KEY_TTL_SECONDS = 24 * 60 * 60
+
+    def __init__(self, task_id, total_bytes, every_rows=1000, every_seconds=2.0, shared=False, chunk=0):
+        self.task_id = task_id
+        self.total_bytes = total_bytes
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.shared = shared
+        self.chunk = chunk
+        self.started_at = time.time()
+        self.start_rows = 0
+        self.last_rows = 0
+        self.last_time = time.monotonic()
+
+    def resume(self, rows_processed):
+        """
+        Starts counting from the rows an earlier run already committed, so
+        they are not included in the reported rate.
+        """
+        self.start_rows = self.last_rows = rows_processed
+
+    def maybe_report(self, rows_processed, saved_records, rejected_records, bytes_read):
+        """
+        Publishes progress if enough rows or time have passed since the last update.
+        """
+        if self.task_id is None:
+            return
+        if (rows_processed - self.last_rows < self.every_rows
+                and time.monotonic() - self.last_time < self.every_seconds):
+            return
+        self.report(rows_processed, saved_records, rejected_records, bytes_read)
+
+    def report(self, rows_processed, saved_records, rejected_records, bytes_read):
+        """
+        Publishes progress unconditionally.
+        """
+        if self.task_id is None:
+            return
+        self.last_rows = rows_processed
+        self.last_time = time.monotonic()
+        counters = {
+            'rows_processed': rows_processed,
+            'saved_records': saved_records,
+            'rejected_records': rejected_records,
+            'bytes_read': bytes_read,
+        }
+        if self.shared:
+            # Rows of every chunk since the first one started
+            counters, started_at = self._add_to_shared(counters)
+            rows_this_run = counters['rows_processed']
+        else:
+            started_at = self.started_at
+            rows_this_run = rows_processed - self.start_rows
+
+        elapsed = max(time.time() - started_at, 1e-6)
+        meta = {
+            **counters,
+            'bytes_total': self.total_bytes,
+            'rows_per_second': round(rows_this_run / elapsed, 1),
+            'elapsed_seconds': round(elapsed, 3),
+        }
+        current_app.backend.store_result(self.task_id, meta, PROGRESS_STATE)
+        publish_task_event(self.task_id, PROGRESS_STATE, meta)
+
+    def _add_to_shared(self, counters):
+        key = f"csv_import:progress:{self.task_id}"
+        pipeline = get_redis_connection('default').pipeline()
+        pipeline.hsetnx(key, 'started_at', self.started_at)
+        pipeline.hset(key, mapping={f'{self.chunk}:{name}': value for name, value in counters.items()})
+        pipeline.expire(key, self.KEY_TTL_SECONDS)
+        pipeline.hgetall(key)
+        fields = pipeline.execute()[-1]
+        totals = dict.fromkeys(self.COUNTERS, 0)
+        for field, value in fields.items():
+            _, _, name = field.decode().partition(':')
+            if name in totals:
+                totals[name] += int(value)
+        return totals, float(fields[b'started_at'])
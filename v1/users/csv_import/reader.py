@@ -0,0 +1,84 @@
+import csv
+
+
+class CSVRowReader:
+    """
+    Streams the rows of a binary CSV file as dicts while tracking byte offsets.
+
+    Behaves like csv.DictReader over the whole file, but can start and stop
+    at byte offsets that fall on row boundaries, so a file can be split into
+    independently processed ranges. Every row is yielded together with its
+    1-based row number and the byte offset just past it.
+
+    Args:
+        file: Binary file object supporting seek()
+        start_offset (int): Offset of the first row to read, defaults to the
+            first row after the header
+        end_offset (int): Offset to stop reading at, defaults to end of file
+        first_row_num (int): Row number of the row at start_offset
+        encoding (str): Text encoding of the file
+    """
+    def __init__(self, file, start_offset=None, end_offset=None, first_row_num=1, encoding='utf-8'):
+        self.file = file
+        self.end_offset = end_offset
+        self.first_row_num = first_row_num
+        self.encoding = encoding
+        self.offset = 0
+
+        self.file.seek(0)
+        header_reader = csv.reader(self._lines())
+        self.fieldnames = next(header_reader, None)
+        self.data_offset = self.offset
+        if start_offset is not None and start_offset != self.offset:
+            self.file.seek(start_offset)
+            self.offset = start_offset
+
+    def _lines(self):
+        while self.end_offset is None or self.offset < self.end_offset:
+            line = self.file.readline()
+            if not line:
+                return
+            self.offset += len(line)
+            yield line.decode(self.encoding)
+
+    def __iter__(self):
+        if self.fieldnames is None:
+            return
+        fieldnames = self.fieldnames
+        field_count = len(fieldnames)
+        row_num = self.first_row_num
+        for values in csv.reader(self._lines()):
+            if not values:
+                continue
+            row = dict(zip(fieldnames, values))
+            if len(values) > field_count:
+                row[None] = values[field_count:]
+            elif len(values) < field_count:
+                for key in fieldnames[len(values):]:
+                    row[key] = None
+            yield row_num, row, self.offset
+            row_num += 1
+
+
+def plan_chunks(file, chunk_rows, encoding='utf-8'):
+    """
+    Splits a CSV file into ranges of at most chunk_rows rows.
+
+    Returns:
+        list: (start_offset, end_offset, first_row_num) tuples covering
+        every row of the file
+    """
+    reader = CSVRowReader(file, encoding=encoding)
+    chunks = []
+    start_offset = reader.data_offset
+    first_row_num = 1
+    rows_in_chunk = 0
+    end_offset = start_offset
+    for row_num, _, end_offset in reader:
+        rows_in_chunk += 1
+        if rows_in_chunk == chunk_rows:
+            chunks.append((start_offset, end_offset, first_row_num))
+            start_offset, first_row_num, rows_in_chunk = end_offset, row_num + 1, 0
+    if rows_in_chunk:
+        chunks.append((start_offset, end_offset, first_row_num))
+    return chunks
@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+
+
+STAGES = ('parse', 'transform', 'validate', 'dedupe', 'write', 'errors', 'report')
+
+
+class StageTimer:
+    """
+    Cumulative wall-clock time and entry counts per import stage.
+
+    Time is always charged to the current stage: ``switch`` moves the
+    clock on to another stage with one ``perf_counter`` call, cheap
+    enough for the per-row loop, and ``stage`` charges a nested block to
+    a stage and then resumes the one it interrupted.
+
+    Stages: parse (reading CSV rows), transform (splitting names),
+    validate (field validation), dedupe (in-file and database duplicate
+    checks), write (inserts, updates and checkpoints), errors (recording
+    and storing rejected rows) and report (progress updates).
+    """
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.current = None
+        self.started = time.perf_counter()
+
+    def switch(self, stage):
+        """
+        Charges the time since the last switch to the current stage and
+        enters stage. Returns the stage that was left.
+        """
+        now = time.perf_counter()
+        previous = self.current
+        if previous is not None:
+            self.seconds[previous] += now - self.started
+        self.current, self.started = stage, now
+        if stage is not None:
+            self.calls[stage] += 1
+        return previous
+
+    def resume(self, stage):
+        """
+        Like switch(), without counting an entry into stage.
+        """
+        self.switch(stage)
+        if stage is not None:
+            self.calls[stage] -= 1
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Charges the enclosed block to stage.
+        """
+        previous = self.switch(stage)
+        try:
+            yield
+        finally:
+            self.resume(previous)
+
+    def stop(self):
+        """
+        Charges the time since the last switch and leaves the current stage.
+        """
+        self.switch(None)
+
+    def summary(self):
+        """
+        Returns {stage: {"seconds": float, "calls": int}} for the task result.
+        """
+        return {
+            stage: {"seconds": round(self.seconds[stage], 6), "calls": self.calls[stage]}
+            for stage in STAGES
+        }
@@ -0,0 +1,83 @@
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+
+
+CHECKSUM_ALGORITHM = 'sha256'
+
+
+def get_upload_storage():
+    """
+    Returns the storage backend that uploaded CSV files are spooled to.
+    """
+    return storages[getattr(settings, 'CSV_UPLOAD_STORAGE', 'csv_uploads')]
+
+
+def checksum_file(file):
+    """
+    Computes the hex digest of a file by reading it in chunks.
+    """
+    digest = hashlib.new(CHECKSUM_ALGORITHM)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _HashingFile(File):
+    """
+    Wraps an uploaded file so that the storage backend's own read of it
+    also computes its checksum.
+    """
+    def __init__(self, file):
+        super().__init__(file, name=file.name)
+        self.digest = hashlib.new(CHECKSUM_ALGORITHM)
+
+    def seek(self, *args):
+        position = self.file.seek(*args)
+        if self.file.tell() == 0:
+            # The storage rewound to re-read the file, so start over
+            self.digest = hashlib.new(CHECKSUM_ALGORITHM)
+        return position
+
+    def read(self, *args):
+        data = self.file.read(*args)
+        self.digest.update(data)
+        return data
+
+
+def spool_upload(uploaded_file):
+    """
+    Streams an uploaded file into the upload storage, computing its
+    checksum in the same pass.
+
+    Returns:
+        tuple: The stored file name and its checksum
+    """
+    hashing_file = _HashingFile(uploaded_file)
+    file_name = get_upload_storage().save(f"{uuid4().hex}.csv", hashing_file)
+    return file_name, hashing_file.digest.hexdigest()
+
+
+def open_upload(file_name, checksum=None):
+    """
+    Opens a spooled upload in binary mode, verifying its checksum if given.
+
+    Raises:
+        ValueError: If the stored file does not match the checksum
+    """
+    storage = get_upload_storage()
+    if checksum is not None:
+        with storage.open(file_name, 'rb') as file:
+            if checksum_file(file) != checksum:
+                raise ValueError(f"Checksum mismatch for spooled upload {file_name}.")
+    return storage.open(file_name, 'rb')
+
+
+def delete_upload(file_name):
+    """
+    Removes a spooled upload once it has been processed.
+    """
+    get_upload_storage().delete(file_name)
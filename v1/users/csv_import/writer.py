@@ -0,0 +1,196 @@
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ErrorDetail
+
+from v1.users.csv_import.dedupe import DuplicateFilter
+from v1.users.csv_import.stages import StageTimer
+from v1.users.models import CustomUser
+
+
+INSERT = 'insert'
+UPSERT = 'upsert'
+UPDATE = 'update'
+IMPORT_MODES = (INSERT, UPSERT, UPDATE)
+
+# Field existing users are matched on in upsert and update modes
+MERGE_KEY = 'email'
+
+
+class BulkUserWriter:
+    """
+    Buffers validated user rows and writes them in batches.
+
+    In insert mode rows are written with bulk_create and rows whose keys
+    already exist are rejected. In upsert mode rows for existing emails
+    update those users with bulk_update and the rest are inserted with
+    bulk_create; an email another import created in the meantime is
+    looked up again and merged, so it counts as updated rather than
+    saved. In update mode existing users are changed with bulk_update
+    and unknown emails are rejected. In both merge modes rows that match
+    the stored user are counted as unchanged and not written at all, and
+    rows whose username belongs to another user are rejected before
+    writing.
+
+    Each flush runs in its own transaction. When a batch fails, it is
+    bisected so the good rows are still saved and every failing row is
+    reported individually to the error log.
+
+    Args:
+        batch_size (int): Number of rows written per bulk statement
+        error_log (ImportErrorLog): Log that rejected rows are recorded in
+        duplicate_filter (DuplicateFilter): Filter used to reject rows
+            whose keys already exist before each batch is written, and to
+            look up existing users in the merge modes; optional in insert mode
+        mode (str): One of IMPORT_MODES
+        before_commit (callable): Optional callback run at the end of each
+            flush; the flush and the callback then share one transaction
+        stages (StageTimer): Timer the database lookups and rejections are
+            charged to, as dedupe and errors
+    """
+    def __init__(self, batch_size, error_log, duplicate_filter=None, mode=INSERT, before_commit=None,
+                 stages=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode '{mode}'.")
+        self.batch_size = batch_size
+        self.error_log = error_log
+        self.duplicate_filter = duplicate_filter
+        self.mode = mode
+        self.before_commit = before_commit
+        self.stages = stages or StageTimer()
+        self.buffer = []
+        self.saved_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+
+    def add(self, row_num, row, validated_data):
+        """
+        Queues a validated row and flushes once the batch is full.
+        """
+        self.buffer.append((row_num, row, validated_data))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows to the database.
+        """
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        if self.before_commit is None:
+            self._flush(batch)
+            return
+        with transaction.atomic():
+            self._flush(batch)
+            self.before_commit()
+
+    def _flush(self, batch):
+        if self.mode != INSERT:
+            self._merge(batch)
+            return
+        if self.duplicate_filter is not None:
+            with self.stages.stage('dedupe'):
+                collisions = self.duplicate_filter.find_existing(batch)
+            if collisions:
+                for index, errors in collisions.items():
+                    self.reject(batch[index], errors)
+                batch = [
+                    entry for index, entry in enumerate(batch)
+                    if index not in collisions
+                ]
+        if batch:
+            self._write(batch, {})
+
+    def _merge(self, batch, retry=True):
+        with self.stages.stage('dedupe'):
+            existing = self.duplicate_filter.find_existing_users(batch, key=MERGE_KEY)
+        changed = []
+        for entry in batch:
+            _, _, validated_data = entry
+            user = existing.get(validated_data[MERGE_KEY])
+            if user is None:
+                if self.mode == UPDATE:
+                    self.reject(entry, {MERGE_KEY: [
+                        ErrorDetail("No user with this email address exists.", code='does_not_exist')
+                    ]})
+                else:
+                    changed.append(entry)
+            elif all(user[field] == value for field, value in validated_data.items()):
+                self.unchanged_count += 1
+            else:
+                changed.append(entry)
+        if changed:
+            with self.stages.stage('dedupe'):
+                collisions = self.duplicate_filter.find_taken(changed, key=MERGE_KEY)
+            for index, errors in collisions.items():
+                self.reject(changed[index], errors)
+            changed = [entry for index, entry in enumerate(changed) if index not in collisions]
+        if changed:
+            self._write(changed, existing, retry)
+
+    def _write(self, batch, existing, retry=True):
+        try:
+            with transaction.atomic():
+                written = self._save(batch, existing)
+            if not written:
+                self.unchanged_count += len(batch)
+                return
+            for _, _, validated_data in batch:
+                if validated_data[MERGE_KEY] in existing:
+                    self.updated_count += 1
+                else:
+                    self.saved_count += 1
+        except Exception as e:
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                self._write(batch[:middle], existing, retry)
+                self._write(batch[middle:], existing, retry)
+            elif (isinstance(e, IntegrityError) and self.mode == UPSERT and retry
+                    and batch[0][2][MERGE_KEY] not in existing):
+                # Another chunk created this email after the lookup; merge into that user
+                self._merge(batch, retry=False)
+            elif isinstance(e, IntegrityError):
+                _, _, validated_data = batch[0]
+                user = existing.get(validated_data.get(MERGE_KEY))
+                with self.stages.stage('dedupe'):
+                    errors = (self.duplicate_filter or DuplicateFilter()).unique_errors(
+                        validated_data, exclude_pk=user['pk'] if user is not None else None
+                    )
+                self.reject(batch[0], errors)
+            else:
+                self.reject(batch[0], {
+                    "database_error": [ErrorDetail(str(e), code='database_error')]
+                })
+
+    def _save(self, batch, existing):
+        """
+        Writes a batch and returns whether anything was written. Update
+        mode never creates users, so a batch with no fields besides the
+        email is skipped there.
+        """
+        update_fields = sorted(
+            set().union(*(validated_data for _, _, validated_data in batch)) - {MERGE_KEY}
+        )
+        if self.mode == UPDATE and not update_fields:
+            return False
+        new_users = [
+            CustomUser(**validated_data) for _, _, validated_data in batch
+            if validated_data[MERGE_KEY] not in existing
+        ]
+        if new_users:
+            CustomUser.objects.bulk_create(new_users)
+        changed_users = [
+            CustomUser(pk=existing[validated_data[MERGE_KEY]]['pk'], **validated_data)
+            for _, _, validated_data in batch
+            if validated_data[MERGE_KEY] in existing
+        ]
+        if changed_users and update_fields:
+            CustomUser.objects.bulk_update(changed_users, update_fields)
+        return True
+
+    def reject(self, entry, errors):
+        """
+        Records a buffered row as rejected with the given errors.
+        """
+        row_num, row, _ = entry
+        with self.stages.stage('errors'):
+            self.error_log.record(row_num, row, errors)
@@ -0,0 +1,97 @@
+"""
+Streaming export of users in the format the CSV import consumes
+"""
+import csv
+import io
+import json
+import zlib
+
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+HEADER = ('name', 'email', 'age')
+
+
+def _iter_users(queryset, chunk_size):
+    """
+    Yields lists of (name, email, age) tuples of at most chunk_size users,
+    fetched in id order with a server-side cursor where the database
+    supports one.
+    """
+    rows = queryset.order_by('id').values_list(
+        'first_name', 'last_name', 'email', 'age'
+    ).iterator(chunk_size=chunk_size)
+    chunk = []
+    for first_name, last_name, email, age in rows:
+        chunk.append((f'{first_name} {last_name}'.strip(), email, age))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(queryset, chunk_size):
+    """
+    Yields the users as CSV text, one string per chunk of rows.
+    The header is yielded on its own so the response starts immediately.
+    A missing age is written as an empty field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    yield buffer.getvalue()
+    for chunk in _iter_users(queryset, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(queryset, chunk_size):
+    """
+    Yields the users as JSON lines, one string per chunk of rows.
+    """
+    for chunk in _iter_users(queryset, chunk_size):
+        yield ''.join(
+            json.dumps(dict(zip(HEADER, row))) + '\n' for row in chunk
+        )
+
+
+def gzip_stream(chunks):
+    """
+    Compresses a stream of strings into a gzip stream on the fly.
+
+    Args:
+        chunks (iterable): Text chunks to compress
+
+    Returns:
+        generator: gzip encoded bytes
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_users(queryset, fmt=CSV, compress=False, chunk_size=2000):
+    """
+    Returns a generator writing the users of a queryset as they are fetched.
+
+    Args:
+        queryset (QuerySet): Users to export
+        fmt (str): csv or ndjson
+        compress (bool): Whether to gzip the output
+        chunk_size (int): Rows fetched from the database per round trip
+
+    Returns:
+        generator: str chunks, or bytes when compressed
+    """
+    chunks = iter_csv(queryset, chunk_size) if fmt == CSV else iter_ndjson(queryset, chunk_size)
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,40 @@
+from rest_framework.exceptions import ValidationError
+
+
+class UserFilter:
+    """
+    Applies the user listing query parameters to a queryset.
+
+    Supported parameters are ``email`` and ``last_name`` (exact matches)
+    and ``age_min`` / ``age_max`` (inclusive range). Each one is served by
+    an index that also covers the ``id`` ordering of keyset pagination.
+    """
+    EXACT_FILTERS = ('email', 'last_name')
+    RANGE_FILTERS = {
+        'age_min': 'age__gte',
+        'age_max': 'age__lte',
+    }
+
+    def __init__(self, query_params):
+        self.query_params = query_params
+
+    def filter_queryset(self, queryset):
+        """
+        Returns the queryset narrowed by the filters present in the request.
+
+        Raises:
+            ValidationError: If a range bound is not an integer
+        """
+        for name in self.EXACT_FILTERS:
+            value = self.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{name: value})
+        for name, lookup in self.RANGE_FILTERS.items():
+            value = self.query_params.get(name)
+            if value:
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise ValidationError({"error": f"{name} must be an integer."})
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
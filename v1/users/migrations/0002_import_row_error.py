@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRowError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_id', models.CharField(max_length=255)),
+                ('row', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('errors', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('import_id', 'row'), name='unique_import_row_error')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_import_row_error'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_id', models.CharField(max_length=255)),
+                ('chunk_start', models.BigIntegerField(default=0)),
+                ('next_row', models.PositiveIntegerField()),
+                ('byte_offset', models.BigIntegerField()),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('bytes_read', models.BigIntegerField(default=0)),
+                ('saved_records', models.PositiveIntegerField(default=0)),
+                ('updated_records', models.PositiveIntegerField(default=0)),
+                ('unchanged_records', models.PositiveIntegerField(default=0)),
+                ('rejected_records', models.PositiveIntegerField(default=0)),
+                ('error_summary', models.JSONField(default=dict)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('import_id', 'chunk_start'), name='unique_import_checkpoint')],
+            },
+        ),
+    ]
@@ -18,5 +18,88 @@ class CustomUser(AbstractUser):
         unique=True
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination over id within a last_name / age filter
+            models.Index(fields=['last_name', 'id'], name='user_last_name_id_idx'),
+            models.Index(fields=['age', 'id'], name='user_age_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.username
+
+class ImportRowError(models.Model):
+    """A rejected row of a CSV user import, kept outside the task result."""
+    import_id = models.CharField(
+        max_length=255
+    )
+    row = models.PositiveIntegerField()
+    data = models.JSONField()
+    errors = models.JSONField()
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['import_id', 'row'],
+                name='unique_import_row_error'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.import_id} row {self.row}"
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a CSV import (or one chunk of it) committed so far, so a
+    retried task can resume after the last written batch.
+    """
+    import_id = models.CharField(
+        max_length=255
+    )
+    chunk_start = models.BigIntegerField(
+        default=0
+    )
+    next_row = models.PositiveIntegerField()
+    byte_offset = models.BigIntegerField()
+    rows_processed = models.PositiveIntegerField(
+        default=0
+    )
+    bytes_read = models.BigIntegerField(
+        default=0
+    )
+    saved_records = models.PositiveIntegerField(
+        default=0
+    )
+    updated_records = models.PositiveIntegerField(
+        default=0
+    )
+    unchanged_records = models.PositiveIntegerField(
+        default=0
+    )
+    rejected_records = models.PositiveIntegerField(
+        default=0
+    )
+    error_summary = models.JSONField(
+        default=dict
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['import_id', 'chunk_start'],
+                name='unique_import_checkpoint'
+            ),
+        ]
+
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return f"{self.import_id} from row {self.next_row}"
@@ -0,0 +1,15 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination over user ids.
+
+    Each page is fetched with ``WHERE id > <cursor> ORDER BY id LIMIT n``,
+    so deep pages cost the same as the first one and no COUNT(*) is run.
+    """
+    ordering = 'id'
+    page_size = getattr(settings, 'USERS_PAGE_SIZE', 100)
+    page_size_query_param = 'limit'
+    max_page_size = 1000
@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
 from v1.users.models import CustomUser
 from common.serializers.custom_fields import AgeField
+from common.serializers.dynamic_fields import DynamicFieldsModelSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -15,4 +18,54 @@ class UserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'age'
-        ]
\ No newline at end of file
+        ]
+
+
+class UserImportSerializer(UserSerializer):
+    """
+    UserSerializer variant for bulk imports.
+    Skips the per-row uniqueness queries, since the import checks
+    emails and usernames for a whole batch at once.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                validator for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+        return fields
+
+    def to_internal_value(self, data):
+        """
+        Reads a blank cell in a nullable, non-text column such as age as null.
+        """
+        blank = [
+            name for name, field in self.fields.items()
+            if field.allow_null
+            and not isinstance(field, serializers.CharField)
+            and isinstance(data.get(name), str)
+            and not data[name].strip()
+        ]
+        if blank:
+            data = {**data, **dict.fromkeys(blank)}
+        return super().to_internal_value(data)
+
+
+class UserListSerializer(DynamicFieldsModelSerializer):
+    """
+    Read-only representation of users for the listing API.
+    Supports sparse field selection through the ``fields`` argument.
+    """
+    class Meta:
+        model = CustomUser
+        fields = [
+            'id',
+            'username',
+            'email',
+            'first_name',
+            'last_name',
+            'age',
+            'date_joined'
+        ]
+        read_only_fields = fields
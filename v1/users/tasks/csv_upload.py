@@ -1,59 +1,367 @@
-import csv
-from io import StringIO
-from celery import shared_task
-from django.db import IntegrityError
+from collections import Counter
+from datetime import timedelta
+from uuid import uuid4
 
+from celery import chord, shared_task
+from celery.exceptions import Ignore
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from common.task_events import TaskEventsTask
+from middleware.metrics.registry import registry as metrics_registry
+from v1.users.csv_import import storage as upload_storage
+from v1.users.csv_import.bulk_load import bulk_load
+from v1.users.csv_import.checkpoint import FAN_OUT_CHUNK, ImportCheckpointer
+from v1.users.csv_import.dedupe import DuplicateFilter
+from v1.users.csv_import.errors import ImportErrorLog
+from v1.users.csv_import.profiling import profiled
+from v1.users.csv_import.progress import ProgressReporter
+from v1.users.csv_import.reader import CSVRowReader, plan_chunks
+from v1.users.csv_import.stages import STAGES, StageTimer
+from v1.users.csv_import.validation import CompiledRowValidator
+from v1.users.csv_import.writer import INSERT, UPDATE, BulkUserWriter
+from v1.users.models import ImportCheckpoint, ImportRowError
 from v1.users.serializers import users as user_serializers
-from v1.users.models import CustomUser
 
 
-@shared_task
-def process_csv_upload(csv_data):
+@shared_task(bind=True, base=TaskEventsTask, acks_late=True, reject_on_worker_lost=True)
+def process_csv_upload(self, file_name, checksum, mode=INSERT):
     """
-    Celery task to process the uploaded CSV data.
-    Parses, validates, and saves user records asynchronously.
+    Celery task to process a spooled CSV upload.
+    Validates and saves user records in checkpointed batches (see _import_rows).
     """
     print("Processing CSV data...")
-    decoded_file = StringIO(csv_data)
-    reader = csv.DictReader(decoded_file)
-
-    saved_count = 0
-    rejected_count = 0
-    errors = []
-
-    for row_num, row in enumerate(reader, start=1):
-        name = row["name"].strip().split(" ")
-        row["first_name"], row["last_name"] = name[0], " ".join(name[1:])
-        serializer = user_serializers.UserSerializer(data=row)
-
-        if serializer.is_valid():
-            try:
-                CustomUser.objects.create(**serializer.validated_data)
-                saved_count += 1
-            except IntegrityError:
-                rejected_count += 1
-                errors.append({
-                    "row": row_num,
-                    "data": row,
-                    "errors": {"email": ["Email address already exists."]}
-                })
-            except Exception as e:
-                rejected_count += 1
-                errors.append({
-                    "row": row_num,
-                    "data": row,
-                    "errors": {"database_error": [str(e)]}
-                })
+    import_id = _import_id(self)
+    return _import_upload(
+        file_name, checksum, import_id, _reporting_task_id(self), mode, _checkpointer(self, import_id)
+    )
+
+
+def _import_upload(file_name, checksum, import_id, progress_task_id, mode=INSERT, checkpointer=None):
+    """
+    Imports a whole spooled upload, resuming from its checkpoint if
+    there is one, and removes it afterwards.
+    """
+    if checkpointer is not None and checkpointer.result is not None:
+        # Redelivered after it finished; the upload is already gone
+        return checkpointer.result
+    with upload_storage.open_upload(file_name, checksum) as file, bulk_load(), profiled(import_id):
+        reader = _resumable_reader(checkpointer, file)
+        result = _import_rows(reader, import_id, _progress_reporter(
+            progress_task_id, total_bytes=file.size - reader.data_offset
+        ), mode, checkpointer)
+    upload_storage.delete_upload(file_name)
+    return result
+
+
+@shared_task(bind=True, base=TaskEventsTask, acks_late=True, reject_on_worker_lost=True)
+def process_csv_upload_parallel(self, file_name, checksum, mode=INSERT):
+    """
+    Celery task to process a large spooled CSV upload in parallel.
+    Splits the file into ranges of CSV_UPLOAD_CHUNK_ROWS rows, imports
+    each range in its own subtask and merges their results with a chord
+    callback. The chord replaces this task, so its result is available
+    under the original task id in the same shape as process_csv_upload.
+    The fan-out and then the merged result are checkpointed, so a
+    redelivered task neither fans out twice nor reads the removed upload.
+    Duplicates within a chunk are caught in memory. A key repeated in
+    another chunk is resolved by the database: in insert mode the later
+    copy is rejected as already existing, and in upsert mode it is
+    merged into the user the other chunk created, counting as updated.
+    """
+    import_id = _import_id(self)
+    checkpointer = _checkpointer(self, import_id)
+    fan_out = _checkpointer(self, import_id, chunk_start=FAN_OUT_CHUNK)
+    for finished in (checkpointer, fan_out):
+        if finished is not None and finished.result is not None:
+            return finished.result
+    if fan_out is not None and fan_out.checkpoint is not None:
+        # Redelivered after fanning out; the chord callback reports the result
+        raise Ignore()
+
+    with upload_storage.open_upload(file_name, checksum) as file:
+        chunks = plan_chunks(file, getattr(settings, 'CSV_UPLOAD_CHUNK_ROWS', 50000))
+
+    if len(chunks) <= 1:
+        return _import_upload(file_name, None, import_id, _reporting_task_id(self), mode, checkpointer)
+
+    try:
+        return self.replace(chord(
+            [
+                process_csv_chunk.s(
+                    file_name, *chunk,
+                    import_id=import_id,
+                    progress_task_id=_reporting_task_id(self),
+                    mode=mode
+                )
+                for chunk in chunks
+            ],
+            merge_csv_results.s(file_name)
+        ))
+    except Ignore:
+        # replace() raises Ignore once the chord has been sent
+        if fan_out is not None:
+            fan_out.mark()
+        raise
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def process_csv_chunk(file_name, start_offset, end_offset, first_row_num, import_id, progress_task_id=None,
+                      mode=INSERT):
+    """
+    Celery task to import one byte range of a spooled CSV upload.
+    Row numbers are relative to the whole file and rejected rows are
+    stored under import_id. Progress is added to the combined PROGRESS
+    state of progress_task_id. Checkpointed like process_csv_upload.
+    """
+    checkpointer = ImportCheckpointer(import_id, chunk_start=start_offset)
+    if checkpointer.result is not None:
+        return checkpointer.result
+    with upload_storage.open_upload(file_name) as file, bulk_load(), profiled(f'{import_id}-{start_offset}'):
+        reader = _resumable_reader(
+            checkpointer,
+            file,
+            start_offset=start_offset,
+            end_offset=end_offset,
+            first_row_num=first_row_num
+        )
+        return _import_rows(reader, import_id, _progress_reporter(
+            progress_task_id,
+            total_bytes=file.size - reader.data_offset,
+            shared=True,
+            chunk=start_offset
+        ), mode, checkpointer)
+
+
+@shared_task(base=TaskEventsTask)
+def merge_csv_results(results, file_name):
+    """
+    Chord callback combining chunk results into a single import result.
+    The result replaces the chunk checkpoints before the spooled upload is
+    removed, and is returned again if the callback runs twice.
+    """
+    import_id = results[0]["import_id"]
+    fan_out = ImportCheckpointer(import_id, chunk_start=FAN_OUT_CHUNK)
+    if fan_out.result is not None:
+        return fan_out.result
+    error_summary = Counter()
+    for result in results:
+        error_summary.update(result["error_summary"])
+    merged = {
+        "import_id": import_id,
+        "saved_records": sum(result["saved_records"] for result in results),
+        "updated_records": sum(result["updated_records"] for result in results),
+        "unchanged_records": sum(result["unchanged_records"] for result in results),
+        "rejected_records": sum(result["rejected_records"] for result in results),
+        "error_summary": dict(error_summary),
+        "stages": {
+            stage: {
+                "seconds": round(sum(result["stages"][stage]["seconds"] for result in results), 6),
+                "calls": sum(result["stages"][stage]["calls"] for result in results),
+            }
+            for stage in STAGES
+        }
+    }
+    with transaction.atomic():
+        ImportCheckpoint.objects.filter(import_id=import_id).exclude(chunk_start=FAN_OUT_CHUNK).delete()
+        fan_out.save_result(merged)
+    upload_storage.delete_upload(file_name)
+    return merged
+
+
+@shared_task
+def expire_csv_import_records():
+    """
+    Periodic task deleting import checkpoints older than
+    CSV_IMPORT_CHECKPOINT_TTL and rejected rows older than
+    CSV_IMPORT_ERRORS_TTL seconds.
+    A finished whole-file import keeps its checkpoint until then, so a
+    redelivery returns the stored result instead of importing again.
+    """
+    now = timezone.now()
+    checkpoints, _ = ImportCheckpoint.objects.filter(
+        updated_at__lt=now - timedelta(seconds=getattr(settings, 'CSV_IMPORT_CHECKPOINT_TTL', 24 * 60 * 60))
+    ).delete()
+    row_errors, _ = ImportRowError.objects.filter(
+        created_at__lt=now - timedelta(seconds=getattr(settings, 'CSV_IMPORT_ERRORS_TTL', 7 * 24 * 60 * 60))
+    ).delete()
+    return {"checkpoints_deleted": checkpoints, "row_errors_deleted": row_errors}
+
+
+def _import_id(task):
+    """
+    Returns the id rejected rows are stored under: the task id, or a
+    fresh id when the task is called directly.
+    """
+    return task.request.id or uuid4().hex
+
+
+def _reporting_task_id(task):
+    """
+    Returns the id progress should be reported under, or None when the
+    task runs eagerly or is called directly.
+    """
+    if task.request.is_eager:
+        return None
+    return task.request.id
+
+
+def _checkpointer(task, import_id, chunk_start=0):
+    """
+    Returns the checkpointer of a whole-file import, or None when the
+    task is called directly and so cannot be retried.
+    """
+    if task.request.id is None:
+        return None
+    return ImportCheckpointer(import_id, chunk_start=chunk_start)
+
+
+def _resumable_reader(checkpointer, file, start_offset=None, end_offset=None, first_row_num=1):
+    """
+    Returns a CSVRowReader for a range of the file, starting after the
+    last checkpointed row if there is one.
+    """
+    position = checkpointer.resume_position if checkpointer is not None else None
+    if position is not None:
+        start_offset, first_row_num = position
+    return CSVRowReader(
+        file,
+        start_offset=start_offset,
+        end_offset=end_offset,
+        first_row_num=first_row_num
+    )
+
+
+def _progress_reporter(task_id, total_bytes, shared=False, chunk=0):
+    return ProgressReporter(
+        task_id,
+        total_bytes=total_bytes,
+        every_rows=getattr(settings, 'CSV_UPLOAD_PROGRESS_EVERY_ROWS', 1000),
+        every_seconds=getattr(settings, 'CSV_UPLOAD_PROGRESS_EVERY_SECONDS', 2.0),
+        shared=shared,
+        chunk=chunk
+    )
+
+
+def _import_rows(reader, import_id, progress, mode=INSERT, checkpointer=None):
+    """
+    Validates, dedupes and saves rows yielded by a CSVRowReader,
+    reporting progress as it goes. With a checkpointer, the position
+    and counters are checkpointed in the transaction of every batch, and
+    counting continues from the checkpoint the reader was resumed at.
+    The stage timings in the result only cover this run.
+    """
+    stages = StageTimer()
+    # Update mode only changes the columns present in the file
+    row_validator = CompiledRowValidator(user_serializers.UserImportSerializer, partial=mode == UPDATE)
+    error_log = ImportErrorLog(
+        import_id,
+        flush_size=getattr(settings, 'CSV_UPLOAD_ERROR_FLUSH_SIZE', 1000),
+        stages=stages
+    )
+    duplicate_filter = DuplicateFilter(
+        lookup_chunk_size=getattr(settings, 'CSV_UPLOAD_LOOKUP_CHUNK_SIZE', 500)
+    )
+    position = {"next_row": reader.first_row_num, "offset": reader.offset}
+
+    def counters():
+        return {
+            "rows_processed": rows_processed,
+            "bytes_read": position["offset"] - start_offset,
+            "saved_records": writer.saved_count,
+            "updated_records": writer.updated_count,
+            "unchanged_records": writer.unchanged_count,
+            "rejected_records": error_log.count,
+        }
+
+    def save_checkpoint(result=None):
+        error_log.flush()
+        checkpointer.save(
+            position["next_row"], position["offset"], counters(), dict(error_log.summary), result
+        )
+
+    writer = BulkUserWriter(
+        batch_size=getattr(settings, 'CSV_UPLOAD_BATCH_SIZE', 1000),
+        error_log=error_log,
+        duplicate_filter=duplicate_filter,
+        mode=mode,
+        before_commit=save_checkpoint if checkpointer is not None else None,
+        stages=stages
+    )
+
+    rows_processed = 0
+    start_offset = reader.offset
+    if checkpointer is not None:
+        committed, error_summary = checkpointer.counters()
+        rows_processed = committed["rows_processed"]
+        start_offset -= committed["bytes_read"]
+        writer.saved_count = committed["saved_records"]
+        writer.updated_count = committed["updated_records"]
+        writer.unchanged_count = committed["unchanged_records"]
+        error_log.count = committed["rejected_records"]
+        error_log.summary.update(error_summary)
+        progress.resume(rows_processed)
+
+    stages.switch('parse')
+    for row_num, row, offset in reader:
+        stages.switch('transform')
+        rows_processed += 1
+        position["next_row"], position["offset"] = row_num + 1, offset
+        if row.get("name") is not None:
+            name = row["name"].strip().split(" ")
+            row["first_name"], row["last_name"] = name[0], " ".join(name[1:])
+        stages.switch('validate')
+        validated_data, row_errors = row_validator.validate(row)
+        if row_errors is None:
+            stages.switch('dedupe')
+            row_errors = duplicate_filter.check_file_duplicate(validated_data)
+
+        if row_errors is None:
+            stages.switch('write')
+            writer.add(row_num, row, validated_data)
         else:
-            rejected_count += 1
-            errors.append({
-                "row": row_num,
-                "data": row,
-                "errors": serializer.errors
-            })
-
-    return {
-        "saved_records": saved_count,
-        "rejected_records": rejected_count,
-        "errors": errors
-    }
\ No newline at end of file
+            stages.switch('errors')
+            error_log.record(row_num, row, row_errors)
+        stages.switch('report')
+        progress.maybe_report(
+            rows_processed, writer.saved_count, error_log.count, offset - start_offset
+        )
+        stages.switch('parse')
+
+    stages.switch('write')
+    writer.flush()
+    if checkpointer is None:
+        error_log.flush()
+    stages.stop()
+    position["offset"] = reader.offset
+    result = {
+        "import_id": import_id,
+        "saved_records": writer.saved_count,
+        "updated_records": writer.updated_count,
+        "unchanged_records": writer.unchanged_count,
+        "rejected_records": error_log.count,
+        "error_summary": dict(error_log.summary),
+        "stages": stages.summary()
+    }
+    if checkpointer is not None:
+        with transaction.atomic():
+            save_checkpoint(result)
+    progress.report(
+        rows_processed, writer.saved_count, error_log.count, reader.offset - start_offset
+    )
+    _record_stage_metrics(stages)
+
+    return result
+
+
+def _record_stage_metrics(stages):
+    """
+    Adds the stage timings of an import to the metrics and sends them
+    right away, as worker processes serve no /metrics requests.
+    """
+    for stage in STAGES:
+        labels = (('stage', stage),)
+        metrics_registry.inc('csv_import_stage_seconds_total', labels, stages.seconds[stage])
+        metrics_registry.inc('csv_import_stage_calls_total', labels, stages.calls[stage])
+    metrics_registry.flush()
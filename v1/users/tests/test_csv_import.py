@@ -0,0 +1,534 @@
+import os
+import pstats
+import tempfile
+from contextlib import nullcontext
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from v1.users.csv_import.writer import BulkUserWriter
+from v1.users.models import CustomUser, ImportCheckpoint, ImportRowError
+from v1.users.csv_import import storage as upload_storage
+from v1.users.csv_import.bulk_load import bulk_load
+from v1.users.csv_import.checkpoint import FAN_OUT_CHUNK, ImportCheckpointer
+from v1.users.csv_import.dedupe import DuplicateFilter
+from v1.users.csv_import.errors import ImportErrorLog
+from v1.users.csv_import.progress import ProgressReporter
+from v1.users.csv_import.reader import CSVRowReader, plan_chunks
+from v1.users.csv_import.stages import STAGES
+from v1.users.tasks.csv_upload import expire_csv_import_records, process_csv_upload, process_csv_upload_parallel
+from v1.users.tests.utils import TemporaryUploadStorageMixin, spool_csv
+
+
+def rejected_rows(result):
+    return list(ImportRowError.objects.filter(import_id=result['import_id']).order_by('row'))
+
+
+@override_settings(CSV_UPLOAD_BATCH_SIZE=4)
+class ProcessCSVUploadTests(TemporaryUploadStorageMixin, TestCase):
+    def test_rows_saved_in_batches(self):
+        """Test that every valid row is saved across several batches."""
+        csv_data = "name,email,age\n" + "".join(
+            f"User {i},user{i}@example.com,{20 + i}\n" for i in range(10)
+        )
+        result = process_csv_upload(*spool_csv(csv_data))
+
+        self.assertEqual(result['saved_records'], 10)
+        self.assertEqual(result['rejected_records'], 0)
+        self.assertEqual(CustomUser.objects.count(), 10)
+        user = CustomUser.objects.get(email='user3@example.com')
+        self.assertEqual((user.first_name, user.last_name, user.age), ('User', '3', 23))
+
+    def test_duplicate_rows_rejected_within_batch(self):
+        """Test that a duplicate row is rejected while the rest of its batch is saved."""
+        csv_data = (
+            "name,email,age\n"
+            "Jane Smith,jane@example.com,25\n"
+            "John Doe,john@example.com,30\n"
+            "Jane Again,jane@example.com,26\n"
+            "Mary Major,mary@example.com,40\n"
+            "Invalid User,invalid-email,30\n"
+        )
+        result = process_csv_upload(*spool_csv(csv_data))
+
+        self.assertEqual(result['saved_records'], 3)
+        self.assertEqual(result['rejected_records'], 2)
+        errors = rejected_rows(result)
+        self.assertEqual([error.row for error in errors], [3, 5])
+        self.assertEqual(errors[0].errors, {"email": ["Duplicate email address in file."]})
+        self.assertEqual(result['error_summary'], {"email.duplicate": 1, "email.invalid": 1})
+        self.assertEqual(
+            set(CustomUser.objects.values_list('email', flat=True)),
+            {'jane@example.com', 'john@example.com', 'mary@example.com'}
+        )
+
+    def test_existing_emails_rejected_before_insert(self):
+        """Test that rows colliding with existing users are rejected by a single lookup per batch."""
+        CustomUser.objects.create(email='john@example.com', username='johnny', first_name='John')
+        csv_data = (
+            "name,email,age\n"
+            "Jane Smith,jane@example.com,25\n"
+            "John Doe,john@example.com,30\n"
+        )
+        # email lookup, SAVEPOINT, bulk INSERT, RELEASE SAVEPOINT, error INSERT
+        with self.assertNumQueries(5):
+            result = process_csv_upload(*spool_csv(csv_data))
+
+        self.assertEqual(result['saved_records'], 1)
+        self.assertEqual(result['rejected_records'], 1)
+        errors = rejected_rows(result)
+        self.assertEqual(errors[0].row, 2)
+        self.assertEqual(errors[0].errors, {"email": ["Email address already exists."]})
+
+    def test_database_rejection_names_colliding_field(self):
+        """Test that a row refused by the database is reported under the field that collided."""
+        CustomUser.objects.create(email='john@example.com', username='johnny', first_name='John')
+        error_log = ImportErrorLog('db-collision')
+        writer = BulkUserWriter(batch_size=10, error_log=error_log)
+        writer.add(2, {}, {'email': 'jane@example.com', 'username': 'jane', 'first_name': 'Jane'})
+        writer.add(3, {}, {'email': 'other@example.com', 'username': 'johnny', 'first_name': 'Other'})
+        writer.add(4, {}, {'email': 'john@example.com', 'username': 'john', 'first_name': 'John'})
+        writer.flush()
+        error_log.flush()
+
+        self.assertEqual(writer.saved_count, 1)
+        errors = ImportRowError.objects.filter(import_id='db-collision').order_by('row')
+        self.assertEqual([error.errors for error in errors], [
+            {"username": ["Username already exists."]},
+            {"email": ["Email address already exists."]},
+        ])
+        self.assertEqual(error_log.summary, {'username.unique': 1, 'email.unique': 1})
+
+    def test_spooled_file_removed_after_import(self):
+        """Test that the spooled upload is deleted once it has been processed."""
+        file_name, checksum = spool_csv("name,email,age\nJohn Doe,john@example.com,30\n")
+        process_csv_upload(file_name, checksum)
+
+        self.assertFalse(upload_storage.get_upload_storage().exists(file_name))
+
+    def test_checksum_mismatch_rejected(self):
+        """Test that a spooled file that does not match its checksum is not imported."""
+        file_name, _ = spool_csv("name,email,age\nJohn Doe,john@example.com,30\n")
+
+        with self.assertRaises(ValueError):
+            process_csv_upload(file_name, '0' * 64)
+        self.assertFalse(CustomUser.objects.exists())
+
+    @patch('common.task_events.publish_task_event')
+    def test_completion_event_published(self, mock_publish):
+        """Test that a task event with the result is published when the import finishes."""
+        task = process_csv_upload.apply(args=spool_csv("name,email,age\nJohn Doe,john@example.com,30\n"))
+
+        mock_publish.assert_called_once_with(task.id, 'SUCCESS', task.result)
+
+    def test_stage_breakdown_in_result(self):
+        """Test that the result reports the time and entries of every import stage."""
+        csv_data = (
+            "name,email,age\n"
+            "Jane Smith,jane@example.com,25\n"
+            "John Doe,john@example.com,130\n"
+            "Joe Bloggs,jane@example.com,40\n"
+        )
+        result = process_csv_upload(*spool_csv(csv_data))
+
+        stages = result['stages']
+        self.assertEqual(list(stages), list(STAGES))
+        self.assertEqual(stages['transform']['calls'], 3)
+        self.assertEqual(stages['validate']['calls'], 3)
+        # The in-file check for the two valid rows and the database lookup of the batch
+        self.assertEqual(stages['dedupe']['calls'], 3)
+        self.assertTrue(all(stage['seconds'] >= 0 for stage in stages.values()))
+
+    def test_profile_written_when_enabled(self):
+        """Test that CSV_UPLOAD_PROFILE_DIR stores a profile and folded stacks per import."""
+        profile_dir = self.enterContext(tempfile.TemporaryDirectory())
+        with override_settings(CSV_UPLOAD_PROFILE_DIR=profile_dir):
+            result = process_csv_upload(*spool_csv("name,email,age\nJohn Doe,john@example.com,30\n"))
+
+        path = os.path.join(profile_dir, result['import_id'])
+        self.assertGreater(pstats.Stats(f'{path}.prof').total_calls, 0)
+        with open(f'{path}.collapsed') as file:
+            lines = file.read().splitlines()
+        self.assertTrue(lines)
+        stack, microseconds = lines[0].rsplit(' ', 1)
+        self.assertTrue(stack)
+        self.assertGreater(int(microseconds), 0)
+
+
+@override_settings(CSV_UPLOAD_BATCH_SIZE=4)
+class ImportModeTests(TemporaryUploadStorageMixin, TestCase):
+    snapshot = (
+        "name,email,age\n"
+        "Jane Smith,jane@example.com,25\n"
+        "John Doe,john@example.com,31\n"
+        "New User,new@example.com,40\n"
+    )
+
+    def setUp(self):
+        CustomUser.objects.create(
+            username='jane', email='jane@example.com', first_name='Jane', last_name='Smith', age=25
+        )
+        CustomUser.objects.create(
+            username='john', email='john@example.com', first_name='John', last_name='Doe', age=30
+        )
+
+    def test_upsert_updates_changed_and_inserts_new(self):
+        """Test that upsert inserts new emails, updates changed users and skips unchanged ones."""
+        result = process_csv_upload(*spool_csv(self.snapshot), mode='upsert')
+
+        self.assertEqual(
+            (result['saved_records'], result['updated_records'], result['unchanged_records']), (1, 1, 1)
+        )
+        self.assertEqual(result['rejected_records'], 0)
+        john = CustomUser.objects.get(email='john@example.com')
+        self.assertEqual((john.username, john.age), ('john', 31))
+        self.assertTrue(CustomUser.objects.filter(email='new@example.com').exists())
+
+    def test_update_rejects_unknown_emails(self):
+        """Test that update mode only changes existing users."""
+        result = process_csv_upload(*spool_csv(self.snapshot), mode='update')
+
+        self.assertEqual(
+            (result['saved_records'], result['updated_records'], result['unchanged_records']), (0, 1, 1)
+        )
+        self.assertEqual(CustomUser.objects.get(email='john@example.com').age, 31)
+        self.assertFalse(CustomUser.objects.filter(email='new@example.com').exists())
+        self.assertEqual(result['error_summary'], {'email.does_not_exist': 1})
+
+    def test_update_with_only_emails_never_inserts(self):
+        """Test that update mode validates only the file's columns and creates no users."""
+        csv_data = "email\njohn@example.com\nnew@example.com\n"
+        result = process_csv_upload(*spool_csv(csv_data), mode='update')
+
+        self.assertEqual(
+            (result['saved_records'], result['updated_records'], result['unchanged_records']), (0, 0, 1)
+        )
+        self.assertEqual(result['error_summary'], {'email.does_not_exist': 1})
+        self.assertEqual(CustomUser.objects.count(), 2)
+        self.assertEqual(CustomUser.objects.get(email='john@example.com').first_name, 'John')
+
+    def test_merge_rejects_username_of_another_user(self):
+        """Test that merge modes reject a username taken by a different user before writing."""
+        csv_data = (
+            "name,email,username\n"
+            "New User,new@example.com,jane\n"
+            "Jane Smith,jane@example.com,john\n"
+        )
+        taken = {"username": ["Username already exists."]}
+        expected = {'upsert': [(1, taken), (2, taken)], 'update': [(2, taken)]}
+        for mode in ('upsert', 'update'):
+            with self.subTest(mode=mode):
+                result = process_csv_upload(*spool_csv(csv_data), mode=mode)
+
+                errors = rejected_rows(result)
+                self.assertEqual(
+                    [(error.row, error.errors) for error in errors if 'username' in error.errors], expected[mode]
+                )
+                self.assertFalse(CustomUser.objects.filter(email='new@example.com').exists())
+                self.assertEqual(CustomUser.objects.get(email='jane@example.com').username, 'jane')
+
+    def test_unchanged_snapshot_not_written(self):
+        """Test that a snapshot matching the stored users only costs the lookup query."""
+        csv_data = "name,email,age\nJane Smith,jane@example.com,25\nJohn Doe,john@example.com,30\n"
+
+        with self.assertNumQueries(1):
+            result = process_csv_upload(*spool_csv(csv_data), mode='upsert')
+
+        self.assertEqual(result['unchanged_records'], 2)
+        self.assertEqual(result['updated_records'], 0)
+
+
+class WorkerLost(BaseException):
+    """Stands in for the worker process dying mid-import."""
+
+
+@override_settings(CSV_UPLOAD_BATCH_SIZE=2)
+class ResumeImportTests(TemporaryUploadStorageMixin, TestCase):
+    csv_data = (
+        "name,email,age\n"
+        "User One,one@example.com,21\n"
+        "Bad Age,bad@example.com,150\n"
+        "User Two,two@example.com,22\n"
+        "User Three,three@example.com,23\n"
+        "User One,one@example.com,21\n"
+        "User Four,four@example.com,24\n"
+        "User Five,five@example.com,25\n"
+    )
+
+    def crash_on_second_batch(self):
+        save = BulkUserWriter._save
+        calls = []
+
+        def crashing_save(writer, batch, existing):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise WorkerLost()
+            return save(writer, batch, existing)
+        return patch.object(BulkUserWriter, '_save', crashing_save)
+
+    def test_retry_resumes_after_last_batch(self):
+        """Test that a redelivered task continues from its checkpoint with its counters."""
+        args = spool_csv(self.csv_data)
+        with self.crash_on_second_batch(), self.assertRaises(WorkerLost):
+            process_csv_upload.apply(args=args, task_id='resume-task')
+
+        checkpoint = ImportCheckpoint.objects.get(import_id='resume-task')
+        self.assertEqual((checkpoint.next_row, checkpoint.saved_records), (4, 2))
+        self.assertEqual(CustomUser.objects.count(), 2)
+
+        result = process_csv_upload.apply(args=args, task_id='resume-task').get()
+
+        self.assertEqual(result['saved_records'], 5)
+        self.assertEqual(result['rejected_records'], 2)
+        # The repeated email was saved before the crash, so it is now found in the database
+        self.assertEqual(result['error_summary'], {'age.max_value': 1, 'email.unique': 1})
+        self.assertEqual([error.row for error in rejected_rows(result)], [2, 5])
+        self.assertEqual(CustomUser.objects.count(), 5)
+
+    def test_finished_import_not_repeated(self):
+        """Test that redelivering a finished task returns its stored result."""
+        args = spool_csv(self.csv_data)
+        first = process_csv_upload.apply(args=args, task_id='done-task').get()
+
+        with self.assertNumQueries(1):
+            second = process_csv_upload.apply(args=args, task_id='done-task').get()
+
+        self.assertEqual(second, first)
+
+
+class ParallelCSVUploadTests(TemporaryUploadStorageMixin, TestCase):
+    csv_data = (
+        "name,email,age\n"
+        "Jane Smith,jane@example.com,25\n"
+        "\"Multi\nLine\",multi@example.com,31\n"
+        "Invalid User,invalid-email,30\n"
+        "John Doe,john@example.com,30\n"
+        "Mary Major,mary@example.com,150\n"
+        "Bob Stone,bob@example.com,41\n"
+        "Ann Lee,ann@example.com,22\n"
+    )
+
+    def test_plan_chunks_covers_every_row(self):
+        """Test that chunk ranges split on row boundaries and keep file row numbers."""
+        file_name, checksum = spool_csv(self.csv_data)
+        with upload_storage.open_upload(file_name, checksum) as file:
+            chunks = plan_chunks(file, 3)
+            rows = [
+                (row_num, row['email'])
+                for start, end, first_row_num in chunks
+                for row_num, row, _ in CSVRowReader(file, start, end, first_row_num)
+            ]
+
+        self.assertEqual([chunk[2] for chunk in chunks], [1, 4, 7])
+        self.assertEqual([row_num for row_num, _ in rows], list(range(1, 8)))
+        self.assertEqual(rows[1], (2, 'multi@example.com'))
+
+    @override_settings(CSV_UPLOAD_CHUNK_ROWS=2)
+    def test_parallel_result_matches_sequential(self):
+        """Test that merged chunk results have the same shape and row numbers as a serial import."""
+        task = process_csv_upload_parallel.apply(args=spool_csv(self.csv_data))
+        result = task.get()
+
+        self.assertEqual(result['saved_records'], 5)
+        self.assertEqual(result['rejected_records'], 2)
+        self.assertEqual([error.row for error in rejected_rows(result)], [3, 5])
+        self.assertEqual(result['error_summary'], {"email.invalid": 1, "age.max_value": 1})
+        self.assertEqual(CustomUser.objects.count(), 5)
+        self.assertEqual(result['import_id'], task.id)
+        self.assertEqual(result['stages']['validate']['calls'], 7)
+        # Only the merged result is kept
+        self.assertEqual(
+            list(ImportCheckpoint.objects.filter(import_id=task.id).values_list('chunk_start', 'result')),
+            [(FAN_OUT_CHUNK, result)]
+        )
+
+    @override_settings(CSV_UPLOAD_CHUNK_ROWS=2)
+    def test_duplicate_across_chunks(self):
+        """Test that an email repeated in another chunk is created once and counted once."""
+        csv_data = (
+            "name,email,age\n"
+            "Jane Smith,jane@example.com,25\n"
+            "John Doe,john@example.com,30\n"
+            "Jane Again,jane@example.com,26\n"
+        )
+        find_existing_users = DuplicateFilter.find_existing_users
+        lookups = []
+
+        def stale_second_lookup(duplicate_filter, batch, key='email'):
+            # The second chunk looked up its emails before the first one committed
+            lookups.append(batch)
+            if len(lookups) == 2:
+                return {}
+            return find_existing_users(duplicate_filter, batch, key=key)
+
+        expected = {
+            'insert': ((2, 0, 1), {'email.unique': 1}, 25),
+            'upsert': ((2, 1, 0), {}, 26),
+        }
+        for concurrent in (False, True):
+            for mode, (counts, error_summary, age) in expected.items():
+                with self.subTest(mode=mode, concurrent=concurrent):
+                    CustomUser.objects.all().delete()
+                    lookups.clear()
+                    with patch.object(DuplicateFilter, 'find_existing', return_value={}) if concurrent \
+                            else nullcontext(), \
+                            patch.object(DuplicateFilter, 'find_existing_users', stale_second_lookup) if concurrent \
+                            else nullcontext():
+                        result = process_csv_upload_parallel.apply(
+                            args=spool_csv(csv_data), kwargs={'mode': mode}
+                        ).get()
+
+                    self.assertEqual(
+                        (result['saved_records'], result['updated_records'], result['rejected_records']), counts
+                    )
+                    self.assertEqual(result['error_summary'], error_summary)
+                    self.assertEqual(CustomUser.objects.get(email='jane@example.com').age, age)
+
+    @override_settings(CSV_UPLOAD_CHUNK_ROWS=2)
+    def test_redelivery_after_merge_returns_result(self):
+        """Test that a redelivered task returns the merged result although the upload is gone."""
+        args = spool_csv(self.csv_data)
+        result = process_csv_upload_parallel.apply(args=args, task_id='parallel-task').get()
+        self.assertFalse(upload_storage.get_upload_storage().exists(args[0]))
+
+        redelivered = process_csv_upload_parallel.apply(args=args, task_id='parallel-task')
+
+        self.assertEqual(redelivered.state, 'SUCCESS')
+        self.assertEqual(redelivered.get(), result)
+        self.assertEqual(CustomUser.objects.count(), 5)
+
+    @override_settings(CSV_UPLOAD_CHUNK_ROWS=2)
+    def test_redelivery_after_fan_out_not_fanned_out_again(self):
+        """Test that a task redelivered while its chord runs leaves the result to the chord."""
+        ImportCheckpointer('parallel-task', chunk_start=FAN_OUT_CHUNK).mark()
+
+        with patch('v1.users.tasks.csv_upload.process_csv_chunk') as mock_chunk:
+            redelivered = process_csv_upload_parallel.apply(args=spool_csv(self.csv_data), task_id='parallel-task')
+
+        self.assertEqual(redelivered.state, 'IGNORED')
+        mock_chunk.s.assert_not_called()
+        self.assertFalse(CustomUser.objects.exists())
+
+
+class ExpireImportRecordsTests(TestCase):
+    def test_old_records_deleted(self):
+        """Test that checkpoints and rejected rows past their TTL are deleted and newer ones kept."""
+        ImportRowError.objects.bulk_create([
+            ImportRowError(import_id='old', row=1, data={}, errors={}),
+            ImportRowError(import_id='new', row=1, data={}, errors={}),
+        ])
+        ImportCheckpoint.objects.create(import_id='old', next_row=1, byte_offset=0)
+        ImportCheckpoint.objects.create(import_id='new', next_row=1, byte_offset=0)
+        long_ago = timezone.now() - timedelta(days=30)
+        ImportRowError.objects.filter(import_id='old').update(created_at=long_ago)
+        ImportCheckpoint.objects.filter(import_id='old').update(updated_at=long_ago)
+
+        result = expire_csv_import_records()
+
+        self.assertEqual(result, {'checkpoints_deleted': 1, 'row_errors_deleted': 1})
+        self.assertEqual(list(ImportRowError.objects.values_list('import_id', flat=True)), ['new'])
+        self.assertEqual(list(ImportCheckpoint.objects.values_list('import_id', flat=True)), ['new'])
+
+
+@override_settings(CSV_UPLOAD_SQLITE_PRAGMAS={'synchronous': 'off', 'cache_size': -1000})
+class BulkLoadTests(TransactionTestCase):
+    def pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+            cursor.execute('PRAGMA cache_size')
+            return synchronous, cursor.fetchone()[0]
+
+    def test_pragmas_set_and_restored(self):
+        """Test that bulk-load mode changes the pragmas only while it is active."""
+        before = self.pragmas()
+
+        with bulk_load():
+            self.assertEqual(self.pragmas(), (0, -1000))
+
+        self.assertEqual(self.pragmas(), before)
+
+    def test_pragmas_restored_on_error(self):
+        """Test that the pragmas are restored when the import fails."""
+        before = self.pragmas()
+
+        with self.assertRaises(ValueError):
+            with bulk_load():
+                raise ValueError('Broken')
+
+        self.assertEqual(self.pragmas(), before)
+
+    def test_noop_inside_transaction(self):
+        """Test that bulk-load mode leaves the pragmas alone inside an open transaction."""
+        with transaction.atomic():
+            before = self.pragmas()
+            with bulk_load():
+                self.assertEqual(self.pragmas(), before)
+
+
+@patch('v1.users.csv_import.progress.current_app')
+class ProgressReporterTests(TestCase):
+    def test_updates_throttled_by_rows(self, mock_app):
+        """Test that PROGRESS is only published every N rows."""
+        progress = ProgressReporter('task-1', total_bytes=1000, every_rows=10, every_seconds=3600)
+        for rows in range(1, 26):
+            progress.maybe_report(rows, rows - 1, 1, rows * 10)
+
+        store_result = mock_app.backend.store_result
+        self.assertEqual(store_result.call_count, 2)
+        task_id, meta, state = store_result.call_args.args
+        self.assertEqual((task_id, state), ('task-1', 'PROGRESS'))
+        self.assertEqual(meta['rows_processed'], 20)
+        self.assertEqual(meta['saved_records'], 19)
+        self.assertEqual(meta['bytes_read'], 200)
+        self.assertEqual(meta['bytes_total'], 1000)
+        self.assertIn('rows_per_second', meta)
+
+    def test_resumed_rate_excludes_committed_rows(self, mock_app):
+        """Test that a resumed import reports the rate of the rows it processed itself."""
+        progress = ProgressReporter('task-1', total_bytes=1000)
+        progress.resume(10000)
+        progress.started_at -= 10
+        progress.report(10050, 10050, 0, 500)
+
+        meta = mock_app.backend.store_result.call_args.args[1]
+        self.assertEqual(meta['rows_processed'], 10050)
+        self.assertLess(meta['rows_per_second'], 10)
+
+    def test_disabled_without_task_id(self, mock_app):
+        """Test that nothing is published for eager or direct calls."""
+        progress = ProgressReporter(None, total_bytes=1000, every_rows=1)
+        progress.maybe_report(5, 5, 0, 50)
+        progress.report(5, 5, 0, 50)
+
+        mock_app.backend.store_result.assert_not_called()
+
+    def test_shared_reporters_publish_combined_totals(self, mock_app):
+        """Test that chunk reporters sharing a task id publish summed counters."""
+        first = ProgressReporter('task-shared', total_bytes=1000, shared=True, chunk=0)
+        second = ProgressReporter('task-shared', total_bytes=1000, shared=True, chunk=500)
+        first.report(10, 8, 2, 100)
+        second.report(5, 5, 0, 40)
+        first.report(20, 17, 3, 200)
+
+        meta = mock_app.backend.store_result.call_args.args[1]
+        self.assertEqual(meta['rows_processed'], 25)
+        self.assertEqual(meta['saved_records'], 22)
+        self.assertEqual(meta['rejected_records'], 3)
+        self.assertEqual(meta['bytes_read'], 240)
+
+    def test_resumed_chunk_not_counted_twice(self, mock_app):
+        """Test that a redelivered chunk resuming from its checkpoint replaces its earlier counters."""
+        ProgressReporter('task-resumed', total_bytes=1000, shared=True, chunk=0).report(10, 10, 0, 100)
+        ProgressReporter('task-resumed', total_bytes=1000, shared=True, chunk=500).report(4, 4, 0, 40)
+        # Redelivered after committing 10 rows, the chunk reports from its checkpointed counters
+        ProgressReporter('task-resumed', total_bytes=1000, shared=True, chunk=0).report(15, 14, 1, 150)
+
+        meta = mock_app.backend.store_result.call_args.args[1]
+        self.assertEqual(meta['rows_processed'], 19)
+        self.assertEqual(meta['saved_records'], 18)
+        self.assertEqual(meta['rejected_records'], 1)
+        self.assertEqual(meta['bytes_read'], 190)
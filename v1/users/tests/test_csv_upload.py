@@ -1,15 +1,23 @@
+import hashlib
+import json
+
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.core.files.uploadedfile import SimpleUploadedFile
 from unittest.mock import patch, Mock
-from v1.users.models import CustomUser
+from v1.users.models import CustomUser, ImportRowError
+from celery import current_app
 from celery.result import AsyncResult
 from django.core.cache import cache
+from common.task_status import terminal_status_cache
+from v1.users.csv_import import idempotency
+from v1.users.csv_import import storage as upload_storage
 from v1.users.tasks.csv_upload import process_csv_upload
+from v1.users.tests.utils import TemporaryUploadStorageMixin
 
 
-class CSVUploadViewTests(TestCase):
+class CSVUploadViewTests(TemporaryUploadStorageMixin, TestCase):
     def setUp(self):
         """Set up test environment before each test method."""
         self.client = APIClient()
@@ -17,6 +25,7 @@ class CSVUploadViewTests(TestCase):
         self.valid_csv_content = b'name,email,age\nJohn Doe,john@example.com,30'
         self.invalid_csv_content = b'name,email,age\nInvalid Data'
         cache.clear()  # Clear cache before each test
+        terminal_status_cache.clear()
 
     def tearDown(self):
         """Clean up after each test method."""
@@ -57,6 +66,26 @@ class CSVUploadViewTests(TestCase):
         self.assertEqual(response.data['task_id'], 'test-task-id')
         mock_task.delay.assert_called_once()
 
+        file_name, checksum = mock_task.delay.call_args.args
+        with upload_storage.open_upload(file_name, checksum) as spooled:
+            self.assertEqual(spooled.read(), self.valid_csv_content)
+
+    @patch('v1.users.tasks.csv_upload.process_csv_upload')
+    def test_import_mode(self, mock_task):
+        """Test that the import mode is passed to the task and validated."""
+        mock_task.delay = Mock(return_value=Mock(id='test-task-id'))
+
+        file = SimpleUploadedFile("test.csv", self.valid_csv_content, content_type="text/csv")
+        response = self.client.post(self.url, {'file': file, 'mode': 'upsert'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(mock_task.delay.call_args.kwargs, {'mode': 'upsert'})
+
+        file = SimpleUploadedFile("test.csv", self.valid_csv_content, content_type="text/csv")
+        response = self.client.post(self.url, {'file': file, 'mode': 'replace'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Invalid import mode. Use one of: insert, upsert, update.')
+        mock_task.delay.assert_called_once()
+
     @patch('v1.users.tasks.csv_upload.process_csv_upload')
     def test_rate_limiting(self, mock_task):
         """Test rate limiting functionality."""
@@ -79,7 +108,7 @@ class CSVUploadViewTests(TestCase):
         self.tearDown()
 
     def test_csv_processing_result(self):
-        """Test the actual CSV processing functionality."""
+        """Test that a finished import reports a summary and its rejected rows are served by the errors view."""
         CustomUser.objects.create(
             email='john@example.com',
             first_name='John',
@@ -89,9 +118,9 @@ class CSVUploadViewTests(TestCase):
 
         csv_content = (
             b'name,email,age\n'
-            b'Jane Smith,jane@example.com,25\n' 
-            b'John Doe,john@example.com,30\n'    
-            b'Invalid User,invalid-email,150\n' 
+            b'Jane Smith,jane@example.com,25\n'
+            b'John Doe,john@example.com,30\n'
+            b'Invalid User,invalid-email,150\n'
         )
 
         file = SimpleUploadedFile(
@@ -107,15 +136,15 @@ class CSVUploadViewTests(TestCase):
             self.assertEqual(response.status_code, 202)
             task_id = response.data['task_id']
 
-        # Mock AsyncResult for task status check
-        task_result = {
-            'saved_records': 1,
-            'rejected_records': 2,
-            'errors': [
-                {'row': 2, 'errors': {'email': ['Email address already exists.']}},
-                {'row': 3, 'errors': {'age': ['Age must be between 0 and 120.']}}
-            ]
-        }
+        # Run the import as the worker would, under the returned task id
+        task_result = process_csv_upload.apply(
+            mock_task.delay.call_args.args, mock_task.delay.call_args.kwargs, task_id=task_id
+        ).get()
+        self.assertEqual(task_result['import_id'], task_id)
+        self.assertEqual(
+            list(ImportRowError.objects.filter(import_id=task_id).order_by('row').values_list('row', flat=True)),
+            [2, 3]
+        )
 
         with patch('common.views.AsyncResult') as mock_async_result:
             instance = mock_async_result.return_value
@@ -126,10 +155,210 @@ class CSVUploadViewTests(TestCase):
             status_url = reverse('task_status', kwargs={'task_id': task_id})
             response = self.client.get(status_url)
             self.assertEqual(response.status_code, 200)
-            
+
             # Verify the results
             self.assertEqual(response.data['status'], 'SUCCESS')
             result = response.data['result']
             self.assertEqual(result['saved_records'], 1)
             self.assertEqual(result['rejected_records'], 2)
-            self.assertEqual(len(result['errors']), 2) 
\ No newline at end of file
+            self.assertEqual(result['import_id'], task_id)
+            self.assertEqual(result['error_summary'], {'email.unique': 1, 'email.invalid': 1, 'age.max_value': 1})
+            self.assertNotIn('errors', result)
+
+        # The rejected rows are served by the errors view
+        response = self.client.get(reverse('task_errors', kwargs={'task_id': result['import_id']}))
+        self.assertEqual(response.status_code, 200)
+        errors = response.data['results']
+        self.assertEqual([error['row'] for error in errors], [2, 3])
+        self.assertEqual(errors[0]['data']['email'], 'john@example.com')
+        self.assertIn('email', errors[0]['errors'])
+        self.assertEqual(set(errors[1]['errors']), {'email', 'age'})
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_task_progress_reported(self):
+        """Test that progress metadata is returned while a task is running."""
+        progress = {'rows_processed': 1000, 'saved_records': 990, 'rejected_records': 10}
+
+        with patch('common.views.AsyncResult') as mock_async_result:
+            instance = mock_async_result.return_value
+            instance.state = 'PROGRESS'
+            instance.result = progress
+
+            response = self.client.get(reverse('task_status', kwargs={'task_id': 'test-task-id'}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'PROGRESS')
+        self.assertEqual(response.data['progress'], progress)
+
+
+class IdempotentUploadTests(TemporaryUploadStorageMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('csv_upload')
+        cache.clear()
+        terminal_status_cache.clear()
+        patcher = patch('v1.users.tasks.csv_upload.process_csv_upload')
+        self.mock_task = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_task.delay = Mock(side_effect=[Mock(id='task-1'), Mock(id='task-2'), Mock(id='task-3')])
+
+    def upload(self, content=b'name,email,age\nJohn Doe,john@example.com,30', **extra):
+        data = {'file': SimpleUploadedFile("test.csv", content, content_type="text/csv")}
+        data.update(extra.pop('data', {}))
+        return self.client.post(self.url, data, **extra)
+
+    def test_identical_file_returns_existing_task(self):
+        """Test that re-posting the same file does not enqueue another import."""
+        first = self.upload()
+        second = self.upload()
+
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(second.data['task_id'], first.data['task_id'])
+        self.mock_task.delay.assert_called_once()
+
+    def test_other_file_or_mode_enqueued(self):
+        """Test that a different file or import mode starts a new import."""
+        self.upload()
+        response = self.upload(data={'mode': 'upsert'})
+
+        self.assertEqual(response.data['task_id'], 'task-2')
+
+    def test_idempotency_key(self):
+        """Test that an Idempotency-Key header is bound to the file first sent with it."""
+        first = self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+        second = self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+        conflict = self.upload(b'name,email,age\nJane Smith,jane@example.com,25', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(second.data['task_id'], first.data['task_id'])
+        self.assertEqual(conflict.status_code, 422)
+        self.mock_task.delay.assert_called_once()
+
+    def test_idempotency_key_bound_to_mode(self):
+        """Test that an Idempotency-Key reused with another import mode is rejected."""
+        self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.upload(data={'mode': 'update'}, HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, 409)
+        self.mock_task.delay.assert_called_once()
+
+    def test_checksum_computed_while_spooling(self):
+        """Test that the checksum comes from the spooled copy, which is dropped for a duplicate."""
+        content = b'name,email,age\nJohn Doe,john@example.com,30'
+        storage = upload_storage.get_upload_storage()
+        spooled = set(storage.listdir('')[1])
+        self.upload(content)
+        self.upload(content)
+
+        file_name, checksum = self.mock_task.delay.call_args.args
+        self.assertEqual(checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual(set(storage.listdir('')[1]) - spooled, {file_name})
+
+    def test_failed_import_can_be_retried(self):
+        """Test that an identical file is imported again if the earlier import failed."""
+        self.upload()
+        current_app.backend.store_result('task-1', ValueError('Broken'), 'FAILURE')
+        self.addCleanup(current_app.backend.forget, 'task-1')
+
+        response = self.upload()
+
+        self.assertEqual(response.data['task_id'], 'task-2')
+
+    def test_claim_released_when_queueing_fails(self):
+        """Test that an upload can be retried after the task could not be queued."""
+        self.mock_task.delay = Mock(side_effect=[ConnectionError('Broker down'), Mock(id='task-2')])
+        with self.assertRaises(ConnectionError):
+            self.upload()
+
+        self.assertEqual(self.upload().data['task_id'], 'task-2')
+
+    def test_failed_task_reclaimed_with_idempotency_key(self):
+        """Test that a claimed key whose task failed is claimed again by the next upload."""
+        first = self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+        current_app.backend.store_result(first.data['task_id'], ValueError('Broken'), 'FAILURE')
+        self.addCleanup(current_app.backend.forget, first.data['task_id'])
+
+        retry = self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+        repeat = self.upload(HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(retry.data['task_id'], 'task-2')
+        self.assertEqual(repeat.data['task_id'], 'task-2')
+        self.assertEqual(self.mock_task.delay.call_count, 2)
+
+    def test_idempotency_key_scoped_to_client(self):
+        """Test that the same Idempotency-Key from different clients does not share a task."""
+        first = self.upload(HTTP_IDEMPOTENCY_KEY='1', REMOTE_ADDR='10.0.0.1')
+        other = self.upload(
+            b'name,email,age\nJane Smith,jane@example.com,25', HTTP_IDEMPOTENCY_KEY='1', REMOTE_ADDR='10.0.0.2'
+        )
+        user = CustomUser.objects.create(username='uploader', email='uploader@example.com')
+        self.client.force_authenticate(user)
+        authenticated = self.upload(
+            b'name,email,age\nJane Smith,jane@example.com,25', HTTP_IDEMPOTENCY_KEY='1', REMOTE_ADDR='10.0.0.1'
+        )
+
+        self.assertEqual(first.data['task_id'], 'task-1')
+        self.assertEqual(other.status_code, 202)
+        self.assertEqual(other.data['task_id'], 'task-2')
+        self.assertEqual(authenticated.status_code, 202)
+        self.assertEqual(self.mock_task.delay.call_count, 3)
+
+    def test_failed_import_retried_once(self):
+        """Test that only one of concurrent retries of a failed import is enqueued."""
+        self.upload()
+        current_app.backend.store_result('task-1', ValueError('Broken'), 'FAILURE')
+        self.addCleanup(current_app.backend.forget, 'task-1')
+        checksum = upload_storage.checksum_file(
+            SimpleUploadedFile("test.csv", b'name,email,age\nJohn Doe,john@example.com,30')
+        )
+        # Another request retrying the same file got there first
+        self.assertTrue(idempotency.reclaim_upload(
+            idempotency.upload_key(checksum, 'insert'), checksum, 'insert', 'task-1'
+        ))
+
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 409)
+        self.mock_task.delay.assert_called_once()
+
+
+class ImportErrorsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('task_errors', kwargs={'task_id': 'task-1'})
+        ImportRowError.objects.bulk_create([
+            ImportRowError(
+                import_id='task-1',
+                row=row,
+                data={'email': f'bad{row}'},
+                errors={'email': ['Enter a valid email address.']}
+            )
+            for row in range(1, 6)
+        ] + [ImportRowError(import_id='task-2', row=1, data={}, errors={})])
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_errors_paginated_by_cursor(self):
+        """Test that rejected rows are returned in pages linked by next_cursor."""
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([error['row'] for error in response.data['results']], [1, 2])
+        self.assertEqual(response.data['next_cursor'], 2)
+
+        response = self.client.get(self.url, {'limit': 2, 'cursor': 4})
+        self.assertEqual([error['row'] for error in response.data['results']], [5])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """Test that a non-integer cursor is rejected."""
+        response = self.client.get(self.url, {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_errors_download_streamed(self):
+        """Test that all rejected rows of an import can be downloaded as JSON lines."""
+        response = self.client.get(self.url, {'download': 1})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['row'], 1)
@@ -0,0 +1,128 @@
+from django.test import SimpleTestCase
+from rest_framework import serializers
+
+from v1.users.csv_import.validation import CompiledRowValidator
+from v1.users.serializers.users import UserImportSerializer
+
+
+VALID_ROW = {
+    'name': 'John Doe',
+    'email': 'john@example.com',
+    'first_name': 'John',
+    'last_name': 'Doe',
+    'age': '30',
+}
+
+PARITY_CASES = [
+    VALID_ROW,
+    {},
+    {'first_name': 'John'},
+    {**VALID_ROW, 'email': ' john@example.com ', 'first_name': ' John ', 'age': ' 30 '},
+    {**VALID_ROW, 'email': ''},
+    {**VALID_ROW, 'email': '   '},
+    {**VALID_ROW, 'email': None},
+    {**VALID_ROW, 'email': 'invalid-email'},
+    {**VALID_ROW, 'email': 'a@b'},
+    {**VALID_ROW, 'email': 'x' * 250 + '@example.com'},
+    {**VALID_ROW, 'email': 'john\x00@example.com'},
+    {**VALID_ROW, 'first_name': ''},
+    {**VALID_ROW, 'first_name': None},
+    {**VALID_ROW, 'first_name': 'J' * 500},
+    {**VALID_ROW, 'last_name': ''},
+    {**VALID_ROW, 'last_name': None},
+    {**VALID_ROW, 'last_name': 'D' * 151},
+    {**VALID_ROW, 'username': None},
+    {**VALID_ROW, 'username': ''},
+    {**VALID_ROW, 'username': 'johnny'},
+    {**VALID_ROW, 'username': 'u' * 151},
+    {**VALID_ROW, 'age': ''},
+    {**VALID_ROW, 'age': '  '},
+    {**VALID_ROW, 'age': None},
+    {**VALID_ROW, 'age': '0'},
+    {**VALID_ROW, 'age': '120'},
+    {**VALID_ROW, 'age': '121'},
+    {**VALID_ROW, 'age': '-1'},
+    {**VALID_ROW, 'age': '150'},
+    {**VALID_ROW, 'age': '30.0'},
+    {**VALID_ROW, 'age': '30.5'},
+    {**VALID_ROW, 'age': 'thirty'},
+    {**VALID_ROW, 'age': '9' * 1001},
+    {**VALID_ROW, 'age': 45},
+    {**VALID_ROW, 'first_name': 12, 'last_name': 3.5},
+    {**VALID_ROW, 'first_name': True},
+    {**VALID_ROW, 'first_name': ['John']},
+    {'email': 'bad', 'first_name': '', 'age': '999', 'last_name': None},
+]
+
+
+class CompiledRowValidatorParityTests(SimpleTestCase):
+    """
+    Checks that the compiled validator agrees with UserImportSerializer.
+    """
+    def setUp(self):
+        self.validator = CompiledRowValidator(UserImportSerializer)
+
+    def test_parity_with_serializer(self):
+        """Test that validated data and errors match the serializer for every case."""
+        for row in PARITY_CASES:
+            with self.subTest(row=row):
+                serializer = UserImportSerializer(data=row)
+                is_valid = serializer.is_valid()
+                validated_data, errors = self.validator.validate(row)
+
+                if is_valid:
+                    self.assertIsNone(errors)
+                    self.assertEqual(validated_data, dict(serializer.validated_data))
+                else:
+                    self.assertIsNone(validated_data)
+                    self.assertEqual(list(errors), list(serializer.errors))
+                    for field, field_errors in serializer.errors.items():
+                        self.assertEqual(errors[field], field_errors)
+                        self.assertEqual(
+                            [error.code for error in errors[field]],
+                            [error.code for error in field_errors]
+                        )
+
+    def test_partial_parity_with_serializer(self):
+        """Test that partial validation skips missing fields like a partial serializer."""
+        validator = CompiledRowValidator(UserImportSerializer, partial=True)
+        for row in PARITY_CASES:
+            with self.subTest(row=row):
+                serializer = UserImportSerializer(data=row, partial=True)
+                is_valid = serializer.is_valid()
+                validated_data, errors = validator.validate(row)
+
+                if is_valid:
+                    self.assertEqual(validated_data, dict(serializer.validated_data))
+                else:
+                    self.assertEqual(errors, serializer.errors)
+
+    def test_blank_age_is_null(self):
+        validated_data, errors = self.validator.validate({**VALID_ROW, 'age': ''})
+        self.assertIsNone(errors)
+        self.assertIsNone(validated_data['age'])
+
+    def test_validate_field_methods_applied(self):
+        """Test that validate_<field> methods on the serializer are honoured."""
+        class ShoutingSerializer(UserImportSerializer):
+            def validate_last_name(self, value):
+                if value == 'Error':
+                    raise serializers.ValidationError("Bad last name.")
+                return value.upper()
+
+        validator = CompiledRowValidator(ShoutingSerializer)
+
+        self.assertEqual(validator.validate(VALID_ROW)[0]['last_name'], 'DOE')
+        self.assertEqual(
+            validator.validate({**VALID_ROW, 'last_name': 'Error'})[1],
+            {'last_name': ['Bad last name.']}
+        )
+
+    def test_serializer_level_validation_rejected(self):
+        """Test that serializers with a validate() override cannot be compiled."""
+        class CrossFieldSerializer(UserImportSerializer):
+            def validate(self, attrs):
+                return attrs
+
+        with self.assertRaises(ValueError):
+            CompiledRowValidator(CrossFieldSerializer)
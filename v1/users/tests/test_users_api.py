@@ -0,0 +1,232 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from unittest.mock import Mock, patch
+
+from v1.users.models import CustomUser, ImportRowError
+from v1.users.tasks.csv_upload import process_csv_upload
+from v1.users.tests.utils import TemporaryUploadStorageMixin
+
+
+class UserListViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                first_name=f'User{index}',
+                last_name='Smith' if index % 2 else 'Jones',
+                age=20 + index
+            )
+            for index in range(5)
+        ]
+        cls.admin = CustomUser.objects.create(username='admin', email='admin@example.com', is_staff=True)
+
+    def setUp(self):
+        """Set up test environment before each test method."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('user_list')
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_cursor_pagination_walks_all_users(self):
+        """Pages follow the id order and link to the next cursor."""
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        ids = [user['id'] for user in response.data['results']]
+        self.assertIsNone(response.data['previous'])
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [user['id'] for user in response.data['results']]
+
+        self.assertEqual(ids, [user.id for user in self.users + [self.admin]])
+
+    def test_page_does_not_count(self):
+        """Listing a page runs a single query and no COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+    def test_filters(self):
+        """email, last_name and the age range narrow the listing."""
+        response = self.client.get(self.url, {'email': 'user3@example.com'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['user3'])
+
+        response = self.client.get(self.url, {'last_name': 'Smith', 'age_min': 22})
+        self.assertEqual([user['username'] for user in response.data['results']], ['user3'])
+
+        response = self.client.get(self.url, {'age_min': 21, 'age_max': 23})
+        self.assertEqual(
+            [user['username'] for user in response.data['results']],
+            ['user1', 'user2', 'user3']
+        )
+
+    def test_invalid_age_filter(self):
+        response = self.client.get(self.url, {'age_min': 'old'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'age_min must be an integer.')
+
+    def test_sparse_fields(self):
+        """Only the requested fields are selected and returned."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'id,email'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'email'})
+        self.assertNotIn('"first_name"', queries[0]['sql'])
+
+    def test_unknown_field_rejected(self):
+        response = self.client.get(self.url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.data['error'])
+
+    def test_requires_admin(self):
+        """Anonymous and non-staff clients cannot list users."""
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url)
+        self.assertIn(response.status_code, (401, 403))
+
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class UserDetailViewTests(TestCase):
+    def setUp(self):
+        """Set up test environment before each test method."""
+        self.client = APIClient()
+        self.user = CustomUser.objects.create(
+            username='jane',
+            email='jane@example.com',
+            first_name='Jane',
+            age=30
+        )
+        self.admin = CustomUser.objects.create(username='admin', email='admin@example.com', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_retrieve_user(self):
+        response = self.client.get(reverse('user_detail', args=[self.user.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'jane@example.com')
+        self.assertNotIn('password', response.data)
+
+    def test_retrieve_sparse_fields(self):
+        response = self.client.get(
+            reverse('user_detail', args=[self.user.id]),
+            {'fields': 'username'}
+        )
+        self.assertEqual(response.data, {'username': 'jane'})
+
+    def test_missing_user(self):
+        response = self.client.get(reverse('user_detail', args=[self.admin.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('user_detail', args=[self.user.id]))
+        self.assertIn(response.status_code, (401, 403))
+
+
+class UserExportViewTests(TemporaryUploadStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.create(
+            username='john', email='john@example.com', first_name='John', last_name='Doe', age=30
+        )
+        CustomUser.objects.create(
+            username='jane', email='jane@example.com', first_name='Jane', last_name='Van Dyke', age=25
+        )
+        cls.admin = CustomUser.objects.create(
+            username='admin', email='admin@example.com', first_name='Admin', is_staff=True
+        )
+
+    def setUp(self):
+        """Set up test environment before each test method."""
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('user_export')
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_csv_export_round_trips_import_format(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+            content.splitlines(),
+            [
+                'name,email,age',
+                'John Doe,john@example.com,30',
+                'Jane Van Dyke,jane@example.com,25',
+                'Admin,admin@example.com,',
+            ]
+        )
+
+    @patch('v1.users.tasks.csv_upload.process_csv_upload')
+    def test_export_reimported_without_rejections(self, mock_task):
+        """Test that an exported file, including a user without age, imports cleanly."""
+        CustomUser.objects.create(username='ann', email='ann@example.com', first_name='Ann', last_name='Lee')
+        content = b''.join(self.client.get(self.url).streaming_content)
+        self.assertIn(b'Ann Lee,ann@example.com,\r\n', content)
+
+        mock_task.delay = Mock(return_value=Mock(id='export-task-id'))
+        response = self.client.post(reverse('csv_upload'), {
+            'file': SimpleUploadedFile('users.csv', content, content_type='text/csv'),
+            'mode': 'upsert',
+        })
+        self.assertEqual(response.status_code, 202)
+        result = process_csv_upload(*mock_task.delay.call_args.args, **mock_task.delay.call_args.kwargs)
+
+        self.assertEqual(result['rejected_records'], 0)
+        self.assertFalse(ImportRowError.objects.filter(import_id=result['import_id']).exists())
+        self.assertIsNone(CustomUser.objects.get(email='ann@example.com').age)
+
+    def test_ndjson_export_with_filters(self):
+        response = self.client.get(self.url, {'type': 'ndjson', 'age_max': 26})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{'name': 'Jane Van Dyke', 'email': 'jane@example.com', 'age': 25}]
+        )
+
+    def test_gzip_export(self):
+        response = self.client.get(self.url, {'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('users.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertTrue(content.startswith('name,email,age\r\n'))
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_invalid_options(self):
+        response = self.client.get(self.url, {'type': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'compress': 'brotli'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'age_min': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(self.url)
+        self.assertIn(response.status_code, (401, 403))
@@ -0,0 +1,31 @@
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import override_settings
+
+from v1.users.csv_import import storage as upload_storage
+
+
+class TemporaryUploadStorageMixin:
+    """
+    Points the CSV upload storage at a temporary directory for the test class.
+    """
+    @classmethod
+    def setUpClass(cls):
+        spool_dir = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(STORAGES={
+            **settings.STORAGES,
+            'csv_uploads': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': spool_dir},
+            },
+        }))
+        super().setUpClass()
+
+
+def spool_csv(content):
+    """
+    Saves CSV text to the upload storage and returns its name and checksum.
+    """
+    return upload_storage.spool_upload(ContentFile(content.encode('utf-8'), name='upload.csv'))
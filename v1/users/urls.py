@@ -2,8 +2,12 @@
 from django.urls import path
 
 from v1.users.views import csv_upload as csv_upload_views
+from v1.users.views import users as users_views
 
 
 urlpatterns = [
+    path("", users_views.UserListView.as_view(), name="user_list"),
+    path("export/", users_views.UserExportView.as_view(), name="user_export"),
+    path("<int:pk>/", users_views.UserDetailView.as_view(), name="user_detail"),
     path("csv-upload/", csv_upload_views.CSVUploadView.as_view(), name="csv_upload"),
 ]
\ No newline at end of file
@@ -1,9 +1,17 @@
+import json
 from pathlib import Path
 
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from common import task_status
+from v1.users.csv_import import idempotency
+from v1.users.csv_import import storage as upload_storage
+from v1.users.csv_import.writer import IMPORT_MODES, INSERT
+from v1.users.models import ImportRowError
 from v1.users.tasks import csv_upload as csv_upload_tasks
 
 
@@ -16,7 +24,17 @@ class CSVUploadView(APIView):
     def post(self, request):
         """
         Handles POST requests for CSV file uploads.
-        Validates file extension and sends the file content to a Celery task.
+        Validates file extension, streams the file to the upload storage
+        while hashing it and sends its name and checksum to a Celery task. Files of at least
+        CSV_UPLOAD_PARALLEL_MIN_BYTES are imported in parallel chunks.
+        The optional ``mode`` field selects insert (the default), upsert
+        or update of users matched on email.
+        A file identical to one uploaded in the same mode within
+        CSV_UPLOAD_IDEMPOTENCY_TTL seconds, or a request repeating an
+        ``Idempotency-Key`` header from the same user or client IP, returns
+        the task id of the earlier upload instead of importing it again,
+        unless that import failed.
+        Reusing an ``Idempotency-Key`` with another file or mode is rejected.
         """
         file = request.FILES.get('file', None)
         if not file:
@@ -29,11 +47,118 @@ class CSVUploadView(APIView):
                 {"error": "Invalid file type. Only CSV files are allowed."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        csv_content = file.read().decode('utf-8')
+        mode = request.data.get('mode', INSERT)
+        if mode not in IMPORT_MODES:
+            return Response(
+                {"error": f"Invalid import mode. Use one of: {', '.join(IMPORT_MODES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_name, checksum = upload_storage.spool_upload(file)
+        upload_key = idempotency.upload_key(
+            checksum, mode, request.headers.get('Idempotency-Key'), idempotency.client_identity(request)
+        )
+        previous = idempotency.claim_upload(upload_key, checksum, mode)
+        if previous is not None:
+            response = self.previous_upload_response(upload_key, checksum, mode, previous)
+            if response is not None:
+                upload_storage.delete_upload(file_name)
+                return response
+
+        parallel_min_bytes = getattr(settings, 'CSV_UPLOAD_PARALLEL_MIN_BYTES', None)
+        if parallel_min_bytes is not None and file.size >= parallel_min_bytes:
+            import_task = csv_upload_tasks.process_csv_upload_parallel
+        else:
+            import_task = csv_upload_tasks.process_csv_upload
 
-        task = csv_upload_tasks.process_csv_upload.delay(csv_content)
+        try:
+            task = import_task.delay(file_name, checksum, mode=mode)
+        except Exception:
+            # Let a retry of the same file claim it again
+            idempotency.release_upload(upload_key)
+            upload_storage.delete_upload(file_name)
+            raise
+        idempotency.record_task(upload_key, checksum, mode, task.id)
         return Response(
             {"message": "CSV processing started.", "task_id": task.id},
             status=status.HTTP_202_ACCEPTED
         )
-        
\ No newline at end of file
+
+    def previous_upload_response(self, upload_key, checksum, mode, previous):
+        """
+        Returns the response to an upload whose key was already claimed,
+        or None if the earlier import failed and this upload reclaimed it.
+        """
+        if previous["checksum"] != checksum:
+            return Response(
+                {"error": "Idempotency-Key was already used for a different file."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if previous.get("mode", mode) != mode:
+            return Response(
+                {"error": f"Idempotency-Key was already used with mode {previous['mode']}."},
+                status=status.HTTP_409_CONFLICT
+            )
+        if previous["task_id"] is None:
+            return Response(
+                {"error": "An identical upload is being submitted. Retry shortly."},
+                status=status.HTTP_409_CONFLICT
+            )
+        previous_state = task_status.get_task_statuses([previous["task_id"]])[0]["status"]
+        if not idempotency.is_retryable(previous_state):
+            return Response(
+                {"message": "Identical CSV upload already submitted.", "task_id": previous["task_id"]},
+                status=status.HTTP_202_ACCEPTED
+            )
+        if not idempotency.reclaim_upload(upload_key, checksum, mode, previous["task_id"]):
+            return Response(
+                {"error": "An identical upload is being submitted. Retry shortly."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return None
+
+
+class ImportErrorsView(APIView):
+    """
+    API View to page through the rejected rows of a CSV import.
+    """
+    MAX_PAGE_SIZE = 1000
+
+    def get(self, request, task_id):
+        """
+        Handles GET requests for the rejected rows of an import.
+        Returns a page of rows after the row number given as ``cursor``,
+        or streams every rejected row as JSON lines with ``?download=1``.
+        """
+        rows = ImportRowError.objects.filter(import_id=task_id).order_by('row')
+
+        if request.query_params.get('download'):
+            response = StreamingHttpResponse(
+                _iter_error_lines(rows),
+                content_type='application/x-ndjson'
+            )
+            response['Content-Disposition'] = f'attachment; filename="{task_id}-errors.jsonl"'
+            return response
+
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = int(request.query_params.get(
+                'limit', getattr(settings, 'CSV_IMPORT_ERRORS_PAGE_SIZE', 100)
+            ))
+        except ValueError:
+            return Response(
+                {"error": "cursor and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(max(limit, 1), self.MAX_PAGE_SIZE)
+
+        page = list(rows.filter(row__gt=cursor).values('row', 'data', 'errors')[:limit + 1])
+        next_cursor = page[limit - 1]['row'] if len(page) > limit else None
+        return Response(
+            {"task_id": task_id, "results": page[:limit], "next_cursor": next_cursor},
+            status=status.HTTP_200_OK
+        )
+
+
+def _iter_error_lines(rows):
+    for row, data, errors in rows.values_list('row', 'data', 'errors').iterator(chunk_size=2000):
+        yield json.dumps({"row": row, "data": data, "errors": errors}) + "\n"
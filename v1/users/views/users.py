@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from v1.users import export as user_export
+from v1.users.filters import UserFilter
+from v1.users.models import CustomUser
+from v1.users.pagination import UserCursorPagination
+from v1.users.serializers import users as user_serializers
+
+
+class SparseFieldsMixin:
+    """
+    Limits the serialized fields and the selected columns to the
+    comma separated ``fields`` query parameter.
+    """
+    def get_requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        allowed = self.serializer_class.Meta.fields
+        unknown = [field for field in fields if field not in allowed]
+        if unknown:
+            raise ValidationError({
+                "error": f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(allowed)}."
+            })
+        return fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            queryset = queryset.only(*fields)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+
+class UserListView(SparseFieldsMixin, ListAPIView):
+    """
+    API View listing users with keyset pagination.
+    GET /v1/users/?email=&last_name=&age_min=&age_max=&fields=&limit=&cursor=
+    """
+    permission_classes = [IsAdminUser]
+    queryset = CustomUser.objects.all()
+    serializer_class = user_serializers.UserListSerializer
+    pagination_class = UserCursorPagination
+
+    def filter_queryset(self, queryset):
+        return UserFilter(self.request.query_params).filter_queryset(queryset)
+
+
+class UserDetailView(SparseFieldsMixin, RetrieveAPIView):
+    """
+    API View returning a single user by id.
+    GET /v1/users/<id>/?fields=
+    """
+    permission_classes = [IsAdminUser]
+    queryset = CustomUser.objects.all()
+    serializer_class = user_serializers.UserListSerializer
+
+
+class UserExportView(APIView):
+    """
+    API View streaming users in the name,email,age format of the CSV import.
+    GET /v1/users/export/?type=csv|ndjson&compress=gzip&email=&last_name=&age_min=&age_max=
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Handles GET requests for a user export.
+        Rows are written to the response as they are fetched, so memory
+        stays flat however many users match the listing filters.
+        """
+        # ``format`` is taken by DRF's format suffix negotiation
+        fmt = request.query_params.get('type', user_export.CSV)
+        if fmt not in user_export.CONTENT_TYPES:
+            return Response(
+                {"error": f"Invalid type. Choose from: {', '.join(user_export.CONTENT_TYPES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('compress')
+        if compress not in (None, '', 'gzip'):
+            return Response(
+                {"error": "Invalid compress value. Only gzip is supported."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = UserFilter(request.query_params).filter_queryset(CustomUser.objects.all())
+        file_name = f'users.{fmt}'
+        content_type = user_export.CONTENT_TYPES[fmt]
+        if compress:
+            file_name += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(
+            user_export.export_users(
+                queryset,
+                fmt=fmt,
+                compress=bool(compress),
+                chunk_size=getattr(settings, 'USERS_EXPORT_CHUNK_SIZE', 2000)
+            ),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response